@@ -0,0 +1,73 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark the latency of cache hits of `caching.cache`.
+
+Compares `caching.cache` with `functools.lru_cache` on a few signature shapes,
+and with the cost of building a `SleekCallArgs`, which is what every hit used
+to cost before the key builders were specialized.
+
+Run with `python -m benchmarks.benchmark_cache_hits` from the repo root.
+'''
+
+import functools
+import timeit
+
+from python_toolbox import caching
+from python_toolbox.sleek_reffing import SleekCallArgs
+
+
+def argumentless():
+    return 7
+
+def positional(a, b=2):
+    return a + b
+
+def keyword_only(a, *, b=2):
+    return a + b
+
+class Thing:
+    pass
+
+thing = Thing()
+
+def with_object(x, y=1):
+    return y
+
+
+cases = (
+    ('zero arguments', argumentless, (), {}),
+    ('positional ints', positional, (1,), {}),
+    ('keyword-only', keyword_only, (1,), {'b': 3}),
+    ('weakreffable argument', with_object, (thing,), {}),
+)
+
+
+def time_calls(function, args, kwargs, number):
+    function(*args, **kwargs)
+    timer = timeit.Timer(lambda: function(*args, **kwargs))
+    return min(timer.repeat(repeat=5, number=number)) / number
+
+
+def main(number=10_000):
+    print(f'{"case":<24}{"cache":>12}{"lru_cache":>12}'
+          f'{"SleekCallArgs":>16}')
+    for name, function, args, kwargs in cases:
+        cached_function = caching.cache()(function)
+        lru_cached_function = functools.lru_cache(maxsize=None)(function)
+        sleek_call_args_time = time_calls(
+            lambda *args, **kwargs:
+                SleekCallArgs({}, function, *args, **kwargs),
+            args, kwargs, number
+        )
+        print(
+            f'{name:<24}'
+            f'{time_calls(cached_function, args, kwargs, number) * 1e9:>10.0f}ns'
+            f'{time_calls(lru_cached_function, args, kwargs, number) * 1e9:>10.0f}ns'
+            f'{sleek_call_args_time * 1e9:>14.0f}ns'
+        )
+
+
+if __name__ == '__main__':
+    main()
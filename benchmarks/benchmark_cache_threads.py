@@ -0,0 +1,76 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Stress-benchmark `caching.cache(thread_safe=True)` with 1 to 32 threads.
+
+Each thread makes calls with keys drawn from a small key space, so many calls
+miss at the same time for the same key. The cached function sleeps to imitate
+I/O. For each number of threads this prints the throughput, the number of
+times the function actually ran, (without coalescing it runs once per
+concurrent miss,) and the lock statistics. It's done both for a cache with a
+`max_size`, which has one lock, and for an unbounded one, which is split into
+lock stripes.
+
+Run with `python -m benchmarks.benchmark_cache_threads` from the repo root.
+'''
+
+import itertools
+import random
+import threading
+import time
+
+from python_toolbox import caching
+
+infinity = float('inf')
+
+
+def run(n_threads, thread_safe, n_calls_per_thread=2_000, n_keys=200,
+        max_size=100):
+    n_function_calls = 0
+
+    @caching.cache(max_size=max_size, thread_safe=thread_safe)
+    def f(x):
+        nonlocal n_function_calls
+        n_function_calls += 1
+        time.sleep(0.0005)
+        return x
+
+    def work(seed):
+        random_ = random.Random(seed)
+        for _ in range(n_calls_per_thread):
+            f(random_.randrange(n_keys))
+
+    threads = [threading.Thread(target=work, args=(i,))
+               for i in range(n_threads)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start_time
+    throughput = n_threads * n_calls_per_thread / duration
+    lock_statistics = f.cache_lock_statistics() if thread_safe else None
+    return throughput, n_function_calls, lock_statistics
+
+
+def main():
+    print(f'{"max_size":>8}{"threads":>8}{"mode":>14}{"calls/s":>12}'
+          f'{"computed":>10}{"acquired":>10}{"contended":>11}'
+          f'{"coalesced":>11}')
+    for max_size, n_threads, thread_safe in itertools.product(
+                         (100, infinity), (1, 2, 4, 8, 16, 32), (False, True)):
+        throughput, n_function_calls, lock_statistics = \
+                                run(n_threads, thread_safe, max_size=max_size)
+        line = (f'{max_size:>8}{n_threads:>8}'
+                f'{"thread_safe" if thread_safe else "unsafe":>14}'
+                f'{throughput:>12.0f}{n_function_calls:>10}')
+        if lock_statistics is not None:
+            line += (f'{lock_statistics.acquisitions:>10}'
+                     f'{lock_statistics.contentions:>11}'
+                     f'{lock_statistics.coalesced_calls:>11}')
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark `ColumnarBag` against `Bag` and `collections.Counter`.
+
+For two bags of a million distinct keys, reports the time of building them
+from counts, of building one by setting its keys one by one, of `|`, `&`,
+`+` and `-` between them, of multiplying by an integer, of an in-place `+=`
+and of comparing them with `<=`:
+
+    python -m benchmarks.benchmark_columnar_bag [--n-keys N]
+
+Run from the repo root. `Counter` has no `<=` before Python 3.10 and no
+multiplication, so those are done with a loop over its items.
+'''
+
+import argparse
+import collections
+import random
+import time
+
+from python_toolbox.nifty_collections import Bag, ColumnarBag
+
+
+def time_call(function):
+    start_time = time.perf_counter()
+    function()
+    return time.perf_counter() - start_time
+
+
+def build(bag_type, keys, counts, interner=None):
+    if bag_type is ColumnarBag:
+        bag = ColumnarBag(interner=interner)
+        bag.update_from_counts(keys, counts)
+        return bag
+    else:
+        return bag_type(dict(zip(keys, counts)))
+
+
+def build_incrementally(bag_type, keys, counts):
+    bag = bag_type()
+    for key, count in zip(keys, counts):
+        bag[key] = count
+    return bag
+
+
+def multiply(bag, number):
+    if isinstance(bag, collections.Counter):
+        return collections.Counter({key: count * number for key, count in
+                                    bag.items()})
+    else:
+        return bag * number
+
+
+def is_contained(bag, other_bag):
+    if isinstance(bag, collections.Counter):
+        return all(count <= other_bag[key] for key, count in bag.items())
+    else:
+        return bag <= other_bag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--n-keys', type=int, default=10 ** 6)
+    n_keys = parser.parse_args().n_keys
+    random_generator = random.Random(0)
+    keys = [f'key {i}' for i in range(n_keys)]
+    counts = [random_generator.randrange(1, 100) for _ in range(n_keys)]
+    other_counts = [random_generator.randrange(1, 100) for _ in range(n_keys)]
+
+    bag_types = (ColumnarBag, Bag, collections.Counter)
+    print(f'{"":<16}' + ''.join(f'{bag_type.__name__:>14}' for bag_type in
+                                bag_types))
+    results = {}
+    for bag_type in bag_types:
+        timings = [
+            time_call(lambda: build(bag_type, keys, counts)),
+            time_call(lambda: build_incrementally(bag_type, keys, counts)),
+        ]
+        bag = build(bag_type, keys, counts)
+        # Columnar bags made separately only share ids if they share an
+        # interner:
+        other_bag = build(bag_type, keys, other_counts,
+                          getattr(bag, 'interner', None))
+        timings += [
+            time_call(lambda: bag | other_bag),
+            time_call(lambda: bag & other_bag),
+            time_call(lambda: bag + other_bag),
+            time_call(lambda: bag - other_bag),
+            time_call(lambda: multiply(bag, 3)),
+        ]
+        def add_in_place():
+            nonlocal bag
+            bag += other_bag
+        timings += [
+            time_call(add_in_place),
+            time_call(lambda: is_contained(other_bag, bag)),
+        ]
+        results[bag_type] = timings
+
+    names = ('build', 'build by key', '|', '&', '+', '-', '* 3', '+=', '<=')
+    for i, name in enumerate(names):
+        print(f'{name:<16}' + ''.join(f'{results[bag_type][i]:>13.3f}s' for
+                                      bag_type in bag_types))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark the eviction policies of `caching.cache` by replaying key traces.
+
+For each trace and each policy, reports the hit ratio and the average time per
+call of a cached function with `max_size` set. Traces are either synthetic, or
+recorded ones given as files on the command line, one key per line:
+
+    python -m benchmarks.benchmark_eviction_policies [--max-size N] [trace...]
+
+Run from the repo root.
+'''
+
+import argparse
+import itertools
+import random
+import time
+
+from python_toolbox import caching
+
+
+policy_names = ('lru', 'lfu', 'arc', 'tinylfu')
+
+
+def make_zipf_trace(n_keys, n_accesses, exponent=1.0, seed=0):
+    '''Make a trace where key number `i` is used in proportion to `1/i**s`.'''
+    r = random.Random(seed)
+    cumulative_weights = list(itertools.accumulate(
+        1 / i ** exponent for i in range(1, n_keys + 1)
+    ))
+    return r.choices(range(n_keys), cum_weights=cumulative_weights,
+                     k=n_accesses)
+
+
+def make_scan_trace(n_keys, n_accesses, scan_length, seed=0):
+    '''Make a Zipf trace interrupted by scans over keys that are used once.'''
+    zipf_trace = make_zipf_trace(n_keys, n_accesses, seed=seed)
+    trace = []
+    scan_keys = itertools.count(n_keys)
+    for i in range(0, n_accesses, 10 * scan_length):
+        trace.extend(zipf_trace[i : i + 10 * scan_length])
+        trace.extend(itertools.islice(scan_keys, scan_length))
+    return trace
+
+
+def make_loop_trace(loop_length, n_accesses):
+    '''Make a trace that loops over the same keys, in the same order.'''
+    return [i % loop_length for i in range(n_accesses)]
+
+
+def read_trace(path):
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def replay(trace, policy_name, max_size):
+    '''Replay `trace` on a cached function. Return hit ratio and seconds.'''
+    cached_function = caching.cache(max_size=max_size,
+                                    eviction_policy=policy_name)(lambda x: x)
+    start_time = time.perf_counter()
+    for key in trace:
+        cached_function(key)
+    duration = time.perf_counter() - start_time
+    cache_info = cached_function.cache_info()
+    return cache_info.hits / len(trace), duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--max-size', type=int, default=1000)
+    parser.add_argument('traces', nargs='*', metavar='trace')
+    arguments = parser.parse_args()
+    max_size = arguments.max_size
+
+    if arguments.traces:
+        traces = [(path, read_trace(path)) for path in arguments.traces]
+    else:
+        traces = [
+            ('zipf', make_zipf_trace(10 * max_size, 200_000)),
+            ('zipf with scans', make_scan_trace(10 * max_size, 200_000,
+                                                scan_length=2 * max_size)),
+            ('loop', make_loop_trace(max_size + max_size // 10, 200_000)),
+        ]
+
+    print(f'max_size={max_size}')
+    print(f'{"trace":<20}{"policy":<10}{"hit ratio":>10}{"per call":>12}')
+    for trace_name, trace in traces:
+        for policy_name in policy_names:
+            hit_ratio, duration = replay(trace, policy_name, max_size)
+            print(f'{trace_name:<20}{policy_name:<10}{hit_ratio:>10.2%}'
+                  f'{duration / len(trace) * 1e9:>10.0f}ns')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark `OrderedSet` against the linked-list ordered set it replaced.
+
+For a million items, reports the time of building the set, of getting items
+by index, of finding the index of items, of inserting items in the middle
+and of removing items, and the memory the set takes:
+
+    python -m benchmarks.benchmark_ordered_set [--n-items N]
+
+Run from the repo root. The linked list finds items by index by walking from
+the start, so fewer of those are timed for it.
+'''
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from python_toolbox.nifty_collections import OrderedSet
+
+
+KEY, PREV, NEXT = range(3)
+
+
+class LinkedListOrderedSet:
+    '''The linked-list ordered set that `OrderedSet` used to be.'''
+    def __init__(self, iterable=()):
+        self._end = []
+        self._end += [None, self._end, self._end]
+        self._map = {}
+        for item in iterable:
+            self.add(item)
+
+    def __iter__(self):
+        end = self._end
+        curr = end[NEXT]
+        while curr is not end:
+            yield curr[KEY]
+            curr = curr[NEXT]
+
+    def __getitem__(self, index):
+        for i, item in enumerate(self):
+            if i == index:
+                return item
+        else:
+            raise IndexError
+
+    def index(self, key):
+        for i, item in enumerate(self):
+            if item == key:
+                return i
+        else:
+            raise ValueError
+
+    def add(self, key):
+        if key not in self._map:
+            end = self._end
+            last = end[PREV]
+            last[NEXT] = end[PREV] = self._map[key] = [key, last, end]
+
+    def insert(self, index, key):
+        # Walk to the item at `index` and link the key before it:
+        next_ = self._end[NEXT]
+        for _ in range(index):
+            next_ = next_[NEXT]
+        prev = next_[PREV]
+        prev[NEXT] = next_[PREV] = self._map[key] = [key, prev, next_]
+
+    def discard(self, key):
+        if key in self._map:
+            key, prev, next_ = self._map.pop(key)
+            prev[NEXT] = next_
+            next_[PREV] = prev
+
+
+def time_per_call(function, arguments):
+    start_time = time.perf_counter()
+    for argument in arguments:
+        function(argument)
+    return (time.perf_counter() - start_time) / len(arguments)
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.1f}ms'
+    else:
+        return f'{seconds * 1e6:.1f}us'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--n-items', type=int, default=10 ** 6)
+    n_items = parser.parse_args().n_items
+    random_generator = random.Random(0)
+    items = [random_generator.randrange(n_items) for _ in range(1000)]
+    # Indices that are still in range after the items are removed:
+    indices = [random_generator.randrange(n_items // 2) for _ in range(1000)]
+
+    print(f'{"":<24}{"OrderedSet":>14}{"linked list":>14}')
+    results = {}
+    for ordered_set_type in (OrderedSet, LinkedListOrderedSet):
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        ordered_set = ordered_set_type(range(n_items))
+        build_time = time.perf_counter() - start_time
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        n_walks = len(items) if ordered_set_type is OrderedSet else 10
+        new_items = range(-1, -n_walks - 1, -1)
+        insert_in_the_middle = \
+                          lambda item: ordered_set.insert(n_items // 2, item)
+        results[ordered_set_type] = (
+            f'{build_time:.2f}s',
+            f'{memory / n_items:.0f}B',
+            format_time(time_per_call(ordered_set.__getitem__,
+                                      items[:n_walks])),
+            format_time(time_per_call(ordered_set.index, items[:n_walks])),
+            format_time(time_per_call(insert_in_the_middle, new_items)),
+            format_time(time_per_call(ordered_set.discard, items)),
+            format_time(time_per_call(ordered_set.__getitem__,
+                                      indices[:n_walks])),
+        )
+
+    names = ('build', 'memory per item', 'get by index', 'index of item',
+             'insert in the middle', 'remove', 'get by index after')
+    for name, result, linked_list_result in zip(
+                  names, results[OrderedSet], results[LinkedListOrderedSet]):
+        print(f'{name:<24}{result:>14}{linked_list_result:>14}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark how `parallel_map` on a `PermSpace` scales with the number of cores.
+
+Maps a CPU-bound function over a space with process pools of 1, 2, 4, ... up
+to the number of CPUs, and reports the time and the speedup over a plain
+`map` in this process:
+
+    python -m benchmarks.benchmark_parallel_map [--n-elements N]
+
+Run from the repo root.
+'''
+
+import argparse
+import os
+import time
+
+from python_toolbox import combi
+from python_toolbox import future_tools
+
+
+def get_weight(perm):
+    '''A CPU-bound function of a perm, for mapping over the space.'''
+    return sum(i * value for i, value in enumerate(perm.inverse))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--n-elements', type=int, default=9)
+    perm_space = combi.PermSpace(parser.parse_args().n_elements)
+
+    start_time = time.perf_counter()
+    expected_result = sum(map(get_weight, perm_space))
+    serial_time = time.perf_counter() - start_time
+    print(f'{perm_space!r}: {perm_space.length} perms, {serial_time:.2f}s '
+          f'without parallel_map')
+
+    print(f'{"workers":>8}{"time":>10}{"speedup":>10}')
+    n_cpus = os.cpu_count() or 1
+    n_workers = 1
+    while True:
+        with future_tools.CuteProcessPoolExecutor(n_workers) as executor:
+            start_time = time.perf_counter()
+            result = sum(perm_space.parallel_map(get_weight, executor))
+            parallel_time = time.perf_counter() - start_time
+        assert result == expected_result
+        print(f'{n_workers:>8}{parallel_time:>9.2f}s'
+              f'{serial_time / parallel_time:>9.2f}x')
+        if n_workers >= n_cpus:
+            break
+        n_workers = min(2 * n_workers, n_cpus)
+
+
+if __name__ == '__main__':
+    main()
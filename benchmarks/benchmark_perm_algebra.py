@@ -0,0 +1,102 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark the algebra of pure `Perm`s, against going item by item.
+
+For perms of a few sizes, reports the average time of composing, inverting,
+raising to a power and counting cycles with the fast path that `Perm` uses,
+and with the generic, item-by-item way that's used for other perms. Then
+reports the time per perm of the batch functions of `perm_algebra`:
+
+    python -m benchmarks.benchmark_perm_algebra [--n-repeats N]
+
+Run from the repo root.
+'''
+
+import argparse
+import random
+import time
+
+from python_toolbox import misc_tools
+from python_toolbox import combi
+from python_toolbox.combi.perming import perm_algebra
+
+
+def time_call(function, n_repeats):
+    start_time = time.perf_counter()
+    for _ in range(n_repeats):
+        function()
+    return (time.perf_counter() - start_time) / n_repeats
+
+
+def count_cycles_generically(perm):
+    '''Count the cycles of `perm` like `Perm.n_cycles` used to.'''
+    unvisited_items = set(perm)
+    n_cycles = 0
+    while unvisited_items:
+        starting_item = current_item = next(iter(unvisited_items))
+        while current_item in unvisited_items:
+            unvisited_items.remove(current_item)
+            current_item = perm[current_item]
+        if current_item == starting_item:
+            n_cycles += 1
+    return n_cycles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--n-repeats', type=int, default=100)
+    n_repeats = parser.parse_args().n_repeats
+    random_generator = random.Random(0)
+
+    print(f'{"operation":<22}{"n":>6}{"fast":>12}{"generic":>12}')
+    for n in (10, 100, 1000):
+        perm_space = combi.PermSpace(n)
+        perm, other_perm = (
+            perm_space[random_generator.randrange(perm_space.length)]
+            for _ in range(2)
+        )
+        cases = (
+            ('compose', lambda: perm * other_perm,
+             lambda: other_perm.apply(perm)),
+            ('invert', lambda: ~perm,
+             lambda: combi.Perm(
+                 sorted(range(n), key=perm.__getitem__), perm_space
+             )),
+            ('power of 1000', lambda: perm ** 1000,
+             lambda: misc_tools.general_product((perm,) * 1000)),
+            ('count cycles',
+             lambda: perm_algebra.get_cycles(perm._perm_sequence),
+             lambda: count_cycles_generically(perm)),
+        )
+        for name, fast_function, generic_function in cases:
+            fast_time = time_call(fast_function, n_repeats)
+            generic_time = time_call(generic_function, max(n_repeats // 10,
+                                                           1))
+            print(f'{name:<22}{n:>6}{fast_time * 1e6:>10.1f}us'
+                  f'{generic_time * 1e6:>10.1f}us')
+
+    perm_space = combi.PermSpace(100)
+    perm_sequences = [
+        tuple(perm_space[random_generator.randrange(perm_space.length)])
+        for _ in range(1000)
+    ]
+    print()
+    print(f'{"batch of 1000, n=100":<28}{"per perm":>12}')
+    batch_cases = (
+        ('compose_batch', lambda: perm_algebra.compose_batch(
+            perm_sequences, perm_sequences[::-1])),
+        ('invert_batch', lambda: perm_algebra.invert_batch(perm_sequences)),
+        ('power_batch', lambda: perm_algebra.power_batch(perm_sequences,
+                                                         1000)),
+        ('count_cycles_batch',
+         lambda: perm_algebra.count_cycles_batch(perm_sequences)),
+    )
+    for name, function in batch_cases:
+        batch_time = time_call(function, max(n_repeats // 10, 1))
+        print(f'{name:<28}{batch_time / len(perm_sequences) * 1e6:>10.2f}us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark iterating over `PermSpace`s, against `itertools.permutations`.
+
+For each space, reports the average time per perm of iterating over the space,
+of indexing it perm by perm, and, where there's an equivalent, of
+`itertools.permutations` or `itertools.combinations`:
+
+    python -m benchmarks.benchmark_perm_space_iteration [--max-perms N]
+
+Run from the repo root.
+'''
+
+import argparse
+import itertools
+import time
+
+from python_toolbox import combi
+
+
+def make_cases():
+    '''Get tuples of a name, a space, and an `itertools` equivalent or None.'''
+    return (
+        ('pure', combi.PermSpace(8), lambda: itertools.permutations(range(8))),
+        ('partial', combi.PermSpace(10, n_elements=5),
+         lambda: itertools.permutations(range(10), 5)),
+        ('rapplied', combi.PermSpace('abcdefgh'),
+         lambda: itertools.permutations('abcdefgh')),
+        ('combination', combi.CombSpace(16, 6),
+         lambda: itertools.combinations(range(16), 6)),
+        ('fixed', combi.PermSpace(9, fixed_map={0: 3, 5: 5}), None),
+        ('recurrent', combi.PermSpace('aabbccdd'), None),
+        ('recurrent comb', combi.CombSpace('aaabbbcccddd', 5), None),
+        ('degreed', combi.PermSpace(8, degrees=(1, 2)), None),
+        ('sliced', combi.PermSpace(10)[10 ** 6:], None),
+    )
+
+
+def time_per_item(iterable, max_items):
+    start_time = time.perf_counter()
+    n_items = sum(1 for _ in itertools.islice(iterable, max_items))
+    return (time.perf_counter() - start_time) / n_items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--max-perms', type=int, default=20_000)
+    max_perms = parser.parse_args().max_perms
+
+    print(f'{"space":<16}{"iteration":>12}{"indexing":>12}{"itertools":>12}')
+    for name, perm_space, make_itertools_iterator in make_cases():
+        iteration_time = time_per_item(perm_space, max_perms)
+        # Indexing is much slower, so we do fewer perms:
+        indexing_time = time_per_item(
+            (perm_space[i] for i in range(perm_space.length)),
+            max_perms // 10
+        )
+        if make_itertools_iterator is None:
+            itertools_column = '-'
+        else:
+            itertools_time = time_per_item(make_itertools_iterator(),
+                                           max_perms)
+            itertools_column = f'{itertools_time * 1e9:.0f}ns'
+        print(f'{name:<16}{iteration_time * 1e9:>10.0f}ns'
+              f'{indexing_time * 1e9:>10.0f}ns{itertools_column:>12}')
+
+
+if __name__ == '__main__':
+    main()
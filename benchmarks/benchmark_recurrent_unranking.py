@@ -0,0 +1,55 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Benchmark indexing into recurrent `PermSpace`s and `CombSpace`s.
+
+For each space, reports the average time of getting a perm by its index, and
+of getting the index of a perm, for random indices:
+
+    python -m benchmarks.benchmark_recurrent_unranking [--n-perms N]
+
+Run from the repo root.
+'''
+
+import argparse
+import random
+import time
+
+from python_toolbox import combi
+
+
+def make_perm_spaces():
+    return (
+        combi.PermSpace('aaabbbcccddd'),
+        combi.PermSpace('aaaaabbbbbcccccdddddeeeee'),
+        combi.PermSpace('ab' * 20 + 'cdefghij' * 5),
+        combi.PermSpace('aaaaabbbbbcccccdddddeeeee', n_elements=12),
+        combi.PermSpace('aaabbbcccddd', fixed_map={0: 'd', 5: 'a'}),
+        combi.CombSpace('aaabbbcccddd', 6),
+        combi.CombSpace('abcde' * 10, 20),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--n-perms', type=int, default=1000)
+    n_perms = parser.parse_args().n_perms
+
+    r = random.Random(0)
+    print(f'{"space":<52}{"unrank":>12}{"rank":>12}')
+    for perm_space in make_perm_spaces():
+        indices = [r.randrange(perm_space.length) for _ in range(n_perms)]
+        start_time = time.perf_counter()
+        perms = [perm_space[i] for i in indices]
+        unranking_time = (time.perf_counter() - start_time) / n_perms
+        start_time = time.perf_counter()
+        for perm in perms:
+            perm_space.index(perm)
+        ranking_time = (time.perf_counter() - start_time) / n_perms
+        print(f'{repr(perm_space)[:50]:<52}{unranking_time * 1e6:>10.1f}us'
+              f'{ranking_time * 1e6:>10.1f}us')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,8 +3,11 @@
 
 '''Defines various caching tools.'''
 
-# todo: examine thread-safety
-
 from .decorators import cache
+from ._thread_safety import LockStatistics
+from ._sizing import get_size, MemoryBudget
+from .eviction_policies import (EvictionPolicy, LruPolicy, LfuPolicy,
+                                ArcPolicy, TinyLfuPolicy)
+from ._statistics import CacheInfo, get_cached_functions, get_cache_infos
 from .cached_type import CachedType
 from .cached_property import CachedProperty
\ No newline at end of file
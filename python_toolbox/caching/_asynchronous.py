@@ -0,0 +1,46 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines the `_SharedTask` class.
+
+See its documentation for more details.
+'''
+
+import asyncio
+
+
+class _SharedTask:
+    '''
+    An `asyncio` task that's awaited by several callers of a cached function.
+
+    Each awaiter waits on the task through `asyncio.shield`, so when one of
+    them is cancelled, the computation carries on for the others. Only when
+    the last awaiter is cancelled is the task itself cancelled, since then no
+    one is waiting for its result.
+    '''
+    def __init__(self, task):
+        self.task = task
+        self.n_awaiters = 0
+        self.is_abandoned = False
+        '''Whether all awaiters were cancelled, and so the task was too.'''
+
+
+    @property
+    def is_joinable(self):
+        '''Whether a new caller may still wait for this task's result.'''
+        return not (self.is_abandoned or self.task.done())
+
+
+    async def wait(self):
+        '''Wait for the task to finish, and return its result.'''
+        self.n_awaiters += 1
+        try:
+            return await asyncio.shield(self.task)
+        except asyncio.CancelledError:
+            if self.n_awaiters == 1 and not self.task.done():
+                self.is_abandoned = True
+                self.task.cancel()
+            raise
+        finally:
+            self.n_awaiters -= 1
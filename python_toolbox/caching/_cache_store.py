@@ -0,0 +1,298 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines the `_CacheStore` and `_CacheEntry` classes.
+
+See their documentation for more details.
+'''
+
+import collections.abc
+import heapq
+import itertools
+
+from .eviction_policies import LruPolicy
+
+infinity = float('inf')
+
+
+class _CacheEntry:
+    '''A cached result, along with how long it took to compute.'''
+    __slots__ = ('value', 'duration', 'expiry', 'size', 'last_used')
+
+    def __init__(self, value, duration=0.0):
+        self.value = value
+        self.duration = duration
+        '''The number of seconds it took to compute `value`.'''
+        self.expiry = None
+        '''The `datetime` at which the entry expires, if it ever does.'''
+        self.size = 0
+        '''The size of `value` in bytes, if we're tracking memory.'''
+        self.last_used = 0
+        '''When the entry was last used, by its `MemoryBudget`'s clock.'''
+
+
+class _FifoExpiryQueue:
+    '''
+    Queue of `(expiry, key)` pairs, for entries that all share one lifetime.
+
+    When all entries live for the same amount of time, the order in which
+    they're added is also the order in which they expire, so a plain deque is
+    enough and popping from its front is O(1).
+    '''
+    def __init__(self):
+        self._deque = collections.deque()
+
+    def push(self, expiry, key):
+        self._deque.append((expiry, key))
+
+    def get_first_expiry(self):
+        return self._deque[0][0]
+
+    def pop(self):
+        return self._deque.popleft()
+
+    def retain(self, filter_function):
+        '''Keep only the `(expiry, key)` pairs that pass `filter_function`.'''
+        self._deque = collections.deque(filter(filter_function, self._deque))
+
+    def clear(self):
+        self._deque.clear()
+
+    def __len__(self):
+        return len(self._deque)
+
+
+class _HeapExpiryQueue:
+    '''
+    Queue of `(expiry, key)` pairs, for entries that each have their lifetime.
+
+    Entries may be added in any order of expiry, so they're kept in a heap,
+    making both adding and popping O(log n).
+    '''
+    def __init__(self):
+        self._heap = []
+        # Breaks ties between equal expiries, so keys are never compared:
+        self._counter = itertools.count()
+
+    def push(self, expiry, key):
+        heapq.heappush(self._heap, (expiry, next(self._counter), key))
+
+    def get_first_expiry(self):
+        return self._heap[0][0]
+
+    def pop(self):
+        expiry, _, key = heapq.heappop(self._heap)
+        return expiry, key
+
+    def retain(self, filter_function):
+        '''Keep only the `(expiry, key)` pairs that pass `filter_function`.'''
+        self._heap = [item for item in self._heap
+                      if filter_function((item[0], item[2]))]
+        heapq.heapify(self._heap)
+
+    def clear(self):
+        self._heap.clear()
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class _CacheStore(collections.abc.MutableMapping):
+    '''
+    Mapping from cache keys to `_CacheEntry`s, with eviction and expiry.
+
+    This is the storage used by `cache` when given a `max_size`, `max_bytes`
+    or `time_to_keep`. With a `max_size` or `max_bytes`, entries are thrown
+    away when the store gets too big, as chosen by an `EvictionPolicy`. With a
+    `time_to_keep`, entries are removed once they expire.
+
+    Expiry is tracked in a queue, separately from the eviction policy's
+    bookkeeping. When all entries have the same
+    `time_to_keep`, the queue is a deque, and removing expired entries is
+    amortized O(1). When `time_to_keep` is a function that gives a lifetime for
+    each result, the queue is a heap.
+
+    Entries that are removed before they expire, (because of eviction or
+    because one of their sleekreffed arguments died,) are left in the queue
+    and skipped when they come up. The queue is compacted whenever it gets too
+    big compared to the store, which keeps it from growing unboundedly.
+    '''
+    def __init__(self, max_size=infinity, time_to_keep=None, get_now=None,
+                 memory_budget=None, get_size=None,
+                 eviction_policy=LruPolicy):
+        '''
+        Construct the `_CacheStore`.
+
+        `time_to_keep` is either `None`, a `timedelta` for all entries, or a
+        function that takes a result and returns the `timedelta` for keeping
+        it. `get_now` is a function that returns the current `datetime`.
+        `memory_budget` is a `MemoryBudget`, possibly shared with other stores,
+        and `get_size` is the function for measuring the size of results.
+        `eviction_policy` is the `EvictionPolicy` subclass to use when there's
+        a `max_size` or a `memory_budget`.
+        '''
+        self.max_size = max_size
+        self.time_to_keep = time_to_keep
+        self._get_now = get_now
+        self.memory_budget = memory_budget
+        self._get_size = get_size
+        self._entries = {}
+        '''Mapping from key to `_CacheEntry`.'''
+        if max_size != infinity or memory_budget is not None:
+            self.eviction_policy = eviction_policy(max_size)
+        else:
+            self.eviction_policy = None
+        self.n_bytes = 0 if memory_budget is not None else None
+        '''The total size of the results in the store, if tracked.'''
+        self.n_evictions = 0
+        '''The number of entries thrown away to keep within the limits.'''
+        self.n_expirations = 0
+        '''The number of entries removed because they expired.'''
+        if time_to_keep is None:
+            self._expiry_queue = None
+        elif callable(time_to_keep):
+            self._expiry_queue = _HeapExpiryQueue()
+        else:
+            self._expiry_queue = _FifoExpiryQueue()
+        if memory_budget is not None:
+            self._budget_serial_number = memory_budget._add_store(self)
+
+
+    def _pop_entry(self, key):
+        '''Remove the entry for `key`, updating the policy and byte counts.'''
+        entry = self._entries.pop(key)
+        if self.eviction_policy is not None:
+            self.eviction_policy.record_removal(key)
+        if self.memory_budget is not None:
+            self._count_bytes(-entry.size)
+        return entry
+
+
+    def _count_bytes(self, n_bytes):
+        self.n_bytes += n_bytes
+        self.memory_budget._add_n_bytes(self._budget_serial_number, n_bytes)
+
+
+    def _get_victim_entry(self):
+        '''Get the entry that the eviction policy would throw away next.'''
+        return self._entries[self.eviction_policy.get_victim()]
+
+
+    def _evict(self, incoming_key=None):
+        '''Throw away the entry chosen by the eviction policy.'''
+        key = self.eviction_policy.get_victim(incoming_key)
+        entry = self._entries.pop(key)
+        self.eviction_policy.record_eviction(key)
+        if self.memory_budget is not None:
+            self._count_bytes(-entry.size)
+        self.n_evictions += 1
+
+
+    def remove_expired_entries(self, now=None):
+        '''Remove all the entries that have expired by `now`.'''
+        if now is None:
+            now = self._get_now()
+        expiry_queue = self._expiry_queue
+        entries = self._entries
+        while expiry_queue and expiry_queue.get_first_expiry() <= now:
+            expiry, key = expiry_queue.pop()
+            try:
+                entry = entries[key]
+            except KeyError:
+                continue
+            if entry.expiry == expiry:
+                self._pop_entry(key)
+                self.n_expirations += 1
+            # Otherwise the key was removed and re-added with a newer expiry.
+
+
+    def _compact_expiry_queue(self):
+        '''Drop the queue items whose entries are no longer in the store.'''
+        entries = self._entries
+        def is_live(item):
+            expiry, key = item
+            entry = entries.get(key)
+            return entry is not None and entry.expiry == expiry
+        self._expiry_queue.retain(is_live)
+
+
+    def __getitem__(self, key):
+        if self._expiry_queue is None:
+            entry = self._entries[key]
+        else:
+            now = self._get_now()
+            self.remove_expired_entries(now)
+            entry = self._entries[key]
+            if entry.expiry <= now:
+                # Can happen only if the clock went backwards at some point.
+                self._pop_entry(key)
+                self.n_expirations += 1
+                raise KeyError(key)
+        if self.eviction_policy is not None:
+            self.eviction_policy.record_hit(key)
+            if self.memory_budget is not None:
+                entry.last_used = next(self.memory_budget._clock)
+        return entry
+
+
+    def __setitem__(self, key, entry):
+        entries = self._entries
+        if key in entries:
+            self._pop_entry(key)
+        memory_budget = self.memory_budget
+        if self.eviction_policy is not None:
+            # Making room before adding the entry, so the policy never chooses
+            # to evict the entry that's being added:
+            if entries and len(entries) >= self.max_size:
+                self._evict(incoming_key=key)
+            if memory_budget is not None:
+                entry.size = self._get_size(entry.value)
+                memory_budget._enforce(n_incoming_bytes=entry.size)
+        entries[key] = entry
+        if self._expiry_queue is not None:
+            time_to_keep = self.time_to_keep(entry.value) if \
+                             callable(self.time_to_keep) else self.time_to_keep
+            entry.expiry = self._get_now() + time_to_keep
+            self._expiry_queue.push(entry.expiry, key)
+            if len(self._expiry_queue) > 2 * len(entries) + 16:
+                self._compact_expiry_queue()
+        if self.eviction_policy is not None:
+            self.eviction_policy.record_insertion(key)
+            if memory_budget is not None:
+                entry.last_used = next(memory_budget._clock)
+                self._count_bytes(entry.size)
+                # In case the entry is too big to fit even on its own:
+                memory_budget._enforce()
+
+
+    def __delitem__(self, key):
+        self._pop_entry(key)
+
+
+    def pop(self, key, *default):
+        # Overridden so popping doesn't count as using the entry.
+        try:
+            return self._pop_entry(key)
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+
+
+    def __iter__(self):
+        return iter(self._entries)
+
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def clear(self):
+        self._entries.clear()
+        if self.eviction_policy is not None:
+            self.eviction_policy.clear()
+        if self.memory_budget is not None:
+            self._count_bytes(-self.n_bytes)
+        if self._expiry_queue is not None:
+            self._expiry_queue.clear()
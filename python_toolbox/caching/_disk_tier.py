@@ -0,0 +1,412 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines the `_DiskTier` class.
+
+See its documentation for more details.
+'''
+
+import contextlib
+import hashlib
+import os
+import pathlib
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import types
+import weakref
+
+try:
+    import fcntl
+except ImportError: # Not on Unix; we'll rely on SQLite's own locking.
+    fcntl = None
+
+from ._cache_store import _CacheEntry
+
+infinity = float('inf')
+
+
+class _UnstableArgument(Exception):
+    '''
+    An argument has no representation that's stable between processes.
+
+    This exception is used only internally for flow control; the call would
+    just skip the disk tier.
+    '''
+
+
+_max_unwritten_access_times = 1000
+_access_time_write_interval = 10 # Seconds.
+
+
+_simple_type_tags = {type(None): b'N', bool: b'B', int: b'I', float: b'F',
+                     complex: b'C'}
+
+
+def _get_canonical_number(number):
+    '''
+    Get the simplest number that's equal to `number`, like `1` for `1.0`.
+
+    `number` is a `bool`, `int`, `float` or `complex`.
+    '''
+    if type(number) is complex:
+        if number.imag:
+            return number
+        number = number.real
+    if type(number) is float and not number.is_integer():
+        return number
+    return int(number)
+
+
+def _encode_stably(thing, parts, is_exact=False):
+    '''
+    Append to `parts` a byte representation of `thing` that's process-stable.
+
+    Arguments of the same types and values get the same representation in any
+    process, regardless of hash randomization, so `dict`s and `set`s are
+    encoded in a sorted order. Only `None`, `bool`, `int`, `float`, `complex`,
+    `str`, `bytes` and `tuple`s, `list`s, `dict`s, `set`s and `frozenset`s of
+    them are supported; pickles of other objects may differ between equal
+    objects, so they raise `_UnstableArgument`.
+
+    Numbers that are equal, like `True`, `1` and `1.0`, get the same
+    representation, because they're the same key in the cache in memory too.
+    If `is_exact`, they get different ones, like for the constants of code.
+    '''
+    type_ = type(thing)
+    if type_ in _simple_type_tags:
+        if not is_exact and thing is not None:
+            thing = _get_canonical_number(thing)
+            type_ = type(thing)
+        parts.append(_simple_type_tags[type_])
+        parts.append(repr(thing).encode())
+        parts.append(b';')
+    elif type_ in (str, bytes):
+        data = thing.encode('utf-8', 'surrogatepass') if type_ is str \
+                                                                    else thing
+        parts.append(b'S' if type_ is str else b'Y')
+        parts.append(struct.pack('<Q', len(data)))
+        parts.append(data)
+    elif type_ in (tuple, list):
+        parts.append(b'T' if type_ is tuple else b'L')
+        parts.append(struct.pack('<Q', len(thing)))
+        for item in thing:
+            _encode_stably(item, parts, is_exact)
+    elif type_ in (dict, set, frozenset):
+        items = thing.items() if type_ is dict else ((item,) for item in thing)
+        encoded_items = sorted(_encode_stably_to_bytes(item, is_exact) for
+                               item in items)
+        parts.append({dict: b'D', set: b'E', frozenset: b'R'}[type_])
+        parts.append(struct.pack('<Q', len(encoded_items)))
+        parts.extend(encoded_items)
+    else:
+        raise _UnstableArgument
+
+
+def _encode_stably_to_bytes(thing, is_exact=False):
+    parts = []
+    _encode_stably(thing, parts, is_exact)
+    return b''.join(parts)
+
+
+def get_stable_key(function_name, args, kwargs):
+    '''
+    Get a key for a call that's the same in any process, or `None` if none.
+
+    `args` and `kwargs` are the arguments as normalized by the
+    signature-preserving wrapper, so `f(1)`, `f(1, 2)` and `f(b=2, a=1)` all
+    get the same key.
+    '''
+    try:
+        encoded_call = _encode_stably_to_bytes(
+            (function_name, args, sorted(kwargs.items()))
+        )
+    except _UnstableArgument:
+        return None
+    return hashlib.sha256(encoded_call).hexdigest()
+
+
+def _get_code_digest(code):
+    '''Get a hash of a code object that's the same in any process.'''
+    constants = []
+    for constant in code.co_consts:
+        if isinstance(constant, types.CodeType):
+            constants.append(_get_code_digest(constant))
+        else:
+            try:
+                constants.append(_encode_stably_to_bytes(constant,
+                                                         is_exact=True))
+            except _UnstableArgument: # e.g. `Ellipsis`.
+                constants.append(repr(constant))
+    return hashlib.sha256(_encode_stably_to_bytes(
+        (code.co_code, code.co_names, constants), is_exact=True
+    )).hexdigest()
+
+
+def get_function_name(function):
+    '''
+    Get the name that a function's entries are stored under on disk.
+
+    It's the function's qualified name with a hash of its code, so functions
+    with the same name, like lambdas in one module, don't share entries, and
+    entries of an older version of a function aren't used.
+    '''
+    name = f'{function.__module__}.{function.__qualname__}'
+    code = getattr(function, '__code__', None)
+    if code is None:
+        return name
+    return f'{name}:{_get_code_digest(code)[:16]}'
+
+
+@contextlib.contextmanager
+def _lock_file(lock_path, shared=False):
+    '''
+    Hold a lock on the lock file, exclusive for writers and shared for readers.
+
+    Readers don't block each other, only writers.
+    '''
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_access_times(connection, access_times):
+    '''
+    Write `access_times` into `last_access`, emptying it.
+
+    `access_times` is a `dict` of access times by key. Items are popped one by
+    one, so accesses recorded meanwhile by other threads aren't lost.
+    '''
+    rows = []
+    while True:
+        try:
+            key, access_time = access_times.popitem()
+        except KeyError:
+            break
+        rows.append((access_time, key))
+    connection.executemany(
+        'UPDATE entries SET last_access = max(last_access, ?) WHERE key = ?',
+        rows
+    )
+
+
+def _write_access_times_at_exit(database_path, lock_path, access_times):
+    '''Write the access times left by a disk tier that's gone.'''
+    if not access_times:
+        return
+    try:
+        connection = sqlite3.connect(str(database_path), timeout=60,
+                                     isolation_level=None)
+        try:
+            with _lock_file(lock_path):
+                _write_access_times(connection, access_times)
+        finally:
+            connection.close()
+    except (OSError, sqlite3.Error):
+        pass # The directory may have been deleted; these are just hints.
+
+
+_schema = '''
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        function_name TEXT NOT NULL,
+        value BLOB NOT NULL,
+        duration REAL NOT NULL,
+        size INTEGER NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS entries_by_last_access
+        ON entries (last_access);
+    CREATE INDEX IF NOT EXISTS entries_by_function_name
+        ON entries (function_name);
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        size INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO totals VALUES (0, 0);
+    CREATE TRIGGER IF NOT EXISTS count_inserted_entry AFTER INSERT ON entries
+        BEGIN UPDATE totals SET size = size + NEW.size; END;
+    CREATE TRIGGER IF NOT EXISTS count_deleted_entry AFTER DELETE ON entries
+        BEGIN UPDATE totals SET size = size - OLD.size; END;
+'''
+
+
+class _DiskTier:
+    '''
+    A persistent second tier for a cached function, stored in a directory.
+
+    Results are pickled into an SQLite database in the directory, so they
+    survive process restarts and are shared by all the processes on the host
+    that cache the same function with the same directory. Several functions
+    may share one directory; their entries are told apart by `function_name`,
+    (see `get_function_name`.)
+
+    Writers take an exclusive `flock` on a lock file in the directory, so
+    concurrent writers from different processes don't step on each other, and
+    readers take a shared one. When the total size of the pickled results goes
+    over `max_bytes`, the least-recently-accessed ones, of any function in the
+    directory, are deleted.
+
+    Reads don't write their access times right away; they're kept in memory
+    and written in a batch with the next write, or once there are many of
+    them or they're old, or when the tier is garbage-collected.
+
+    If `key_function` is given, it's called with the arguments of each call,
+    and the call is keyed by what it returns instead of by its arguments.
+    '''
+    def __init__(self, directory, function_name, max_bytes=infinity,
+                 key_function=None):
+        self.directory = pathlib.Path(directory)
+        self.function_name = function_name
+        self.max_bytes = max_bytes
+        self.key_function = key_function
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._database_path = self.directory / 'cache.sqlite3'
+        self._lock_path = self.directory / 'cache.lock'
+        self._local = threading.local()
+        self._access_times = {}
+        self._access_times_write_time = time.monotonic()
+        weakref.finalize(self, _write_access_times_at_exit,
+                         self._database_path, self._lock_path,
+                         self._access_times)
+        with _lock_file(self._lock_path):
+            self._get_connection().executescript(_schema)
+
+
+    def _get_connection(self):
+        '''Get an SQLite connection for this thread in this process.'''
+        local = self._local
+        # Connections can't be shared between threads, nor used after a fork:
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(str(self._database_path),
+                                               timeout=60,
+                                               isolation_level=None)
+            local.connection.execute('PRAGMA journal_mode=WAL')
+            local.pid = os.getpid()
+        return local.connection
+
+
+    @contextlib.contextmanager
+    def _write_transaction(self):
+        '''Make a write, along with the access times not written yet.'''
+        connection = self._get_connection()
+        with _lock_file(self._lock_path):
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                _write_access_times(connection, self._access_times)
+                self._access_times_write_time = time.monotonic()
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            else:
+                connection.execute('COMMIT')
+
+
+    def make_key(self, args, kwargs):
+        '''
+        Get the stable key for a call, or `None` if it has none.
+
+        Raises `TypeError` if the key that `key_function` returns has no
+        stable encoding.
+        '''
+        if self.key_function is None:
+            return get_stable_key(self.function_name, args, kwargs)
+        key_parts = self.key_function(*args, **kwargs)
+        key = get_stable_key(self.function_name, (key_parts,), {})
+        if key is None:
+            raise TypeError(
+                f"The disk key {key_parts!r} has no stable encoding; it must "
+                f"be made of `None`, `bool`, `int`, `float`, `complex`, "
+                f"`str`, `bytes` and `tuple`s, `list`s, `dict`s and `set`s "
+                f"of them."
+            )
+        return key
+
+
+    def get(self, key):
+        '''Get the `_CacheEntry` stored for `key`, or `None` if none.'''
+        with _lock_file(self._lock_path, shared=True):
+            row = self._get_connection().execute(
+                'SELECT value, duration FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value_data, duration = row
+        try:
+            value = pickle.loads(value_data)
+        except Exception:
+            # Probably pickled by a different version of the code.
+            return None
+        self._access_times[key] = time.time()
+        if len(self._access_times) >= _max_unwritten_access_times or \
+                        time.monotonic() - self._access_times_write_time >= \
+                                                  _access_time_write_interval:
+            self._write_access_times()
+        return _CacheEntry(value, duration)
+
+
+    def _write_access_times(self):
+        '''Write the access times that are kept in memory.'''
+        with self._write_transaction():
+            pass # The transaction writes them.
+
+
+    def set(self, key, entry):
+        '''Store `entry` for `key`, unless its value can't be pickled.'''
+        try:
+            value_data = pickle.dumps(entry.value,
+                                      protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return
+        with self._write_transaction() as connection:
+            connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            connection.execute(
+                'INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)',
+                (key, self.function_name, value_data, entry.duration,
+                 len(value_data), time.time())
+            )
+            if self.max_bytes != infinity:
+                self._evict(connection)
+
+
+    def _evict(self, connection):
+        '''Delete least-recently-accessed entries until within `max_bytes`.'''
+        (total_size,) = \
+                  connection.execute('SELECT size FROM totals').fetchone()
+        while total_size > self.max_bytes:
+            rows = connection.execute(
+                'SELECT key, size FROM entries ORDER BY last_access LIMIT 64'
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                connection.execute('DELETE FROM entries WHERE key = ?',
+                                   (key,))
+                total_size -= size
+                if total_size <= self.max_bytes:
+                    break
+
+
+    def clear(self):
+        '''Delete all the entries of our function.'''
+        with self._write_transaction() as connection:
+            connection.execute('DELETE FROM entries WHERE function_name = ?',
+                               (self.function_name,))
+
+
+    def __len__(self):
+        with _lock_file(self._lock_path, shared=True):
+            return self._get_connection().execute(
+                'SELECT COUNT(*) FROM entries WHERE function_name = ?',
+                (self.function_name,)
+            ).fetchone()[0]
@@ -0,0 +1,113 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines the `make_key_builder` function.
+
+See its documentation for more details.
+'''
+
+import inspect
+
+from python_toolbox.sleek_reffing import SleekCallArgs
+
+
+_atomic_types = frozenset((int, bool, float, complex, str, bytes, type(None)))
+'''
+Types that are hashable, immutable and non-weakreffable.
+
+A `SleekRef` to an instance of one of these types is just a strong reference,
+so a cache key made of them directly behaves exactly like a `SleekCallArgs`.
+'''
+
+_atomic_types_and_tuple = _atomic_types | {tuple}
+
+
+def _make_fast_key_or_none(key):
+    '''
+    Return `key` if it can be used as-is as a cache key, otherwise `None`.
+
+    `key` is a tuple of argument values. It can be used as-is if all the values
+    are of atomic types, or are tuples that turn out to be hashable. (A tuple
+    can't be weakreffed, so it's strongly referenced by a `SleekRef` anyway.)
+    '''
+    types = set(map(type, key))
+    if types <= _atomic_types:
+        return key
+    elif types <= _atomic_types_and_tuple:
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        else:
+            return key
+    else:
+        return None
+
+
+def make_key_builder(function, leading_args=()):
+    '''
+    Make a function that builds cache keys for calls to `function`.
+
+    The signature of `function` is analyzed only once, here, and a key builder
+    specialized for its shape is returned. The key builder is called as
+    `build_key(containing_dict, args, kwargs)`, where `args` and `kwargs` are
+    the arguments as passed by the signature-preserving wrapper made by the
+    `decorator` module. That wrapper already passes all the regular parameters
+    positionally, with defaults filled in, so `f(1)`, `f(1, 2)` and
+    `f(b=2, a=1)` all reach the key builder as `args=(1, 2)`.
+
+    When all the argument values are of simple immutable types, the key is a
+    plain tuple of them; otherwise the full `SleekCallArgs` treatment is used,
+    so weakreffable arguments are still not kept alive by the cache.
+
+    `leading_args` are arguments that `function` takes first, before `args`,
+    and that are the same for all calls, like a placeholder for `self`. They're
+    left out of `args` and of the keys.
+    '''
+    args_spec = inspect.getfullargspec(function)
+    keyword_only_names = tuple(args_spec.kwonlyargs)
+    n_keyword_only_arguments = len(keyword_only_names)
+
+    def build_sleek_key(containing_dict, args, kwargs):
+        return SleekCallArgs(containing_dict, function, *leading_args, *args,
+                             **kwargs)
+
+    if not (args_spec.args[len(leading_args):] or args_spec.varargs or
+                                     keyword_only_names or args_spec.varkw):
+
+        zero_arguments_key = ()
+
+        def build_key(containing_dict, args, kwargs):
+            return zero_arguments_key
+
+    elif not (keyword_only_names or args_spec.varkw):
+
+        def build_key(containing_dict, args, kwargs):
+            key = _make_fast_key_or_none(args)
+            if key is None:
+                return build_sleek_key(containing_dict, args, kwargs)
+            return key
+
+    elif not args_spec.varkw:
+
+        def build_key(containing_dict, args, kwargs):
+            key = _make_fast_key_or_none(
+                args + tuple(map(kwargs.__getitem__, keyword_only_names))
+            )
+            if key is None:
+                return build_sleek_key(containing_dict, args, kwargs)
+            return key
+
+    else: # args_spec.varkw
+
+        def build_key(containing_dict, args, kwargs):
+            if len(kwargs) == n_keyword_only_arguments:
+                key = _make_fast_key_or_none(
+                    args + tuple(map(kwargs.__getitem__, keyword_only_names))
+                )
+                if key is not None:
+                    return key
+            return build_sleek_key(containing_dict, args, kwargs)
+
+    return build_key
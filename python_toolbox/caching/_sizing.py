@@ -0,0 +1,196 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines the `get_size` function and the `MemoryBudget` class.
+
+See their documentation for more details.
+'''
+
+import collections.abc
+import itertools
+import sys
+import types
+import weakref
+
+from ._thread_safety import _ContentionCountingLock
+
+
+_atomic_types = frozenset((int, bool, float, complex, str, bytes, bytearray,
+                           type(None), range))
+'''Types whose instances don't reference other objects that we should count.'''
+
+_container_types = (tuple, list, set, frozenset, dict, collections.deque)
+
+_shared_types = (type, types.ModuleType, types.FunctionType,
+                 types.BuiltinFunctionType, types.MethodType)
+'''
+Types whose instances are shared by the whole program.
+
+Results that reference them aren't the ones keeping them in memory, so they
+aren't counted.
+'''
+
+
+def _is_numpy_array(thing):
+    return type(thing).__module__ == 'numpy' and hasattr(thing, 'nbytes') \
+                                                  and hasattr(thing, 'dtype')
+
+
+def _get_own_size(thing):
+    '''
+    Get the number of bytes used by `thing` itself, without its referents.
+
+    For objects that support the buffer protocol, such as `mmap` objects,
+    `sys.getsizeof` may not include the buffer, so the buffer's size is taken
+    if it's bigger.
+    '''
+    size = sys.getsizeof(thing, 0)
+    if type(thing) in _atomic_types or \
+                      isinstance(thing, _container_types + (memoryview,)) or \
+                                                        _is_numpy_array(thing):
+        # For a NumPy array that owns its data, `sys.getsizeof` includes the
+        # data. For a view, the data is counted as part of its base.
+        return size
+    try:
+        with memoryview(thing) as buffer:
+            return max(size, buffer.nbytes)
+    except TypeError:
+        return size
+
+
+def _iterate_referents(thing):
+    '''Iterate over the objects referenced by `thing` that should count.'''
+    type_ = type(thing)
+    if type_ in _atomic_types:
+        return
+    elif isinstance(thing, memoryview):
+        yield thing.obj
+    elif _is_numpy_array(thing):
+        if thing.base is not None:
+            yield thing.base
+        if thing.dtype.hasobject:
+            yield from thing.flat
+    elif isinstance(thing, collections.abc.Mapping):
+        for key, value in thing.items():
+            yield key
+            yield value
+    elif isinstance(thing, _container_types):
+        yield from thing
+    if hasattr(thing, '__dict__') and not isinstance(thing, _shared_types):
+        yield vars(thing)
+    for slot_name in getattr(type_, '__slots__', ()):
+        try:
+            yield getattr(thing, slot_name)
+        except AttributeError:
+            pass
+
+
+def get_size(thing):
+    '''
+    Estimate how many bytes of memory `thing` takes, including its referents.
+
+    This sums `sys.getsizeof` over `thing` and the objects it references,
+    recursively, counting each object only once. Containers, instance
+    `__dict__`s and `__slots__`, NumPy arrays, (including views and
+    object arrays,) and buffers like `memoryview` and `mmap` are understood.
+    Classes, modules and functions are shared by the whole program, so they
+    aren't counted.
+
+    This is the default sizer that `cache` uses for `max_bytes`.
+    '''
+    seen_ids = set()
+    total_size = 0
+    things_to_count = [thing]
+    while things_to_count:
+        thing = things_to_count.pop()
+        if id(thing) in seen_ids or isinstance(thing, _shared_types):
+            continue
+        seen_ids.add(id(thing))
+        total_size += _get_own_size(thing)
+        things_to_count.extend(_iterate_referents(thing))
+    return total_size
+
+
+class MemoryBudget:
+    '''
+    A limit on the memory taken by the results of one or more cached functions.
+
+    Pass a `MemoryBudget` as `max_bytes` to `cache` to have several cached
+    functions share it:
+
+        budget = caching.MemoryBudget(500 * 2**20)
+
+        @caching.cache(max_bytes=budget)
+        def f(x):
+            ...
+
+        @caching.cache(max_bytes=budget)
+        def g(x):
+            ...
+
+    When the total size of all the results cached by these functions goes over
+    the budget, the results that were least recently used among all of them
+    are thrown away until it's back under the budget.
+
+    Thread-safe cached functions that share a budget also share its lock.
+    '''
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        '''The maximum total size, in bytes, of the cached results.'''
+        self.n_bytes = 0
+        '''The current total size, in bytes, of the cached results.'''
+        self.lock = _ContentionCountingLock()
+        '''The lock used by thread-safe cached functions sharing the budget.'''
+        self._store_refs = {}
+        self._n_bytes_by_store = {}
+        self._serial_numbers = itertools.count()
+        self._clock = itertools.count()
+        '''Gives ever-growing numbers to mark the entries as used.'''
+
+
+    def _add_store(self, store):
+        '''
+        Start tracking `store` as one of the stores sharing the budget.
+
+        Returns the serial number that `store` should pass to `_add_n_bytes`.
+        When `store` is garbage-collected, its bytes are taken off the budget.
+        '''
+        serial_number = next(self._serial_numbers)
+        def forget_store(_):
+            del self._store_refs[serial_number]
+            self.n_bytes -= self._n_bytes_by_store.pop(serial_number)
+        self._store_refs[serial_number] = weakref.ref(store, forget_store)
+        self._n_bytes_by_store[serial_number] = 0
+        return serial_number
+
+
+    def _add_n_bytes(self, serial_number, n_bytes):
+        '''Count `n_bytes` more bytes, (may be negative,) for a store.'''
+        self._n_bytes_by_store[serial_number] += n_bytes
+        self.n_bytes += n_bytes
+
+
+    def _enforce(self, n_incoming_bytes=0):
+        '''
+        Evict entries until we're within the budget.
+
+        Specify `n_incoming_bytes` to make room for an entry that's about to be
+        added. Each eviction is made from the store whose eviction policy's
+        victim was least recently used.
+        '''
+        while self.n_bytes + n_incoming_bytes > self.max_bytes:
+            stores = [store for store in
+                      (store_ref() for store_ref in
+                       tuple(self._store_refs.values()))
+                      if store]
+            if not stores:
+                break
+            store = min(stores,
+                        key=lambda store: store._get_victim_entry().last_used)
+            store._evict()
+
+
+    def __repr__(self):
+        return (f'<{type(self).__name__}: {self.n_bytes} / {self.max_bytes} '
+                f'bytes>')
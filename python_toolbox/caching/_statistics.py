@@ -0,0 +1,122 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for getting statistics about cached functions.
+
+See their documentation for more details.
+'''
+
+import collections
+import weakref
+
+
+CacheInfo = collections.namedtuple(
+    'CacheInfo',
+    ('hits', 'misses', 'disk_hits', 'evictions', 'expirations', 'current_size',
+     'current_bytes', 'time_saved', 'latency_histogram')
+)
+'''
+Statistics about a cached function, as returned by its `cache_info` method.
+
+`hits` and `misses` are the numbers of calls that were and weren't answered
+from the cache in memory. In thread-safe caches, calls that waited for another
+thread to compute their result count as hits. `disk_hits` is the number of misses that were
+answered from the cache's disk tier, if it has one. `evictions` is the number
+of entries thrown away to keep within the cache's limits, and `expirations` is
+the number of entries removed because they outlived their `time_to_keep`.
+`current_size` is the number of entries currently in the cache, and
+`current_bytes` is their total size in bytes, or `None` if the cache has no
+`max_bytes`. `time_saved` is the total number of seconds that the hits would
+have taken to compute, according to how long each of their results took to
+compute the first time.
+
+`latency_histogram` is `None` unless the function was cached with
+`track_latency=True`. In that case it's a `dict` mapping an upper bound of call
+latency in seconds, (always a power of 2 of nanoseconds,) to the number of
+calls that took up to that long but more than the previous bound.
+'''
+
+
+_cached_functions = weakref.WeakSet()
+
+
+def get_cached_functions():
+    '''
+    Get a list of all the functions currently cached with `cache` in process.
+
+    Functions that were garbage-collected aren't included.
+    '''
+    return sorted(
+        _cached_functions,
+        key=lambda function: (function.__module__, function.__qualname__)
+    )
+
+
+def get_cache_infos():
+    '''
+    Get a `CacheInfo` for every function currently cached with `cache`.
+
+    Returns an ordered `dict` mapping each cached function to its `CacheInfo`.
+    This is useful for finding which cached functions pay off, and which just
+    take up memory.
+    '''
+    return collections.OrderedDict(
+        (function, function.cache_info()) for function in
+        get_cached_functions()
+    )
+
+
+def _get_latency_bucket(latency):
+    '''
+    Get the histogram bucket for a call that took `latency` seconds.
+
+    The bucket is the smallest power of 2 of nanoseconds that's at least
+    `latency`, in seconds.
+    '''
+    n_nanoseconds = max(int(latency * 1e9), 1)
+    return (1 << (n_nanoseconds - 1).bit_length()) / 1e9
+
+
+class _CacheStatistics:
+    '''Counters of the calls made to a cached function.'''
+    def __init__(self, track_latency=False):
+        self.n_hits = 0
+        self.n_misses = 0
+        self.n_disk_hits = 0
+        self.time_saved = 0.0
+        self.latency_histogram = \
+                             collections.Counter() if track_latency else None
+
+
+    def add(self, other):
+        '''Add the counters of `other` to ours, like of another lock stripe.'''
+        self.n_hits += other.n_hits
+        self.n_misses += other.n_misses
+        self.n_disk_hits += other.n_disk_hits
+        self.time_saved += other.time_saved
+        if self.latency_histogram is not None:
+            self.latency_histogram.update(other.latency_histogram)
+
+
+    def record_latency(self, latency):
+        '''Count a call that took `latency` seconds in the histogram.'''
+        self.latency_histogram[_get_latency_bucket(latency)] += 1
+
+
+    def get_cache_info(self, store):
+        '''Get a `CacheInfo` of these statistics and of the cache `store`.'''
+        return CacheInfo(
+            hits=self.n_hits,
+            misses=self.n_misses,
+            disk_hits=self.n_disk_hits,
+            evictions=getattr(store, 'n_evictions', 0),
+            expirations=getattr(store, 'n_expirations', 0),
+            current_size=len(store),
+            current_bytes=getattr(store, 'n_bytes', None),
+            time_saved=self.time_saved,
+            latency_histogram=(
+                None if self.latency_histogram is None else
+                dict(sorted(self.latency_histogram.items()))
+            )
+        )
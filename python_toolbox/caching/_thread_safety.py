@@ -0,0 +1,133 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools used by `cache` when it's given `thread_safe=True`.
+
+See their documentation for more details.
+'''
+
+import collections
+import itertools
+import threading
+
+from ._statistics import _CacheStatistics
+
+
+n_lock_stripes = 16
+'''
+The number of locks that the cache of a thread-safe function is split into.
+
+Only caches that are plain `dict`s, (with no `max_size`, `time_to_keep` or
+`max_bytes`,) are split; the others keep one order of all their entries, which
+every call may change, so they have a single lock.
+'''
+
+
+LockStatistics = collections.namedtuple(
+    'LockStatistics',
+    ('acquisitions', 'contentions', 'coalesced_calls')
+)
+'''
+Statistics about the locks of a thread-safe cached function.
+
+`acquisitions` is the number of times its locks were taken, `contentions` is
+how many of these times the lock was already held by another thread, and
+`coalesced_calls` is the number of calls that waited for another thread to
+compute their result instead of computing it themselves.
+'''
+
+
+class _ContentionCountingLock:
+    '''
+    A lock that counts how many times it was acquired and how often contended.
+
+    The counters are only updated while the lock is held, so they're exact.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.n_acquisitions = 0
+        self.n_contentions = 0
+
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            self._lock.acquire()
+            self.n_contentions += 1
+        self.n_acquisitions += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self._lock.release()
+
+
+class _LockStripe:
+    '''
+    A lock for some of the keys of a thread-safe cache, with their state.
+
+    Each key belongs to one stripe, by its hash, so calls for keys of
+    different stripes don't contend. `store` has the entries of the stripe's
+    keys. The stripe also has the futures of the computations in flight for
+    its keys, the keys waiting to be deleted and the statistics of its calls.
+    '''
+    def __init__(self, store, lock, track_latency=False):
+        self.store = store
+        self.lock = lock
+        self.statistics = _CacheStatistics(track_latency=track_latency)
+        self.in_flight_futures = {}
+        self.n_coalesced_calls = 0
+        self.pending_keys = collections.deque()
+
+    def delete_pending_keys(self):
+        '''Delete the pending keys from `store`. Call with the lock held.'''
+        pending_keys = self.pending_keys
+        while pending_keys:
+            self.store.pop(pending_keys.popleft(), None)
+
+
+class _StripedDict(collections.abc.MutableMapping):
+    '''
+    A `dict` split into `n_parts` `dict`s by the hashes of the keys.
+
+    Part `i` has the keys whose hash is `i` modulo `n_parts`, like the stripes
+    of `_DeferredDeleter`.
+    '''
+    def __init__(self, n_parts):
+        self.parts = tuple({} for _ in range(n_parts))
+
+    def get_part(self, key):
+        return self.parts[hash(key) % len(self.parts)]
+
+    __getitem__ = lambda self, key: self.get_part(key)[key]
+
+    def __setitem__(self, key, value):
+        self.get_part(key)[key] = value
+
+    def __delitem__(self, key):
+        del self.get_part(key)[key]
+
+    __iter__ = lambda self: itertools.chain.from_iterable(self.parts)
+    __len__ = lambda self: sum(map(len, self.parts))
+
+
+class _DeferredDeleter:
+    '''
+    Stand-in for the cache's `dict` in `SleekCallArgs` of a thread-safe cache.
+
+    When one of the arguments of a `SleekCallArgs` dies, it deletes itself
+    from its containing `dict`. This may happen at any time on any thread,
+    including a thread that's in the middle of changing the cache while
+    holding a lock, so the deletion is only recorded in the key's
+    `_LockStripe`, and it's done later by whoever takes its lock next.
+    '''
+    def __init__(self, stripes):
+        self.stripes = stripes
+
+    def get_stripe(self, key):
+        '''Get the `_LockStripe` of `key`.'''
+        return self.stripes[hash(key) % len(self.stripes)]
+
+    def __delitem__(self, key):
+        self.get_stripe(key).pending_keys.append(key)
+
+    def __bool__(self):
+        return True
@@ -7,6 +7,13 @@ Defines the `CachedProperty` class.
 See its documentation for more details.
 '''
 
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import threading
+import weakref
+
 from python_toolbox import misc_tools
 from python_toolbox.third_party.decorator import decorator
 
@@ -32,9 +39,38 @@ class CachedProperty(misc_tools.OwnNameDiscoveringDescriptor):
     returned instead of using a getter. (It can be a totally static value like
     `0`). If this value happens to be a callable but you'd still like it to be
     used as a static value, use `force_value_not_getter=True`.
+
+    The value is cached as an attribute of the object, so once it's computed,
+    reading it doesn't even go through the property. For objects that have no
+    `__dict__`, like objects of classes with `__slots__`, the value is cached
+    in a side table on the property instead, keyed by the object's identity
+    and cleared when the object dies. Such objects must be weakreffable, (i.e.
+    have `__weakref__` in their `__slots__`,) or a `TypeError` is raised.
+
+    Pass `thread_safe=True` if the object may be used from multiple threads.
+    Then when several threads read the property at once before it's computed,
+    only one of them calls the getter, and the others wait for its value. (Or
+    its exception.) Reading a value that's already computed takes no lock.
+
+    Call `invalidate` on the property to throw away its cached value for an
+    object, so the next read computes it again:
+
+        MyObject.personality.invalidate(my_object)
+
+    Pass `depends_on` with the names of other cached properties of the class
+    that this property's value is computed from. Invalidating one of them
+    invalidates this property too.
+
+    If the getter is a coroutine function, (an `async def` function,) reading
+    the property schedules it as a task on the running `asyncio` loop and
+    returns the task, which is cached. Reading it with no running loop raises
+    `RuntimeError`. Await it to get the value; awaiting it again gives the same
+    value without calling the getter again. If the task fails or is
+    cancelled, it's invalidated, so the next read tries again.
     '''
     def __init__(self, getter_or_value, doc=None, name=None,
-                 force_value_not_getter=False):
+                 force_value_not_getter=False, *, thread_safe=False,
+                 depends_on=()):
         '''
         Construct the cached property.
 
@@ -51,6 +87,19 @@ class CachedProperty(misc_tools.OwnNameDiscoveringDescriptor):
         else:
             self.getter = lambda thing: getter_or_value
         self.__doc__ = doc or getattr(self.getter, '__doc__', None)
+        self.thread_safe = thread_safe
+        self.depends_on = frozenset(depends_on)
+        self.is_async = inspect.iscoroutinefunction(self.getter)
+        self._side_table = {}
+        '''
+        Mapping from `id(thing)` to `(weakref, value)`.
+
+        Used for objects that have no `__dict__` to cache the value in.
+        '''
+        if thread_safe:
+            self._lock = threading.Lock()
+            self._in_flight_futures = {}
+        self._dependents_by_type = weakref.WeakKeyDictionary()
 
 
     def __get__(self, thing, our_type=None):
@@ -59,13 +108,139 @@ class CachedProperty(misc_tools.OwnNameDiscoveringDescriptor):
             # We're being accessed from the class itself, not from an object
             return self
 
+        if self._side_table:
+            try:
+                return self._side_table[id(thing)][1]
+            except KeyError:
+                pass
+
+        if self.thread_safe:
+            return self._get_thread_safely(thing, our_type)
+
+        value = self._compute(thing)
+        self._store(thing, self.get_our_name(thing, our_type=our_type), value)
+        return value
+
+
+    def _compute(self, thing):
         value = self.getter(thing)
+        if self.is_async:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                value.close() # Not to warn that it was never awaited.
+                raise
+            value = loop.create_task(value)
+            value.add_done_callback(
+                functools.partial(self._forget_failed_task, thing)
+            )
+        return value
 
-        setattr(thing, self.get_our_name(thing, our_type=our_type), value)
 
+    def _store(self, thing, name, value):
+        try:
+            setattr(thing, name, value)
+        except AttributeError:
+            # No `__dict__`, so we can't shadow ourselves with an attribute.
+            key = id(thing)
+            side_table = self._side_table
+            try:
+                ref = weakref.ref(thing, lambda _: side_table.pop(key, None))
+            except TypeError:
+                # A strong reference would keep `thing` alive forever.
+                raise TypeError(
+                    f"Can't cache {self!r} on a {type(thing).__name__!r} "
+                    f"object, because it has neither a `__dict__` nor a "
+                    f"`__weakref__` slot."
+                ) from None
+            side_table[key] = (ref, value)
+
+
+    def _get_cached_value(self, thing, name):
+        '''Get the value cached for `thing`, or raise `KeyError`.'''
+        try:
+            return self._side_table[id(thing)][1]
+        except KeyError:
+            return getattr(thing, '__dict__', {})[name]
+
+
+    def _get_thread_safely(self, thing, our_type):
+        name = self.get_our_name(thing, our_type=our_type)
+        key = id(thing)
+        with self._lock:
+            try:
+                return self._get_cached_value(thing, name)
+            except KeyError:
+                pass
+            future = self._in_flight_futures.get(key)
+            is_computing = future is None
+            if is_computing:
+                future = self._in_flight_futures[key] = \
+                                                   concurrent.futures.Future()
+        if not is_computing:
+            return future.result()
+        try:
+            value = self._compute(thing)
+            self._store(thing, name, value)
+        except BaseException as exception:
+            with self._lock:
+                del self._in_flight_futures[key]
+            future.set_exception(exception)
+            raise
+        with self._lock:
+            del self._in_flight_futures[key]
+        future.set_result(value)
         return value
 
 
+    def _forget_failed_task(self, thing, task):
+        if not (task.cancelled() or task.exception() is not None):
+            return
+        try:
+            cached_value = self._get_cached_value(thing,
+                                                  self.get_our_name(thing))
+        except KeyError:
+            return
+        if cached_value is task:
+            self.invalidate(thing)
+
+
+    def _get_dependents(self, our_type):
+        '''Get the cached properties of `our_type` that depend on us.'''
+        try:
+            return self._dependents_by_type[our_type]
+        except KeyError:
+            our_name = self.get_our_name(None, our_type=our_type)
+            dependents = self._dependents_by_type[our_type] = [
+                value for klass in our_type.__mro__
+                for value in vars(klass).values()
+                if isinstance(value, CachedProperty) and
+                our_name in value.depends_on
+            ]
+            return dependents
+
+
+    def invalidate(self, thing):
+        '''
+        Throw away the value cached for `thing`, if there is one.
+
+        The values of cached properties that depend on this one are thrown away
+        too.
+        '''
+        self._invalidate(thing, set())
+
+
+    def _invalidate(self, thing, invalidated_properties):
+        invalidated_properties.add(self)
+        self._side_table.pop(id(thing), None)
+        name = self.get_our_name(thing)
+        if name in getattr(thing, '__dict__', ()):
+            delattr(thing, name)
+        for dependent in self._get_dependents(type(thing)):
+            if dependent not in invalidated_properties:
+                dependent._invalidate(thing, invalidated_properties)
+
+
     def __call__(self, method_function):
         '''
         Decorate method to use value of `CachedProperty` as a context manager.
@@ -7,13 +7,42 @@ Defines the `CachedType` metaclass.
 See its documentation for more details.
 '''
 
+import inspect
+import weakref
+
 from python_toolbox.sleek_reffing import SleekCallArgs
+from python_toolbox.third_party.decorator import decorator as decorator_
+
+from ._key_building import make_key_builder
+from ._cache_store import _CacheStore, _CacheEntry
 
 
 class SelfPlaceholder:
     '''Placeholder for `self` when storing call-args.'''
 
 
+def _return_arguments(function, *args, **kwargs):
+    return args, kwargs
+
+
+class _KeyDeleter:
+    '''
+    Stand-in for the cache in `SleekCallArgs`, deleting from several caches.
+
+    When one of the arguments of a `SleekCallArgs` dies, it deletes itself
+    from its containing `dict`; this deletes it from all of `caches`.
+    '''
+    def __init__(self, *caches):
+        self.caches = caches
+
+    def __delitem__(self, key):
+        for cache in self.caches:
+            cache.pop(key, None)
+
+    def __bool__(self):
+        return True
+
+
 class CachedType(type):
     '''
     A metaclass for sharing instances.
@@ -39,24 +68,121 @@ class CachedType(type):
     you can avoid memory leaks when using weakreffable arguments, but if you
     ever want to use non-weakreffable arguments you are still able to.
     (Assuming you don't mind the memory leaks.)
+
+    The signature of `__init__` is analyzed once, when the class is created,
+    so getting an instance that already exists is about as cheap as a hit of a
+    function cached with `cache`.
+
+    By default every distinct instance is kept forever. You may specify a
+    `max_size` as a class keyword argument, to keep only that many instances,
+    throwing away the least recently used ones:
+
+        class Point(metaclass=caching.CachedType, max_size=10_000):
+            ...
+
+    You may also specify `weak_values=True`, to keep each instance only as
+    long as something else references it. (The class must then support
+    weakrefs.) With a `max_size` too, the `max_size` most recently used
+    instances are kept alive by the cache even when nothing else references
+    them. Subclasses inherit these options unless they specify their own.
     '''
 
-    def __new__(mcls, *args, **kwargs):
+    def __new__(mcls, *args, max_size=None, weak_values=None, **kwargs):
         result = super().__new__(mcls, *args, **kwargs)
-        result.__cache = {}
+        base = next((base for base in result.__mro__[1:]
+                     if isinstance(base, CachedType)), None)
+        if max_size is None and base is not None:
+            max_size = base.__max_size
+        if weak_values is None:
+            weak_values = base is not None and base.__weak_values
+        result.__max_size = max_size
+        result.__weak_values = weak_values
+        result.__get_instance = result.__make_instance_getter()
         return result
 
 
+    def __init__(cls, *args, max_size=None, weak_values=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+
+    def __make_instance_getter(cls):
+        '''
+        Make the function that gets the instance for a call to the class.
+
+        The function is specialized for the class's options, and for the
+        signature of its `__init__`.
+        '''
+        construct = super().__call__
+        init = cls.__init__
+        max_size = cls.__max_size
+        if cls.__weak_values:
+            cls.__cache = cache = weakref.WeakValueDictionary()
+        elif max_size is not None:
+            cls.__cache = cache = _CacheStore(max_size=max_size)
+        else:
+            cls.__cache = cache = {}
+
+        if cls.__weak_values and max_size is not None:
+            cls.__strong_cache = strong_cache = _CacheStore(max_size=max_size)
+            # Keys whose arguments die must leave the strong cache too, or
+            # they'd keep their instances alive:
+            key_container = _KeyDeleter(cache, strong_cache)
+        else:
+            strong_cache = None
+            key_container = cache
+
+        if inspect.isfunction(init):
+            normalize = decorator_(_return_arguments, init)
+            build_key = make_key_builder(init, leading_args=(SelfPlaceholder,))
+
+            def get_key(args, kwargs):
+                args, kwargs = normalize(SelfPlaceholder, *args, **kwargs)
+                return build_key(key_container, args[1:], kwargs)
+
+        else: # Like `object.__init__`, which we can't analyze.
+
+            def get_key(args, kwargs):
+                return SleekCallArgs(key_container, init, SelfPlaceholder,
+                                     *args, **kwargs)
+
+        if cls.__weak_values:
+
+            def get_instance(args, kwargs):
+                key = get_key(args, kwargs)
+                try:
+                    instance = cache[key]
+                except KeyError:
+                    cache[key] = instance = construct(*args, **kwargs)
+                if strong_cache is not None:
+                    try:
+                        strong_cache[key]
+                    except KeyError:
+                        strong_cache[key] = _CacheEntry(instance)
+                return instance
+
+        elif max_size is not None:
+
+            def get_instance(args, kwargs):
+                key = get_key(args, kwargs)
+                try:
+                    return cache[key].value
+                except KeyError:
+                    instance = construct(*args, **kwargs)
+                    cache[key] = _CacheEntry(instance)
+                    return instance
+
+        else:
+
+            def get_instance(args, kwargs):
+                key = get_key(args, kwargs)
+                try:
+                    return cache[key]
+                except KeyError:
+                    cache[key] = instance = construct(*args, **kwargs)
+                    return instance
+
+        return get_instance
+
+
     def __call__(cls, *args, **kwargs):
-        sleek_call_args = SleekCallArgs(
-            cls.__cache,
-            cls.__init__,
-            *((SelfPlaceholder,) + args),
-            **kwargs
-        )
-        try:
-            return cls.__cache[sleek_call_args]
-        except KeyError:
-            cls.__cache[sleek_call_args] = value = \
-                                              super().__call__(*args, **kwargs)
-            return value
+        return cls.__get_instance(args, kwargs)
@@ -6,16 +6,28 @@ Defines the `cache` decorator.
 
 See its documentation for more details.
 '''
-# todo: examine thread-safety
 
+import asyncio
 import datetime as datetime_module
+import concurrent.futures
+import inspect
+import time
 
 from python_toolbox import misc_tools
-from python_toolbox import binary_search
 from python_toolbox import decorator_tools
-from python_toolbox.sleek_reffing import SleekCallArgs
 from python_toolbox.third_party.decorator import decorator as decorator_
 
+from ._key_building import make_key_builder
+from ._cache_store import _CacheStore, _CacheEntry
+from .eviction_policies import _get_policy_type
+from ._sizing import get_size, MemoryBudget
+from ._disk_tier import _DiskTier, get_function_name
+from ._statistics import _CacheStatistics, _cached_functions
+from ._asynchronous import _SharedTask
+from ._thread_safety import (LockStatistics, _ContentionCountingLock,
+                             _LockStripe, _StripedDict, _DeferredDeleter,
+                             n_lock_stripes)
+
 infinity = float('inf')
 
 
@@ -32,8 +44,25 @@ def _get_now():
     return datetime_module.datetime.now()
 
 
+def _mark_coroutine_function(function):
+    '''
+    Mark `function` as a coroutine function for `inspect` and `asyncio`.
+
+    The wrapper made by the `decorator` module for a coroutine function is a
+    regular function that returns a coroutine, so it must be marked for
+    `inspect.iscoroutinefunction` to recognize it.
+    '''
+    if hasattr(inspect, 'markcoroutinefunction'): # Python 3.12+
+        inspect.markcoroutinefunction(function)
+    else:
+        function._is_coroutine = asyncio.coroutines._is_coroutine
+
+
 @decorator_tools.helpful_decorator_builder
-def cache(max_size=infinity, time_to_keep=None):
+def cache(max_size=infinity, time_to_keep=None, max_bytes=None,
+          get_size=get_size, eviction_policy='lru', disk_directory=None,
+          max_disk_bytes=infinity, disk_key_function=None, thread_safe=False,
+          track_latency=False):
     '''
     Cache a function, saving results so they won't have to be computed again.
 
@@ -56,24 +85,91 @@ def cache(max_size=infinity, time_to_keep=None):
     ever want to use non-weakreffable arguments you are still able to.
     (Assuming you don't mind the memory leaks.)
 
+    The function's signature is analyzed once, when it's decorated, to make a
+    key builder specialized for it. When all the arguments of a call are of
+    simple immutable types like `int` and `str`, (which can't be weakreffed
+    anyway,) they're used directly as the cache key, and the costlier
+    sleekreffing machinery is skipped.
+
     You may optionally specify a `max_size` for maximum number of cached
     results to store; old entries are thrown away according to a
     least-recently-used alogrithm. (Often abbreivated LRU.)
 
+    You may optionally specify a `max_bytes` for the maximum total size in
+    bytes of the cached results. Results are thrown away in least-recently-used
+    order until the total is within `max_bytes`. Sizes are measured with
+    `caching.get_size`, which estimates the size of an object and everything it
+    references, or with any other function you pass as `get_size`. To have
+    several cached functions share one limit, pass the same
+    `caching.MemoryBudget` as `max_bytes` to all of them.
+
+    Instead of least-recently-used order, you may specify another
+    `eviction_policy` for choosing which results to throw away: `'lfu'` for
+    least-frequently-used, `'arc'` for the Adaptive Replacement Cache
+    algorithm, or `'tinylfu'` for W-TinyLFU, which admits new results only if
+    they're likely to be used more than the ones they'd replace. The last two
+    aren't flushed by scans over keys that are used only once. You may also
+    pass an `EvictionPolicy` subclass of your own; see
+    `caching.eviction_policies`.
+
     You may optionally specific a `time_to_keep`, which is a time period after
     which a cache entry will expire. (Pass in either a `timedelta` object or
-    keyword arguments to create one.)
+    keyword arguments to create one.) Since all entries live for the same
+    period, they expire in the order they were added, and expired entries are
+    removed from the front of a queue in amortized O(1) time. `time_to_keep`
+    may be combined with `max_size`.
+
+    If different results should be kept for different periods, pass as
+    `time_to_keep` a function that takes a result and returns a `timedelta`
+    for keeping it. Expiry is then tracked with a heap.
+
+    You may optionally specify a `disk_directory`, to add a persistent second
+    tier to the cache. Results are then also pickled into an SQLite database in
+    that directory, so they survive process restarts and are shared between
+    all the processes on the host that cache the same function with the same
+    directory. Calls that miss the in-memory cache look for their result on
+    disk before computing it. Entries on disk are keyed by a hash of the
+    function's qualified name, its code and its arguments, normalized the same
+    way as in memory, which is the same in any process. Only arguments that
+    are `None`, `bool`s, `int`s, `float`s, `complex`es, `str`s, `bytes` and
+    `tuple`s, `list`s, `dict`s, `set`s and `frozenset`s of them can be hashed
+    that way; calls with other arguments skip the disk, unless you specify a
+    `disk_key_function`. It's called with the arguments of each call, and
+    should return a key made of the types above, which is used instead of the
+    arguments. Results that can't be pickled skip the disk too. You may also
+    specify `max_disk_bytes`; when the pickled results in the directory take
+    more than that, the least-recently-accessed ones are deleted.
+    `cache_clear()` clears the function's entries on disk too.
+
+    By default the cache isn't thread-safe. Specify `thread_safe=True` to make
+    it safe for using from multiple threads at once. The cache is then guarded
+    by locks, which are held only while the cache itself is being read or
+    changed, never while the function is running. A cache with no `max_size`,
+    `time_to_keep` or `max_bytes` is split by the hashes of the keys into 16
+    stripes with a lock each, so calls with different arguments rarely
+    contend; other caches keep one order of all their entries, so they have
+    one lock. When several threads call the function with the same arguments
+    and there's no cached result yet, only one of them computes it, and the
+    others wait for its result. (Or its exception.) The cached function then
+    has a `cache_lock_statistics` method that returns a `LockStatistics` with
+    the counts of lock acquisitions, lock contentions and calls that waited
+    for another thread's computation, summed over its locks.
+
+    `cache` may also decorate a coroutine function, (i.e. an `async def`
+    function,) in which case the results it returns when awaited are cached,
+    rather than the coroutine objects. Concurrent awaiters of the same
+    arguments share a single in-flight task. When one of them is cancelled the
+    others keep waiting, and only when all of them are cancelled is the task
+    cancelled. Exceptions and cancelled computations aren't cached.
+
+    The cached function has a `cache_info` method that returns a `CacheInfo`
+    with its numbers of hits, misses, evictions and expirations, its current
+    size and the total time its hits have saved. Specify `track_latency=True`
+    to also get a histogram of the latency of calls, at the cost of timing
+    each call. `caching.get_cache_infos()` gets a `CacheInfo` for every cached
+    function in the process.
     '''
-    # todo idea: figure how how complex the function's argspec is, and then
-    # compile a function accordingly, so functions with a simple argspec won't
-    # have to go through so much shit. update: probably it will help only for
-    # completely argumentless function. so do one for those.
-
-    from python_toolbox.nifty_collections import OrderedDict
-
-    if time_to_keep is not None:
-        if max_size != infinity:
-            raise NotImplementedError
+    if time_to_keep is not None and not callable(time_to_keep):
         if not isinstance(time_to_keep, datetime_module.timedelta):
             try:
                 time_to_keep = datetime_module.timedelta(**time_to_keep)
@@ -85,95 +181,297 @@ def cache(max_size=infinity, time_to_keep=None):
                 )
         assert isinstance(time_to_keep, datetime_module.timedelta)
 
+    eviction_policy_type = _get_policy_type(eviction_policy)
+
 
     def decorator(function):
 
         # In case we're being given a function that is already cached:
         if getattr(function, 'is_cached', False): return function
 
-        if max_size == infinity:
-
-            if time_to_keep:
-
-                sorting_key_function = lambda sleek_call_args: \
-                                              cached._cache[sleek_call_args][1]
-
-
-                def remove_expired_entries():
-                    almost_cutting_point = \
-                                          binary_search.binary_search_by_index(
-                        list(cached._cache.keys()),
-                        _get_now(),
-                        sorting_key_function,
-                        rounding=binary_search.LOW
-                    )
-                    if almost_cutting_point is not None:
-                        cutting_point = almost_cutting_point + 1
-                        for key in list(cached._cache.keys())[:cutting_point]:
-                            del cached._cache[key]
-
-                @misc_tools.set_attributes(_cache=OrderedDict())
-                def cached(function, *args, **kwargs):
-                    remove_expired_entries()
-                    sleek_call_args = \
-                        SleekCallArgs(cached._cache, function, *args, **kwargs)
-                    try:
-                        return cached._cache[sleek_call_args][0]
-                    except KeyError:
-                        value = function(*args, **kwargs)
-                        cached._cache[sleek_call_args] = (
-                            value,
-                            _get_now() + time_to_keep
-                        )
-                        cached._cache.sort(key=sorting_key_function)
-                        return value
-
-            else: # not time_to_keep
-
-                @misc_tools.set_attributes(_cache={})
-                def cached(function, *args, **kwargs):
-                    sleek_call_args = \
-                        SleekCallArgs(cached._cache, function, *args, **kwargs)
-                    try:
-                        return cached._cache[sleek_call_args]
-                    except KeyError:
-                        cached._cache[sleek_call_args] = value = \
-                              function(*args, **kwargs)
-                        return value
+        build_key = make_key_builder(function)
+
+        if max_bytes is None:
+            memory_budget = None
+        elif isinstance(max_bytes, MemoryBudget):
+            memory_budget = max_bytes
+        else:
+            memory_budget = MemoryBudget(max_bytes)
+
+        if max_size == infinity and time_to_keep is None and \
+                                                         memory_budget is None:
+            store = {}
+        else:
+            # `_get_now` is looked up on each call so it could be patched:
+            store = _CacheStore(max_size=max_size, time_to_keep=time_to_keep,
+                                get_now=lambda: _get_now(),
+                                memory_budget=memory_budget,
+                                get_size=get_size,
+                                eviction_policy=eviction_policy_type)
+
+        statistics = _CacheStatistics(track_latency=track_latency)
+        is_coroutine_function = inspect.iscoroutinefunction(function)
+
+        if disk_directory is None:
+            disk_tier = None
+        else:
+            disk_tier = _DiskTier(disk_directory, get_function_name(function),
+                                  max_bytes=max_disk_bytes,
+                                  key_function=disk_key_function)
+
+        def load_from_disk(args, kwargs):
+            '''
+            Try to load the entry for a call from the disk tier.
+
+            Returns `(entry, disk_key)`, where `entry` is `None` if it's not
+            on disk, and `disk_key` is `None` if the call can't use the disk.
+            '''
+            if disk_tier is None:
+                return None, None
+            disk_key = disk_tier.make_key(args, kwargs)
+            if disk_key is None:
+                return None, None
+            return disk_tier.get(disk_key), disk_key
+
+        def compute_entry(args, kwargs):
+            '''
+            Get the entry for a call that isn't cached in memory.
+
+            Returns `(entry, is_from_disk)`.
+            '''
+            entry, disk_key = load_from_disk(args, kwargs)
+            if entry is not None:
+                return entry, True
+            call_start_time = time.perf_counter()
+            value = function(*args, **kwargs)
+            entry = _CacheEntry(value, time.perf_counter() - call_start_time)
+            if disk_key is not None:
+                disk_tier.set(disk_key, entry)
+            return entry, False
+
+        async def compute_entry_asynchronously(args, kwargs):
+            '''Like `compute_entry`, for a coroutine function.'''
+            entry, disk_key = load_from_disk(args, kwargs)
+            if entry is not None:
+                return entry, True
+            call_start_time = time.perf_counter()
+            value = await function(*args, **kwargs)
+            entry = _CacheEntry(value, time.perf_counter() - call_start_time)
+            if disk_key is not None:
+                disk_tier.set(disk_key, entry)
+            return entry, False
+
+        if is_coroutine_function:
+
+            if thread_safe:
+                raise NotImplementedError(
+                    "`thread_safe=True` isn't supported for coroutine "
+                    "functions. Concurrent calls within an event loop are "
+                    "always coalesced anyway."
+                )
 
-        else: # max_size < infinity
+            shared_tasks = {}
 
-            @misc_tools.set_attributes(_cache=OrderedDict())
+            @misc_tools.set_attributes(_cache=store)
+            async def cached(function, *args, **kwargs):
+                if track_latency:
+                    start_time = time.perf_counter()
+                key = build_key(cached._cache, args, kwargs)
+                try:
+                    entry = cached._cache[key]
+                except KeyError:
+                    statistics.n_misses += 1
+                    shared_task = shared_tasks.get(key)
+                    if shared_task is None or not shared_task.is_joinable:
+
+                        async def compute():
+                            entry, is_from_disk = await \
+                                     compute_entry_asynchronously(args, kwargs)
+                            if is_from_disk:
+                                statistics.n_disk_hits += 1
+                                statistics.time_saved += entry.duration
+                            cached._cache[key] = entry
+                            return entry.value
+
+                        def forget_shared_task(task):
+                            if shared_tasks.get(key) is shared_task:
+                                del shared_tasks[key]
+
+                        task = asyncio.ensure_future(compute())
+                        shared_task = shared_tasks[key] = _SharedTask(task)
+                        task.add_done_callback(forget_shared_task)
+
+                    value = await shared_task.wait()
+                else:
+                    statistics.n_hits += 1
+                    statistics.time_saved += entry.duration
+                    value = entry.value
+                if track_latency:
+                    statistics.record_latency(
+                                           time.perf_counter() - start_time)
+                return value
+
+        elif not thread_safe:
+
+            @misc_tools.set_attributes(_cache=store)
             def cached(function, *args, **kwargs):
-                sleek_call_args = \
-                    SleekCallArgs(cached._cache, function, *args, **kwargs)
+                if track_latency:
+                    start_time = time.perf_counter()
+                key = build_key(cached._cache, args, kwargs)
                 try:
-                    result = cached._cache[sleek_call_args]
-                    cached._cache.move_to_end(sleek_call_args)
-                    return result
+                    entry = cached._cache[key]
                 except KeyError:
-                    cached._cache[sleek_call_args] = value = \
-                        function(*args, **kwargs)
-                    if len(cached._cache) > max_size:
-                        cached._cache.popitem(last=False)
-                    return value
-
-
-        result = decorator_(cached, function)
-
-        def cache_clear(key=CLEAR_ENTIRE_CACHE):
+                    statistics.n_misses += 1
+                    entry, is_from_disk = compute_entry(args, kwargs)
+                    if is_from_disk:
+                        statistics.n_disk_hits += 1
+                        statistics.time_saved += entry.duration
+                    cached._cache[key] = entry
+                    value = entry.value
+                else:
+                    statistics.n_hits += 1
+                    statistics.time_saved += entry.duration
+                    value = entry.value
+                if track_latency:
+                    statistics.record_latency(
+                                           time.perf_counter() - start_time)
+                return value
+
+        else: # thread_safe
+
+            if isinstance(store, dict):
+                # Each stripe has its own part of the cache and its own lock:
+                store = _StripedDict(n_lock_stripes)
+                stripes = tuple(
+                    _LockStripe(part, _ContentionCountingLock(), track_latency)
+                    for part in store.parts
+                )
+            else:
+                # Functions sharing a memory budget may evict each other's
+                # entries, so they must share a lock too:
+                lock = _ContentionCountingLock() if memory_budget is None \
+                                                    else memory_budget.lock
+                stripes = (_LockStripe(store, lock, track_latency),)
+            deferred_deleter = _DeferredDeleter(stripes)
+
+            @misc_tools.set_attributes(_cache=store)
+            def cached(function, *args, **kwargs):
+                if track_latency:
+                    start_time = time.perf_counter()
+                key = build_key(deferred_deleter, args, kwargs)
+                stripe = deferred_deleter.get_stripe(key)
+                with stripe.lock:
+                    stripe.delete_pending_keys()
+                    try:
+                        entry = stripe.store[key]
+                    except KeyError:
+                        try:
+                            future = stripe.in_flight_futures[key]
+                        except KeyError:
+                            stripe.statistics.n_misses += 1
+                            future = stripe.in_flight_futures[key] = \
+                                                    concurrent.futures.Future()
+                            is_computing = True
+                        else:
+                            # Waiting for another thread's result is a hit,
+                            # since the function is called only once:
+                            stripe.statistics.n_hits += 1
+                            stripe.n_coalesced_calls += 1
+                            is_computing = False
+                    else:
+                        stripe.statistics.n_hits += 1
+                        stripe.statistics.time_saved += entry.duration
+                        if track_latency:
+                            stripe.statistics.record_latency(
+                                           time.perf_counter() - start_time)
+                        return entry.value
+
+                if is_computing:
+                    try:
+                        entry, is_from_disk = compute_entry(args, kwargs)
+                        with stripe.lock:
+                            # Storing may fail too, like in `get_size`.
+                            stripe.store[key] = entry
+                            del stripe.in_flight_futures[key]
+                            if is_from_disk:
+                                stripe.statistics.n_disk_hits += 1
+                                stripe.statistics.time_saved += entry.duration
+                    except BaseException as exception:
+                        # The waiting threads get the exception, and later
+                        # calls compute the result again:
+                        with stripe.lock:
+                            stripe.in_flight_futures.pop(key, None)
+                        future.set_exception(exception)
+                        raise
+                    value = entry.value
+                    future.set_result(value)
+                else:
+                    # Another thread is already computing this result:
+                    value = future.result()
+
+                if track_latency:
+                    with stripe.lock:
+                        stripe.statistics.record_latency(
+                                           time.perf_counter() - start_time)
+                return value
+
+            def cache_lock_statistics():
+                '''Get `LockStatistics` for this function's cache locks.'''
+                n_acquisitions = n_contentions = n_coalesced_calls = 0
+                for stripe in stripes:
+                    with stripe.lock:
+                        n_acquisitions += stripe.lock.n_acquisitions
+                        n_contentions += stripe.lock.n_contentions
+                        n_coalesced_calls += stripe.n_coalesced_calls
+                return LockStatistics(acquisitions=n_acquisitions,
+                                      contentions=n_contentions,
+                                      coalesced_calls=n_coalesced_calls)
+
+        def clear_store(store, key):
             if key is CLEAR_ENTIRE_CACHE:
-                cached._cache.clear()
+                store.clear()
             else:
                 try:
-                    del cached._cache[key]
+                    del store[key]
                 except KeyError:
                     pass
 
+        def cache_clear(key=CLEAR_ENTIRE_CACHE):
+            if not thread_safe:
+                clear_store(cached._cache, key)
+            else:
+                for stripe in (stripes if key is CLEAR_ENTIRE_CACHE else
+                               (deferred_deleter.get_stripe(key),)):
+                    with stripe.lock:
+                        stripe.delete_pending_keys()
+                        clear_store(stripe.store, key)
+            if key is CLEAR_ENTIRE_CACHE and disk_tier is not None:
+                disk_tier.clear()
+
+        def cache_info():
+            '''Get a `CacheInfo` with statistics about this cached function.'''
+            if not thread_safe:
+                return statistics.get_cache_info(cached._cache)
+            total_statistics = _CacheStatistics(track_latency=track_latency)
+            for stripe in stripes:
+                with stripe.lock:
+                    stripe.delete_pending_keys()
+                    total_statistics.add(stripe.statistics)
+            return total_statistics.get_cache_info(cached._cache)
+
+        result = decorator_(cached, function)
+        if is_coroutine_function:
+            _mark_coroutine_function(result)
+
         result.cache_clear = cache_clear
+        result.cache_info = cache_info
+        if thread_safe:
+            result.cache_lock_statistics = cache_lock_statistics
 
         result.is_cached = True
 
+        _cached_functions.add(result)
+
         return result
 
     return decorator
@@ -0,0 +1,493 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines eviction policies for `cache`.
+
+A bounded cache must choose which results to throw away when it gets full.
+Pass one of the policies here, (or its name,) as `eviction_policy` to `cache`:
+
+    @caching.cache(max_size=1000, eviction_policy='tinylfu')
+    def f(x):
+        ...
+
+All the built-in policies do O(1) work per operation. To write your own,
+subclass `EvictionPolicy`.
+'''
+
+import collections
+
+infinity = float('inf')
+
+
+class EvictionPolicy:
+    '''
+    A policy for choosing which entries a bounded cache throws away.
+
+    A cache makes one instance of the policy, passing its `max_size`, (which
+    may be infinite if the cache is bounded only by `max_bytes`,) and tells it
+    about every key that's added, used and removed. When the cache is full, it
+    asks the policy for a victim with `get_victim`, evicts it, and then calls
+    `record_eviction`. Methods are called with the cache's lock held, if it
+    has one.
+
+    The base class evicts in least-recently-used order.
+    '''
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._keys = collections.OrderedDict()
+
+
+    def _get_capacity(self):
+        '''
+        Get the number of entries the cache is meant to hold.
+
+        For a cache bounded only by `max_bytes`, this is the number of entries
+        it holds right now.
+        '''
+        return self.max_size if self.max_size != infinity else len(self)
+
+
+    def record_hit(self, key):
+        '''Note that the entry for `key` was used.'''
+        self._keys.move_to_end(key)
+
+
+    def record_insertion(self, key):
+        '''Note that an entry was added for `key`.'''
+        self._keys[key] = None
+
+
+    def record_removal(self, key):
+        '''Note that the entry for `key` was removed, but not by eviction.'''
+        del self._keys[key]
+
+
+    def get_victim(self, incoming_key=None):
+        '''
+        Choose the key whose entry should be evicted.
+
+        This is called before the entry for `incoming_key`, if any, is added,
+        so the incoming key is never the victim. It shouldn't change anything;
+        the eviction is reported afterwards to `record_eviction`.
+        '''
+        return next(iter(self._keys))
+
+
+    def record_eviction(self, key):
+        '''Note that the entry for `key` was evicted.'''
+        self.record_removal(key)
+
+
+    def clear(self):
+        '''Forget all the keys, because the cache was cleared.'''
+        self._keys.clear()
+
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class LruPolicy(EvictionPolicy):
+    '''
+    Evict the least-recently-used entry.
+
+    This is the default policy. It works well when recently-used results are
+    likely to be used again soon, but a scan over many keys that are used only
+    once flushes everything else out of the cache.
+    '''
+
+
+class LfuPolicy(EvictionPolicy):
+    '''
+    Evict the least-frequently-used entry.
+
+    Ties are broken in least-recently-used order. Keys are kept in buckets by
+    the number of times they were used, and the frequencies that have buckets
+    are kept in a linked list in ascending order, so all operations are O(1).
+    Scans don't flush popular results, but results that were popular long ago
+    may linger.
+    '''
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._frequencies = {}
+        '''Mapping from key to the number of times it was used.'''
+        self._buckets = {}
+        '''
+        Mapping from frequency to the keys used that many times.
+
+        Each bucket is an ordered `dict` in least-recently-used order, and
+        empty buckets are deleted.
+        '''
+        self._next_frequencies = {}
+        self._previous_frequencies = {}
+        '''
+        The links between the frequencies that have buckets, by frequency.
+
+        The ends of the list are linked to `None`.
+        '''
+        self._min_frequency = None
+        '''The lowest frequency of any key, or `None` if there are none.'''
+
+
+    def _make_bucket(self, frequency, previous_frequency):
+        '''
+        Make an empty bucket for `frequency`, and link it in the list.
+
+        It's linked after `previous_frequency`, or first if that's `None`.
+        '''
+        self._buckets[frequency] = collections.OrderedDict()
+        if previous_frequency is None:
+            next_frequency = self._min_frequency
+            self._min_frequency = frequency
+        else:
+            next_frequency = self._next_frequencies[previous_frequency]
+            self._next_frequencies[previous_frequency] = frequency
+        self._previous_frequencies[frequency] = previous_frequency
+        self._next_frequencies[frequency] = next_frequency
+        if next_frequency is not None:
+            self._previous_frequencies[next_frequency] = frequency
+
+
+    def _remove_from_bucket(self, key, frequency):
+        '''Remove `key` from its bucket, unlinking the bucket if it empties.'''
+        bucket = self._buckets[frequency]
+        del bucket[key]
+        if bucket:
+            return
+        del self._buckets[frequency]
+        previous_frequency = self._previous_frequencies.pop(frequency)
+        next_frequency = self._next_frequencies.pop(frequency)
+        if previous_frequency is None:
+            self._min_frequency = next_frequency
+        else:
+            self._next_frequencies[previous_frequency] = next_frequency
+        if next_frequency is not None:
+            self._previous_frequencies[next_frequency] = previous_frequency
+
+
+    def record_hit(self, key):
+        frequency = self._frequencies[key]
+        if frequency + 1 not in self._buckets:
+            # The key's current bucket still holds it, so it's linked, and the
+            # new bucket goes right after it.
+            self._make_bucket(frequency + 1, frequency)
+        self._buckets[frequency + 1][key] = None
+        self._frequencies[key] = frequency + 1
+        self._remove_from_bucket(key, frequency)
+
+
+    def record_insertion(self, key):
+        if 1 not in self._buckets:
+            self._make_bucket(1, None)
+        self._buckets[1][key] = None
+        self._frequencies[key] = 1
+
+
+    def record_removal(self, key):
+        self._remove_from_bucket(key, self._frequencies.pop(key))
+
+
+    def get_victim(self, incoming_key=None):
+        return next(iter(self._buckets[self._min_frequency]))
+
+
+    def clear(self):
+        self._frequencies.clear()
+        self._buckets.clear()
+        self._next_frequencies.clear()
+        self._previous_frequencies.clear()
+        self._min_frequency = None
+
+
+    def __len__(self):
+        return len(self._frequencies)
+
+
+class ArcPolicy(EvictionPolicy):
+    '''
+    Evict entries by the Adaptive Replacement Cache algorithm. (ARC.)
+
+    Keys used once are kept in a "recent" list, and keys used more than once
+    in a "frequent" list, both in least-recently-used order. The keys last
+    evicted from each list are remembered as "ghosts", without their results.
+    When a ghost key comes back, the list it was evicted from grows at the
+    expense of the other, so the policy adapts between recency and frequency
+    to suit the workload. A scan only churns the recent list, so it doesn't
+    flush results that were used more than once.
+    '''
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._recent = collections.OrderedDict()
+        self._frequent = collections.OrderedDict()
+        self._recent_ghosts = collections.OrderedDict()
+        self._frequent_ghosts = collections.OrderedDict()
+        self._target_recent_size = 0
+        '''How big the recent list should be, adapted as ghosts come back.'''
+
+
+    def record_hit(self, key):
+        try:
+            del self._recent[key]
+        except KeyError:
+            self._frequent.move_to_end(key)
+        else:
+            self._frequent[key] = None
+
+
+    def record_insertion(self, key):
+        recent_ghosts = self._recent_ghosts
+        frequent_ghosts = self._frequent_ghosts
+        if key in recent_ghosts:
+            self._target_recent_size = min(
+                self._get_capacity(),
+                self._target_recent_size +
+                max(len(frequent_ghosts) / len(recent_ghosts), 1)
+            )
+            del recent_ghosts[key]
+            self._frequent[key] = None
+        elif key in frequent_ghosts:
+            self._target_recent_size = max(
+                0,
+                self._target_recent_size -
+                max(len(recent_ghosts) / len(frequent_ghosts), 1)
+            )
+            del frequent_ghosts[key]
+            self._frequent[key] = None
+        else:
+            self._recent[key] = None
+        self._trim_ghosts()
+
+
+    def record_removal(self, key):
+        try:
+            del self._recent[key]
+        except KeyError:
+            del self._frequent[key]
+
+
+    def get_victim(self, incoming_key=None):
+        n_recent = len(self._recent)
+        if n_recent and (not self._frequent or
+                         n_recent > self._target_recent_size or
+                         (n_recent == self._target_recent_size and
+                          incoming_key in self._frequent_ghosts)):
+            return next(iter(self._recent))
+        else:
+            return next(iter(self._frequent))
+
+
+    def record_eviction(self, key):
+        try:
+            del self._recent[key]
+        except KeyError:
+            del self._frequent[key]
+            self._frequent_ghosts[key] = None
+        else:
+            self._recent_ghosts[key] = None
+        self._trim_ghosts()
+
+
+    def _trim_ghosts(self):
+        '''Forget the oldest ghosts, to keep them within the capacity.'''
+        capacity = self._get_capacity()
+        recent_ghosts = self._recent_ghosts
+        frequent_ghosts = self._frequent_ghosts
+        while recent_ghosts and \
+                             len(self._recent) + len(recent_ghosts) > capacity:
+            recent_ghosts.popitem(last=False)
+        while frequent_ghosts and \
+                 len(self) + len(recent_ghosts) + len(frequent_ghosts) > \
+                                                                  2 * capacity:
+            frequent_ghosts.popitem(last=False)
+
+
+    def clear(self):
+        self._recent.clear()
+        self._frequent.clear()
+        self._recent_ghosts.clear()
+        self._frequent_ghosts.clear()
+        self._target_recent_size = 0
+
+
+    def __len__(self):
+        return len(self._recent) + len(self._frequent)
+
+
+_halving_table = bytes(i >> 1 for i in range(256))
+
+
+class _FrequencySketch:
+    '''
+    Approximate count of how often each key was seen recently.
+
+    This is a Count-Min sketch: four rows of counters, where each key
+    increments one counter in every row, chosen by its hash, and its estimate
+    is the lowest of its four counters. Collisions can only make estimates too
+    high, so each row has 4 counters per entry of the cache. Counters saturate
+    at 15, and after every 10 increments per entry of the cache all of them
+    are halved, so that keys popular long ago fade away.
+    '''
+    def __init__(self, capacity):
+        width = 1 << max(4, (4 * int(capacity) - 1).bit_length())
+        self._mask = width - 1
+        self._rows = tuple(bytearray(width) for _ in range(4))
+        self._sample_size = 10 * int(capacity)
+        self._n_increments = 0
+
+
+    def _get_indices(self, key):
+        # Four indices from one mixed 64-bit hash, by double hashing:
+        hash_ = (hash(key) * 0x9e3779b97f4a7c15) & 0xffffffffffffffff
+        low, high = hash_ & 0xffffffff, hash_ >> 32 | 1
+        mask = self._mask
+        return (low & mask, (low + high) & mask, (low + 2 * high) & mask,
+                (low + 3 * high) & mask)
+
+
+    def increment(self, key):
+        a, b, c, d = self._rows
+        i, j, k, l = self._get_indices(key)
+        if a[i] < 15:
+            a[i] += 1
+        if b[j] < 15:
+            b[j] += 1
+        if c[k] < 15:
+            c[k] += 1
+        if d[l] < 15:
+            d[l] += 1
+        self._n_increments += 1
+        if self._n_increments >= self._sample_size:
+            for row in self._rows:
+                row[:] = row.translate(_halving_table)
+            self._n_increments //= 2
+
+
+    def estimate(self, key):
+        a, b, c, d = self._rows
+        i, j, k, l = self._get_indices(key)
+        return min(a[i], b[j], c[k], d[l])
+
+
+class TinyLfuPolicy(EvictionPolicy):
+    '''
+    Evict entries by the W-TinyLFU algorithm.
+
+    New keys enter a small least-recently-used "window", 1% of the cache. Keys
+    pushed out of the window may enter the main area only if they were seen
+    more often than the main area's own victim, according to a compact sketch
+    of recent key frequencies that includes keys that aren't in the cache.
+    This keeps scans and one-hit wonders from displacing popular results. The
+    main area is a segmented LRU: keys used again while on "probation" are
+    promoted to a "protected" segment, 80% of the main area.
+
+    For caches bounded only by `max_bytes`, the sketch is sized for 4096
+    entries.
+    '''
+    window_fraction = 0.01
+    protected_fraction = 0.8
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._window = collections.OrderedDict()
+        self._probation = collections.OrderedDict()
+        self._protected = collections.OrderedDict()
+        self._segments = {}
+        '''Mapping from key to the segment it's in.'''
+        self._sketch = _FrequencySketch(max_size if max_size != infinity
+                                        else 4096)
+
+
+    def _get_max_window_size(self):
+        return max(1, int(self._get_capacity() * self.window_fraction))
+
+
+    def record_hit(self, key):
+        self._sketch.increment(key)
+        segment = self._segments[key]
+        if segment is self._probation:
+            del segment[key]
+            protected = self._protected
+            protected[key] = None
+            self._segments[key] = protected
+            capacity = self._get_capacity()
+            max_protected_size = self.protected_fraction * \
+                                  (capacity - self._get_max_window_size())
+            while len(protected) > max_protected_size:
+                demoted_key, _ = protected.popitem(last=False)
+                self._probation[demoted_key] = None
+                self._segments[demoted_key] = self._probation
+        else:
+            segment.move_to_end(key)
+
+
+    def record_insertion(self, key):
+        self._sketch.increment(key)
+        window = self._window
+        window[key] = None
+        self._segments[key] = window
+        if len(window) > self._get_max_window_size():
+            candidate, _ = window.popitem(last=False)
+            self._probation[candidate] = None
+            self._segments[candidate] = self._probation
+
+
+    def record_removal(self, key):
+        del self._segments.pop(key)[key]
+
+
+    def _get_main_victim(self):
+        for segment in (self._probation, self._protected):
+            if segment:
+                return next(iter(segment))
+        return None
+
+
+    def get_victim(self, incoming_key=None):
+        main_victim = self._get_main_victim()
+        window = self._window
+        if window and (main_victim is None or
+                       len(window) >= self._get_max_window_size()):
+            # The window's oldest key is about to be pushed out of it, so it
+            # must win against the main area's victim to stay in the cache:
+            candidate = next(iter(window))
+            if main_victim is None:
+                return candidate
+            sketch = self._sketch
+            if sketch.estimate(candidate) > sketch.estimate(main_victim):
+                return main_victim
+            else:
+                return candidate
+        return main_victim
+
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._segments.clear()
+
+
+    def __len__(self):
+        return len(self._segments)
+
+
+_policies_by_name = {'lru': LruPolicy, 'lfu': LfuPolicy, 'arc': ArcPolicy,
+                     'tinylfu': TinyLfuPolicy}
+
+
+def _get_policy_type(eviction_policy):
+    '''Get the `EvictionPolicy` subclass specified by name or by itself.'''
+    if isinstance(eviction_policy, str):
+        try:
+            return _policies_by_name[eviction_policy.lower()]
+        except KeyError:
+            raise ValueError(
+                f'Unknown eviction policy {eviction_policy!r}; the built-in '
+                f'ones are {", ".join(map(repr, _policies_by_name))}.'
+            ) from None
+    if not (isinstance(eviction_policy, type) and
+            issubclass(eviction_policy, EvictionPolicy)):
+        raise TypeError('`eviction_policy` must be the name of a built-in '
+                        'policy or an `EvictionPolicy` subclass.')
+    return eviction_policy
@@ -0,0 +1,84 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for the `get_batch` methods of combi spaces.
+
+Like `PermSpace.get_batch`, these make 2D NumPy arrays if NumPy is installed,
+and otherwise lists of `array.array('l')` rows. (With `object` dtypes or
+tuples for ints too big for those.)
+'''
+
+import array
+import numbers
+
+try:
+    import numpy
+except ImportError: # No NumPy; we'll make `array.array` rows instead.
+    numpy = None
+
+
+_max_int64 = 2 ** 63 - 1
+_max_long = 2 ** (8 * array.array('l').itemsize - 1) - 1
+
+
+def can_use_numpy(length):
+    '''Whether all the indices of a space of `length` items fit in NumPy.'''
+    return numpy is not None and length <= _max_int64
+
+
+def normalize_index_array(indices, length):
+    '''
+    Turn `indices` into a 1D NumPy array of non-negative indices.
+
+    Negative indices count from the end, like in `__getitem__`. Raises
+    `IndexError` if any index is out of range.
+    '''
+    indices = numpy.asarray(indices)
+    if indices.size == 0:
+        indices = indices.astype(numpy.int64)
+    if indices.ndim != 1 or indices.dtype.kind not in 'iu':
+        raise TypeError('Indices must be a 1-dimensional sequence of '
+                        'integers.')
+    indices = indices.astype(numpy.int64)
+    indices = numpy.where(indices < 0, indices + length, indices)
+    if ((indices < 0) | (indices >= length)).any():
+        raise IndexError
+    return indices
+
+
+def normalize_indices(indices, length):
+    '''
+    Turn `indices` into a list of non-negative `int` indices.
+
+    Negative indices count from the end, like in `__getitem__`. Raises
+    `IndexError` if any index is out of range.
+    '''
+    normalized_indices = []
+    for i in indices:
+        if not isinstance(i, numbers.Integral):
+            raise TypeError(f'Indices must be integers, not {i!r}.')
+        if i <= -1:
+            i += length
+        if not (0 <= i < length):
+            raise IndexError
+        normalized_indices.append(int(i))
+    return normalized_indices
+
+
+def make_matrix(rows, n_columns):
+    '''
+    Make a matrix of `rows`, which are sequences of `n_columns` ints.
+
+    The ints must be non-negative. If some are too big for NumPy's `int64`,
+    the NumPy array has an `object` dtype; without NumPy, if some are too big
+    for `array.array('l')`, the rows are tuples.
+    '''
+    max_value = max((max(row) for row in rows if len(row)), default=0)
+    if numpy is not None:
+        dtype = numpy.int64 if max_value <= _max_int64 else object
+        return numpy.array(rows, dtype=dtype).reshape(len(rows), n_columns)
+    elif max_value <= _max_long:
+        return [array.array('l', row) for row in rows]
+    else:
+        return [tuple(row) for row in rows]
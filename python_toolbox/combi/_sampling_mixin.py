@@ -0,0 +1,98 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for drawing random items from combi spaces.
+
+See `_SamplingMixin` for more details.
+'''
+
+import numbers
+import random
+
+
+def _get_random_generator(seed):
+    '''
+    Get a `random.Random` for `seed`.
+
+    `seed` may be `None` for a random seed, a seed for `random.Random`, or a
+    `random.Random` to draw from, so that successive calls continue from where
+    the previous ones stopped.
+    '''
+    if isinstance(seed, random.Random):
+        return seed
+    else:
+        return random.Random(seed)
+
+
+class _SamplingMixin:
+    '''
+    Mixin for combi spaces, for drawing random items from them.
+
+    Every space can draw a random item by drawing a random index, but spaces
+    that can construct a random item directly, without going through an
+    index, override `_make_random_item`.
+    '''
+    def _make_random_item(self, random_generator):
+        '''
+        Make a random item, uniformly.
+
+        Returns a tuple of a key and the item. Two draws have the same key
+        exactly when they're the same item of the space, so `sample` can tell
+        whether it already drew an item. The key must be hashable.
+        '''
+        i = random_generator.randrange(self.length)
+        return i, self[i]
+
+
+    def random(self, seed=None):
+        '''
+        Get a random item from the space.
+
+        All items are equally likely. `seed` may be a seed for `random.Random`
+        or a `random.Random` to draw from.
+        '''
+        return self._make_random_item(_get_random_generator(seed))[1]
+
+
+    def sample(self, k, unique=True, seed=None):
+        '''
+        Iterate over `k` random items from the space.
+
+        The items are made lazily, one by one, so a sample of a space with
+        trillions of items costs only as much as the items you take from it.
+        If `unique=True`, no item is yielded twice; the keys of the items that
+        were drawn are kept in a set, and items that were already drawn are
+        drawn again. When `k` is more than half the length of the space, a
+        random subset of its indices is drawn instead, so drawing the last
+        items doesn't take forever.
+
+        `seed` may be a seed for `random.Random` or a `random.Random` to draw
+        from.
+        '''
+        if not isinstance(k, numbers.Integral) or k < 0:
+            raise ValueError('`k` must be a non-negative integer.')
+        if unique and k > self.length:
+            raise ValueError(
+                "Can't take a unique sample of %s items from a space of "
+                "length %s." % (k, self.length)
+            )
+        random_generator = _get_random_generator(seed)
+
+        # Yield must be hidden in closure so that the arguments are checked
+        # when `sample` is called rather than when iteration starts.
+        def sample_iterator():
+            if not unique:
+                for _ in range(k):
+                    yield self._make_random_item(random_generator)[1]
+            elif 2 * k > self.length:
+                for i in random_generator.sample(range(self.length), k):
+                    yield self[i]
+            else:
+                drawn_keys = set()
+                while len(drawn_keys) < k:
+                    key, item = self._make_random_item(random_generator)
+                    if key not in drawn_keys:
+                        drawn_keys.add(key)
+                        yield item
+        return sample_iterator()
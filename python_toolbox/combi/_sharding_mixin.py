@@ -0,0 +1,158 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for splitting combi spaces into shards and processing them.
+
+See `_ShardingMixin` for more details.
+'''
+
+import collections
+import concurrent.futures
+import os
+
+from python_toolbox import sequence_tools
+from python_toolbox import future_tools
+
+
+class Shard(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
+    '''
+    A contiguous run of the items of a space, from index `start` to `stop`.
+
+    A shard holds only its space and its two indices, so sending it to
+    another process sends just the space's description, (which for
+    `PermSpace` is the arguments that make it,) and no items. Iterating over
+    it uses the space's fastest way of going over a range of indices.
+    '''
+    def __init__(self, space, start, stop):
+        self.space = space
+        self.start = start
+        self.stop = stop
+        self.length = stop - start
+
+
+    def __repr__(self):
+        return '<%s: %r[%s:%s]>' % (type(self).__name__, self.space,
+                                    self.start, self.stop)
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            # `range` resolves the slice's indices, even past `sys.maxsize`.
+            indices = range(self.start, self.stop)[i]
+            if indices.step == 1:
+                return Shard(self.space, indices.start,
+                             max(indices.stop, indices.start))
+            return tuple(map(self.space.__getitem__, indices))
+        if i < 0:
+            i += self.length
+        if not (0 <= i < self.length):
+            raise IndexError
+        return self.space[self.start + i]
+
+
+    def __iter__(self):
+        return self.space._iterate_range(self.start, self.stop)
+
+
+    _reduced = property(
+        lambda self: (type(self), self.space, self.start, self.stop)
+    )
+    __eq__ = lambda self, other: (isinstance(other, Shard) and
+                                  self._reduced == other._reduced)
+    __hash__ = lambda self: hash(self._reduced)
+
+    __bool__ = lambda self: bool(self.length)
+
+
+def _map_shard(function, shard):
+    '''Apply `function` to every item in `shard`, getting a list of results.'''
+    return list(map(function, shard))
+
+
+class _ShardingMixin:
+    '''
+    Mixin for combi spaces, for splitting them into shards.
+
+    Combi spaces are sequences with a known length, so they can be split into
+    contiguous runs of indices that are processed separately, e.g. in
+    different processes by `parallel_map`.
+    '''
+    def _iterate_range(self, start, stop):
+        '''
+        Iterate over the items from index `start` to `stop`.
+
+        Spaces that can go over a range faster than by fetching each item by
+        index override this.
+        '''
+        return map(self.__getitem__, range(start, stop))
+
+
+    def shard(self, n_shards):
+        '''
+        Split the space into `n_shards` `Shard`s of about the same length.
+
+        The shards are in order, and their lengths differ by at most 1. If the
+        space has fewer than `n_shards` items, there's one shard per item.
+        '''
+        if n_shards < 1:
+            raise ValueError('`n_shards` must be at least 1.')
+        length = self.length
+        n_shards = min(n_shards, length)
+        if not n_shards:
+            return ()
+        base_shard_length, n_longer_shards = divmod(length, n_shards)
+        shards = []
+        start = 0
+        for i in range(n_shards):
+            stop = start + base_shard_length + (i < n_longer_shards)
+            shards.append(Shard(self, start, stop))
+            start = stop
+        assert start == length
+        return tuple(shards)
+
+
+    def parallel_map(self, function, executor=None, *, n_shards=None,
+                     as_completed=False):
+        '''
+        Apply `function` to every item in the space, in parallel.
+
+        The space is split into shards, (see `shard`,) and each shard is
+        processed in one task submitted to `executor`. If no executor is
+        given, a `future_tools.CuteProcessPoolExecutor` is made for this call
+        and shut down when it's done. For a process pool, `function` and the
+        space must be picklable; only the space's description is sent with
+        each shard, not its items.
+
+        By default there are 4 shards per CPU, so a slow shard doesn't hold up
+        the rest for long.
+
+        Results are yielded in the order of the space. Specify
+        `as_completed=True` to get the results of each shard as soon as it's
+        done instead. (The results within a shard are always in order.)
+        '''
+        if n_shards is None:
+            n_shards = 4 * (os.cpu_count() or 1)
+        shards = self.shard(n_shards)
+        if executor is None:
+            own_executor = executor = future_tools.CuteProcessPoolExecutor()
+        else:
+            own_executor = None
+
+        futures = [executor.submit(_map_shard, function, shard) for shard in
+                   shards]
+        futures_iterator = concurrent.futures.as_completed(futures) if \
+                                                      as_completed else futures
+
+        # Yield must be hidden in closure so that the futures are submitted
+        # before the first iterator value is required.
+        def result_iterator():
+            try:
+                for future in futures_iterator:
+                    yield from future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+                if own_executor is not None:
+                    own_executor.shutdown()
+        return result_iterator()
@@ -3,20 +3,25 @@
 
 from __future__ import generator_stop
 
+import bisect
 import collections
 
-from python_toolbox import binary_search
 from python_toolbox import nifty_collections
 from python_toolbox import caching
 
 from python_toolbox import sequence_tools
 from python_toolbox import nifty_collections
 
+from . import _batching
+from ._sharding_mixin import _ShardingMixin
+from ._sampling_mixin import _SamplingMixin
+
 infinity = float('inf')
 
 
 
-class ChainSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
+class ChainSpace(_ShardingMixin, _SamplingMixin,
+                 sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
     '''
     A space of sequences chained together.
 
@@ -59,6 +64,17 @@ class ChainSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
             yield total
 
 
+    @caching.CachedProperty
+    def _accumulated_lengths_tuple(self):
+        '''
+        The accumulated lengths as a tuple, for binary search with `bisect`.
+
+        Making it goes over all the sequences, so it's made only when an item
+        is fetched by index.
+        '''
+        return tuple(self.accumulated_lengths)
+
+
     length = caching.CachedProperty(lambda self: self.accumulated_lengths[-1])
 
     def __repr__(self):
@@ -75,24 +91,84 @@ class ChainSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
             i += self.length
         if i < 0:
             raise IndexError
-        if self.accumulated_lengths.is_exhausted and i >= self.length:
-            raise IndexError
-        # Todo: Can't have a binary search here, it exhausts all the sequences.
-        sequence_index = binary_search.binary_search_by_index(
-            self.accumulated_lengths, i, rounding=binary_search.LOW_IF_BOTH
-        )
-        if sequence_index is None:
+        sequence_index, index_in_sequence = self._locate(i)
+        return self.sequences[sequence_index][index_in_sequence]
+
+
+    def _locate(self, i):
+        '''
+        Find the sequence that has item number `i` and its index there.
+
+        `i` must be non-negative. Empty sequences are skipped, since the
+        binary search finds the last sequence that starts at or before `i`.
+        '''
+        accumulated_lengths = self._accumulated_lengths_tuple
+        if i >= accumulated_lengths[-1]:
             raise IndexError
-        sequence_start = self.accumulated_lengths[sequence_index]
-        return self.sequences[sequence_index][i - sequence_start]
+        sequence_index = bisect.bisect_right(accumulated_lengths, i) - 1
+        return sequence_index, i - accumulated_lengths[sequence_index]
 
 
     def __iter__(self):
         for sequence in self.sequences:
             yield from sequence
 
+
+    def _iterate_range(self, start, stop):
+        if start >= stop:
+            return
+        sequence_index, index_in_sequence = self._locate(start)
+        n_items_left = stop - start
+        for sequence in self.sequences[sequence_index:]:
+            run_length = min(sequence_tools.get_length(sequence) -
+                             index_in_sequence, n_items_left)
+            yield from map(
+                sequence.__getitem__,
+                range(index_in_sequence, index_in_sequence + run_length)
+            )
+            n_items_left -= run_length
+            if not n_items_left:
+                return
+            index_in_sequence = 0
+
+
+    def get_batch(self, indices):
+        '''
+        Get the items numbered `indices`, as a matrix of indices.
+
+        Each row of the matrix has the index of the sequence that has the item
+        and the index of the item in that sequence. The matrix is a 2D NumPy
+        array if NumPy is installed, and otherwise a list of
+        `array.array('l')` rows. With NumPy, all the items are found together
+        by one binary search.
+        '''
+        if _batching.can_use_numpy(self.length):
+            numpy = _batching.numpy
+            indices = _batching.normalize_index_array(indices, self.length)
+            accumulated_lengths = numpy.array(self._accumulated_lengths_tuple,
+                                              dtype=numpy.int64)
+            sequence_indices = numpy.searchsorted(accumulated_lengths,
+                                                  indices, side='right') - 1
+            return numpy.stack(
+                (sequence_indices,
+                 indices - accumulated_lengths[sequence_indices]), axis=1
+            )
+        return _batching.make_matrix(
+            [self._locate(i) for i in
+             _batching.normalize_indices(indices, self.length)], 2
+        )
+
     _reduced = property(lambda self: (type(self), self.sequences))
 
+    def __reduce__(self):
+        # Lazy tuples might still have generators in them, which can't be
+        # pickled:
+        LazyTuple = nifty_collections.LazyTuple
+        return (type(self), (tuple(
+            tuple(sequence) if isinstance(sequence, LazyTuple) else sequence
+            for sequence in self.sequences
+        ),))
+
     __eq__ = lambda self, other: (isinstance(other, ChainSpace) and
                                   self._reduced == other._reduced)
 
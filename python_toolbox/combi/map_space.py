@@ -9,11 +9,15 @@ from python_toolbox import nifty_collections
 from python_toolbox import caching
 from python_toolbox import sequence_tools
 
+from ._sharding_mixin import _ShardingMixin
+from ._sampling_mixin import _SamplingMixin
+
 infinity = float('inf')
 
 
 
-class MapSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
+class MapSpace(_ShardingMixin, _SamplingMixin,
+               sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
     '''
     A space of a function applied to a sequence.
 
@@ -65,6 +69,20 @@ class MapSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
         for item in self.sequence:
             yield self.function(item)
 
+
+    def _iterate_range(self, start, stop):
+        return iter(self[start:stop])
+
+
+    def __reduce__(self):
+        # A lazy tuple might still have a generator in it, which can't be
+        # pickled:
+        if isinstance(self.sequence, nifty_collections.LazyTuple):
+            sequence = tuple(self.sequence)
+        else:
+            sequence = self.sequence
+        return (type(self), (self.function, sequence))
+
     _reduced = property(
         lambda self: (type(self), self.function, self.sequence)
     )
@@ -0,0 +1,377 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for unranking and ranking perms in batches.
+
+See the documentation of `PermSpace.get_batch` and `PermSpace.index_batch` for
+more details.
+'''
+
+import array
+import bisect
+import collections
+
+try:
+    import numpy
+except ImportError: # No NumPy; we'll make `array.array` rows instead.
+    numpy = None
+
+from python_toolbox import math_tools
+
+from . import _iterating
+from .._batching import normalize_index_array, normalize_indices
+
+
+_max_int64 = 2 ** 63 - 1
+
+_max_gap_to_step_over = 32
+'''
+The largest gap between sorted indices that we step over instead of unranking.
+
+Stepping from one perm to the next is much cheaper than unranking a perm, so
+when the indices of a batch are close to each other, we unrank only the first
+one and step to the rest.
+'''
+
+
+def _is_arithmetic(perm_space):
+    '''
+    Whether the perms of `perm_space` can be unranked by arithmetic alone.
+
+    That's the case for any space that isn't recurrent, fixed or degreed. For
+    these, the value indices of a perm depend only on its index, the
+    sequence's length and `n_elements`.
+    '''
+    return not (perm_space.is_recurrent or perm_space.is_fixed or
+                perm_space.is_degreed)
+
+
+def _get_radices(perm_space):
+    '''
+    Get the radix of each position in the perms of a non-combination space.
+
+    The index of a perm is the sum of each position's digit times its radix,
+    where the digit is the number of unused values that are smaller than the
+    value in that position.
+    '''
+    sequence_length = perm_space.sequence_length
+    n_elements = perm_space.n_elements
+    return [
+        math_tools.factorial(sequence_length - 1 - j,
+                             start=sequence_length - n_elements + 1)
+        for j in range(n_elements)
+    ]
+
+
+def _get_binomial_tables(perm_space):
+    '''
+    Get tables of binomial coefficients for ranking combinations.
+
+    Table number `r` is `[binomial(0, r), ..., binomial(sequence_length, r)]`,
+    for `r` in `[0, n_elements]`.
+    '''
+    return [[math_tools.binomial(j, r) for j in
+             range(perm_space.sequence_length + 1)]
+            for r in range(perm_space.n_elements + 1)]
+
+
+def _unrank_arithmetically(perm_space, index, radices_or_binomial_tables):
+    '''Get the value indices of perm number `index` of an unsliced space.'''
+    sequence_length = perm_space.sequence_length
+    if perm_space.is_combination:
+        # Mirroring `PermSpace.__getitem__`:
+        binomial_tables = radices_or_binomial_tables
+        wip_number = perm_space._unsliced_length - 1 - index
+        value_indices = []
+        for r in range(perm_space.n_elements, 0, -1):
+            binomial_table = binomial_tables[r]
+            j = bisect.bisect_right(binomial_table, wip_number) - 1
+            value_indices.append(sequence_length - 1 - j)
+            wip_number -= binomial_table[j]
+        return value_indices
+    else:
+        unused_value_indices = list(range(sequence_length))
+        return [
+            unused_value_indices.pop((index // radix) % (sequence_length - j))
+            for j, radix in enumerate(radices_or_binomial_tables)
+        ]
+
+
+def _unrank_arithmetically_with_numpy(perm_space, indices):
+    '''
+    Get the value indices of the perms numbered `indices` in a 2D array.
+
+    `indices` is an `int64` array of indices in the unsliced space. All the
+    perms are unranked together, one position at a time.
+    '''
+    sequence_length = perm_space.sequence_length
+    n_perms = len(indices)
+    columns = []
+    if perm_space.is_combination:
+        binomial_tables = _get_binomial_tables(perm_space)
+        wip_numbers = (perm_space._unsliced_length - 1) - indices
+        for r in range(perm_space.n_elements, 0, -1):
+            binomial_table = numpy.array(binomial_tables[r], dtype=numpy.int64)
+            js = numpy.searchsorted(binomial_table, wip_numbers,
+                                    side='right') - 1
+            columns.append(sequence_length - 1 - js)
+            wip_numbers = wip_numbers - binomial_table[js]
+    else:
+        unused_value_indices = numpy.tile(numpy.arange(sequence_length),
+                                          (n_perms, 1))
+        rows = numpy.arange(n_perms)
+        for j, radix in enumerate(_get_radices(perm_space)):
+            n_unused = sequence_length - j
+            digits = (indices // radix) % n_unused
+            columns.append(unused_value_indices[rows, digits])
+            is_still_unused = numpy.arange(n_unused) != digits[:, None]
+            unused_value_indices = unused_value_indices[is_still_unused]. \
+                                                 reshape(n_perms, n_unused - 1)
+    if not columns:
+        return numpy.zeros((n_perms, 0), dtype=numpy.int64)
+    return numpy.stack(columns, axis=1).astype(numpy.int64, copy=False)
+
+
+def _make_value_indexer(perm_space):
+    '''
+    Make a function that turns a perm sequence into a list of value indices.
+
+    A value index is the index of the value in `perm_space.sequence`. In
+    recurrent spaces, the `n`th use of a value in a perm gets the index of its
+    `n`th appearance in the sequence.
+    '''
+    if perm_space.is_recurrent:
+        appearances = collections.defaultdict(list)
+        for i, value in enumerate(perm_space.sequence):
+            appearances[value].append(i)
+        def get_value_indices(perm_sequence):
+            n_uses = collections.Counter()
+            value_indices = []
+            for value in perm_sequence:
+                value_indices.append(appearances[value][n_uses[value]])
+                n_uses[value] += 1
+            return value_indices
+        return get_value_indices
+    elif perm_space.is_rapplied:
+        index_by_value = {value: i for i, value in
+                          enumerate(perm_space.sequence)}
+        return lambda perm_sequence: list(map(index_by_value.__getitem__,
+                                              perm_sequence))
+    else:
+        return list
+
+
+def _get_unsliced_batch(perm_space, unsliced_indices):
+    '''
+    Get the value indices of the perms numbered `unsliced_indices`.
+
+    `perm_space` is unsliced. Returns a list of lists. The indices are sorted
+    and split into runs of close indices; only the first index of a run is
+    unranked, and we step from it to the others with the iteration engine.
+    '''
+    get_value_indices = _make_value_indexer(perm_space)
+    if _is_arithmetic(perm_space):
+        radices_or_binomial_tables = (
+            _get_binomial_tables(perm_space) if perm_space.is_combination
+            else _get_radices(perm_space)
+        )
+        sequence = tuple(perm_space.sequence)
+        def unrank(index):
+            value_indices = _unrank_arithmetically(
+                perm_space, index, radices_or_binomial_tables
+            )
+            return value_indices, tuple(map(sequence.__getitem__,
+                                            value_indices))
+    else:
+        def unrank(index):
+            perm_sequence = tuple(perm_space[index]._perm_sequence)
+            return get_value_indices(perm_sequence), perm_sequence
+
+    batch = [None] * len(unsliced_indices)
+    order = sorted(range(len(unsliced_indices)),
+                   key=unsliced_indices.__getitem__)
+    perm_sequences = None
+    current_index = None
+    for position in order:
+        index = unsliced_indices[position]
+        if current_index is not None and \
+                   0 <= index - current_index <= _max_gap_to_step_over:
+            if index != current_index:
+                if perm_sequences is None:
+                    perm_sequences = \
+                          _iterating._iterate_unsliced_perm_sequences(
+                              perm_space, current_perm_sequence
+                          )
+                    next(perm_sequences)
+                for _ in range(index - current_index - 1):
+                    next(perm_sequences)
+                current_perm_sequence = next(perm_sequences)
+                current_value_indices = \
+                                      get_value_indices(current_perm_sequence)
+        else:
+            current_value_indices, current_perm_sequence = unrank(index)
+            perm_sequences = None
+        current_index = index
+        batch[position] = current_value_indices
+    return batch
+
+
+def get_batch(perm_space, indices):
+    '''
+    Get the value indices of the perms numbered `indices` in `perm_space`.
+
+    See documentation of `PermSpace.get_batch` for more details.
+    '''
+    unsliced_perm_space = perm_space.unsliced
+    use_numpy_unranking = (
+        numpy is not None and _is_arithmetic(perm_space) and
+        perm_space._unsliced_length <= _max_int64
+    )
+    start = perm_space.canonical_slice.start
+    if use_numpy_unranking:
+        indices = normalize_index_array(indices, perm_space.length)
+        return _unrank_arithmetically_with_numpy(unsliced_perm_space,
+                                                 indices + start)
+
+    unsliced_indices = [i + start for i in
+                        normalize_indices(indices, perm_space.length)]
+    batch = _get_unsliced_batch(unsliced_perm_space, unsliced_indices)
+    if numpy is not None:
+        return numpy.array(batch, dtype=numpy.int64).reshape(
+            len(batch), perm_space.n_elements
+        )
+    else:
+        return [array.array('l', value_indices) for value_indices in batch]
+
+
+def _rank_arithmetically(perm_space, value_indices,
+                         radices_or_binomial_tables):
+    '''
+    Get the index of the perm with `value_indices` in an unsliced space.
+
+    Raises `ValueError` if there's no such perm in the space.
+    '''
+    sequence_length = perm_space.sequence_length
+    n_elements = perm_space.n_elements
+    if len(value_indices) != n_elements or not all(
+                  0 <= value_index < sequence_length for value_index in
+                  value_indices):
+        raise ValueError
+    if perm_space.is_combination:
+        binomial_tables = radices_or_binomial_tables
+        wip_number = 0
+        previous_value_index = -1
+        for j, value_index in enumerate(value_indices):
+            if value_index <= previous_value_index:
+                raise ValueError
+            previous_value_index = value_index
+            wip_number += \
+                binomial_tables[n_elements - j][sequence_length - 1 -
+                                                value_index]
+        return perm_space._unsliced_length - 1 - wip_number
+    else:
+        if len(set(value_indices)) != n_elements:
+            raise ValueError
+        index = 0
+        for j, (value_index, radix) in enumerate(
+                             zip(value_indices, radices_or_binomial_tables)):
+            digit = value_index - sum(
+                1 for previous_value_index in value_indices[:j]
+                if previous_value_index < value_index
+            )
+            index += digit * radix
+        return index
+
+
+def _rank_arithmetically_with_numpy(perm_space, value_indices):
+    '''
+    Get the indices of the perms whose value indices are rows of a 2D array.
+
+    The space is unsliced. Raises `ValueError` if any of the rows isn't a perm
+    in the space.
+    '''
+    sequence_length = perm_space.sequence_length
+    n_elements = perm_space.n_elements
+    if value_indices.ndim != 2 or value_indices.shape[1] != n_elements or \
+                                          value_indices.dtype.kind not in 'iu':
+        raise ValueError
+    value_indices = value_indices.astype(numpy.int64)
+    if ((value_indices < 0) | (value_indices >= sequence_length)).any():
+        raise ValueError
+    indices = numpy.zeros(len(value_indices), dtype=numpy.int64)
+    if perm_space.is_combination:
+        if (numpy.diff(value_indices, axis=1) <= 0).any():
+            raise ValueError
+        binomial_tables = _get_binomial_tables(perm_space)
+        for j in range(n_elements):
+            binomial_table = numpy.array(binomial_tables[n_elements - j],
+                                         dtype=numpy.int64)
+            indices += binomial_table[sequence_length - 1 -
+                                      value_indices[:, j]]
+        return (perm_space._unsliced_length - 1) - indices
+    else:
+        if (numpy.diff(numpy.sort(value_indices, axis=1), axis=1) == 0).any():
+            raise ValueError
+        for j, radix in enumerate(_get_radices(perm_space)):
+            column = value_indices[:, j]
+            digits = column - (value_indices[:, :j] <
+                                                column[:, None]).sum(axis=1)
+            indices += digits * radix
+        return indices
+
+
+def index_batch(perm_space, value_indices):
+    '''
+    Get the indices of the perms whose value indices are in `value_indices`.
+
+    See documentation of `PermSpace.index_batch` for more details.
+    '''
+    unsliced_perm_space = perm_space.unsliced
+    start = perm_space.canonical_slice.start
+    fits_in_int64 = perm_space._unsliced_length <= _max_int64
+    if numpy is not None and _is_arithmetic(perm_space) and fits_in_int64:
+        value_indices = numpy.asarray(value_indices)
+        if value_indices.size == 0:
+            value_indices = value_indices.astype(numpy.int64).reshape(
+                len(value_indices), perm_space.n_elements
+            )
+        indices = _rank_arithmetically_with_numpy(unsliced_perm_space,
+                                                  value_indices) - start
+        if ((indices < 0) | (indices >= perm_space.length)).any():
+            raise ValueError
+        return indices
+
+    if _is_arithmetic(perm_space):
+        radices_or_binomial_tables = (
+            _get_binomial_tables(perm_space) if perm_space.is_combination
+            else _get_radices(perm_space)
+        )
+        indices = []
+        for row in value_indices:
+            index = _rank_arithmetically(
+                unsliced_perm_space, [int(value_index) for value_index in row],
+                radices_or_binomial_tables
+            ) - start
+            if not (0 <= index < perm_space.length):
+                raise ValueError
+            indices.append(index)
+    else:
+        sequence = perm_space.sequence
+        sequence_length = perm_space.sequence_length
+        indices = []
+        for row in value_indices:
+            row = [int(value_index) for value_index in row]
+            if not all(0 <= value_index < sequence_length for value_index in
+                       row):
+                raise ValueError
+            indices.append(perm_space.index(tuple(map(sequence.__getitem__,
+                                                      row))))
+
+    if numpy is not None:
+        return numpy.array(indices,
+                           dtype=numpy.int64 if fits_in_int64 else object)
+    elif fits_in_int64:
+        return array.array('q', indices)
+    else:
+        return indices
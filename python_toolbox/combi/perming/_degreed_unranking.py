@@ -0,0 +1,155 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for unranking and ranking perms in degreed spaces.
+
+A perm's degree is its length minus its number of cycles. Unranking a perm of
+a degreed space means choosing its values position by position, each time
+counting how many perms of the wanted degrees start with each candidate value.
+See `unrank_degreed_perm` for more details.
+'''
+
+import bisect
+
+from python_toolbox import math_tools
+
+
+class DegreedPermCounter:
+    '''
+    Counter of the perms of certain degrees that complete a partial perm.
+
+    If a partial perm of `sequence_length` items maps some of the items,
+    closing `n_cycles` cycles and leaving `n_free_items` items unmapped, then
+    the number of ways to complete it with `c` more cycles is the unsigned
+    Stirling number of the first kind of `n_free_items` and `c`. (The open
+    chains of mapped items behave just like single items.) So the number of
+    completions of the wanted degrees depends only on `n_free_items` and
+    `n_cycles`, and we memoize it.
+    '''
+    def __init__(self, sequence_length, degrees):
+        self.sequence_length = sequence_length
+        self.degrees = tuple(degrees)
+        self._counts = {}
+
+
+    def count(self, n_free_items, n_cycles):
+        '''Count the completions of a partial perm of the wanted degrees.'''
+        try:
+            return self._counts[n_free_items, n_cycles]
+        except KeyError:
+            count = self._counts[n_free_items, n_cycles] = sum(
+                math_tools.abs_stirling(
+                    n_free_items,
+                    self.sequence_length - degree - n_cycles
+                ) for degree in self.degrees
+            )
+            return count
+
+
+class _Chains:
+    '''
+    The chains and cycles of a partial perm, built up one item at a time.
+
+    Every item starts as a chain of its own. Mapping the end of one chain to
+    the start of another joins them into one chain, like union-find does; and
+    mapping the end of a chain to its own start closes a cycle. This lets us
+    tell in constant time which value would close a cycle at a position.
+    '''
+    def __init__(self, sequence_length, fixed_map=None):
+        self.start_by_end = list(range(sequence_length))
+        self.end_by_start = list(range(sequence_length))
+        self.n_cycles = 0
+        for key, value in (fixed_map or {}).items():
+            self.connect(key, value)
+
+
+    def get_closing_value(self, key):
+        '''Get the value that'd close a cycle if `key` were mapped to it.'''
+        return self.start_by_end[key]
+
+
+    def connect(self, key, value):
+        '''Map `key`, which must be an end of a chain, to the start `value`.'''
+        start = self.start_by_end[key]
+        if start == value:
+            self.n_cycles += 1
+        else:
+            end = self.end_by_start[value]
+            self.start_by_end[end] = start
+            self.end_by_start[start] = end
+
+
+def unrank_degreed_perm(sequence_length, fixed_map, counter, index):
+    '''
+    Get the sequence of perm number `index` of a degreed space.
+
+    The space is taken as unrapplied and undapplied, so `fixed_map` maps
+    indices to indices. At each free position, all the unused values lead to
+    the same number of perms except for the one value that closes a cycle, so
+    the value for that position is found with arithmetic rather than by trying
+    each candidate. This takes O(n) per position, mostly for removing the
+    value from the sorted list of unused values.
+    '''
+    chains = _Chains(sequence_length, fixed_map)
+    unused_values = sorted(set(range(sequence_length)) -
+                           set(fixed_map.values()))
+    perm_sequence = [fixed_map.get(key) for key in range(sequence_length)]
+    n_free_items = len(unused_values)
+    wip_index = index
+    for key in range(sequence_length):
+        if key in fixed_map:
+            continue
+        n_free_items -= 1
+        n_perms_per_value = counter.count(n_free_items, chains.n_cycles)
+        n_perms_for_closing_value = counter.count(n_free_items,
+                                                  chains.n_cycles + 1)
+        closing_value_position = bisect.bisect_left(
+            unused_values, chains.get_closing_value(key)
+        )
+        n_perms_before_closing_value = \
+                                 closing_value_position * n_perms_per_value
+        if wip_index < n_perms_before_closing_value:
+            value_position = wip_index // n_perms_per_value
+            wip_index -= value_position * n_perms_per_value
+        elif wip_index < (n_perms_before_closing_value +
+                          n_perms_for_closing_value):
+            value_position = closing_value_position
+            wip_index -= n_perms_before_closing_value
+        else:
+            wip_index -= (n_perms_before_closing_value +
+                          n_perms_for_closing_value)
+            value_position = closing_value_position + 1 + \
+                                              wip_index // n_perms_per_value
+            wip_index %= n_perms_per_value
+        value = perm_sequence[key] = unused_values.pop(value_position)
+        chains.connect(key, value)
+    assert wip_index == 0
+    return tuple(perm_sequence)
+
+
+def rank_degreed_perm(sequence_length, fixed_map, counter, perm_sequence):
+    '''
+    Get the index of the perm with `perm_sequence` in a degreed space.
+
+    This is the inverse of `unrank_degreed_perm`. It's assumed that the perm
+    is in the space.
+    '''
+    chains = _Chains(sequence_length, fixed_map)
+    unused_values = sorted(set(range(sequence_length)) -
+                           set(fixed_map.values()))
+    n_free_items = len(unused_values)
+    index = 0
+    for key, value in enumerate(perm_sequence):
+        if key in fixed_map:
+            continue
+        n_free_items -= 1
+        n_perms_per_value = counter.count(n_free_items, chains.n_cycles)
+        value_position = bisect.bisect_left(unused_values, value)
+        index += value_position * n_perms_per_value
+        if chains.get_closing_value(key) < value:
+            index += counter.count(n_free_items, chains.n_cycles + 1) - \
+                                                              n_perms_per_value
+        del unused_values[value_position]
+        chains.connect(key, value)
+    return index
@@ -0,0 +1,356 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for iterating over a `PermSpace` sequentially.
+
+Instead of unranking every index from scratch like `PermSpace.__getitem__`
+does, these step from each perm to the next one. They produce the perms in the
+exact same order as indexing does. See `iterate_perm_sequences` for more
+details.
+'''
+
+import bisect
+import itertools
+import operator
+import collections
+
+
+def iterate_perm_sequences(perm_space):
+    '''
+    Iterate over the sequences of the perms in `perm_space`, in order.
+
+    The sequences are tuples, ordered by the space's indices rather than its
+    domain, so `perm_space.perm_type(perm_sequence, perm_space)` is the
+    matching perm.
+
+    Every kind of space gets its own successor engine:
+
+     - Non-recurrent spaces, combination or not, are stepped through by
+       `itertools.permutations` and `itertools.combinations`, whose orders
+       match ours exactly.
+     - Recurrent spaces are stepped through with a depth-first search that
+       picks candidate values in the same order that `__getitem__` does.
+     - Degreed spaces are stepped through with a depth-first search that
+       prunes any branch that has no perms of the wanted degrees.
+
+    The depth-first searches keep an iterator of candidate values for each
+    position rather than recursing, so they work for sequences of any length.
+
+    For a sliced space, only the first perm of the slice is unranked; the
+    engine is then resumed from that perm, and stopped after the slice's
+    length.
+    '''
+    unsliced_perm_space = perm_space.unsliced
+    start_index = perm_space.canonical_slice.start
+    if perm_space.length and start_index:
+        start = tuple(unsliced_perm_space[start_index]._perm_sequence)
+    else:
+        start = None
+    perm_sequences = _iterate_unsliced_perm_sequences(unsliced_perm_space,
+                                                      start)
+    if not perm_space.is_sliced:
+        return perm_sequences
+    # Not `itertools.islice`, which can't take lengths above `sys.maxsize`:
+    return map(operator.itemgetter(1),
+               zip(range(perm_space.length), perm_sequences))
+
+
+def _iterate_unsliced_perm_sequences(perm_space, start=None):
+    '''
+    Iterate over the perm sequences of an unsliced space.
+
+    If `start` is given, it's the sequence of a perm in the space, and
+    iteration begins from it.
+    '''
+    if perm_space.is_degreed:
+        sequence = perm_space.sequence
+        if perm_space.is_rapplied and start is not None:
+            index_by_value = {value: i for i, value in enumerate(sequence)}
+            start = tuple(map(index_by_value.__getitem__, start))
+        index_sequences = _iterate_degreed_perm_sequences(
+            perm_space.sequence_length,
+            perm_space._undapplied_unrapplied_fixed_map,
+            perm_space._n_cycles_in_fixed_items_of_just_fixed,
+            perm_space._degreed_perm_counter, start
+        )
+        if perm_space.is_rapplied:
+            return (tuple(map(sequence.__getitem__, index_sequence)) for
+                    index_sequence in index_sequences)
+        else:
+            return index_sequences
+
+    elif perm_space.is_recurrent:
+        if perm_space.is_combination:
+            return _iterate_recurrent_comb_sequences(
+                tuple(perm_space.sequence), perm_space.n_elements, start
+            )
+        else:
+            return _iterate_recurrent_perm_sequences(
+                tuple(perm_space.sequence), perm_space.n_elements,
+                perm_space._undapplied_fixed_map, start
+            )
+
+    else:
+        fixed_map = perm_space._undapplied_fixed_map
+        free_positions = tuple(position for position in
+                               range(perm_space.n_elements)
+                               if position not in fixed_map)
+        if start is not None:
+            start = tuple(start[position] for position in free_positions)
+        free_value_sequences = _iterate_arrangements(
+            perm_space.free_values, len(free_positions),
+            perm_space.is_combination, start
+        )
+        if fixed_map:
+            return _add_fixed_values(free_value_sequences, free_positions,
+                                     perm_space.n_elements, fixed_map)
+        else:
+            return free_value_sequences
+
+
+def _iterate_arrangements(pool, n_elements, is_combination, start=None):
+    '''
+    Iterate over the arrangements of the distinct items in `pool`.
+
+    Arrangements are combinations if `is_combination`, and otherwise
+    permutations, both of length `n_elements`. They're ordered
+    lexicographically by the positions of their items in `pool`, which is the
+    order of `itertools.permutations` and `itertools.combinations`.
+
+    If `start` is given, iteration begins from the arrangement `start`. The
+    arrangements that follow it are split into runs that share a prefix, and
+    each run is generated by `itertools`.
+    '''
+    arrange = itertools.combinations if is_combination else \
+                                                        itertools.permutations
+    if start is None:
+        return arrange(pool, n_elements)
+
+    index_by_value = {value: i for i, value in enumerate(pool)}
+    start_indices = tuple(map(index_by_value.__getitem__, start))
+
+    def iterate():
+        yield tuple(start)
+        for depth in reversed(range(n_elements)):
+            prefix = tuple(start[:depth])
+            if is_combination:
+                next_indices = range(start_indices[depth] + 1, len(pool))
+            else:
+                used_indices = set(start_indices[:depth])
+                free_indices = [i for i in range(len(pool))
+                                if i not in used_indices]
+                next_indices = [i for i in free_indices
+                                if i > start_indices[depth]]
+            for index in next_indices:
+                if is_combination:
+                    rest = pool[index + 1:]
+                else:
+                    rest = [pool[i] for i in free_indices if i != index]
+                new_prefix = prefix + (pool[index],)
+                for suffix in arrange(rest, n_elements - depth - 1):
+                    yield new_prefix + suffix
+
+    return iterate()
+
+
+def _add_fixed_values(free_value_sequences, free_positions, n_elements,
+                      fixed_map):
+    '''Put the fixed values in their positions in each of the sequences.'''
+    template = [fixed_map.get(position) for position in range(n_elements)]
+    for free_value_sequence in free_value_sequences:
+        perm_sequence = template[:]
+        for position, value in zip(free_positions, free_value_sequence):
+            perm_sequence[position] = value
+        yield tuple(perm_sequence)
+
+
+def _search_depth_first(n_positions, iterate_candidates, put_in, take_out):
+    '''
+    Yield after each way of filling all of `n_positions` with values.
+
+    `iterate_candidates(position)` makes an iterator of the values to try in
+    `position`, given the values in the positions before it; it's called when
+    the search first gets to that position, and the iterator is used lazily.
+    `put_in(position, value)` and `take_out(position, value)` update the
+    state of the caller.
+
+    This uses a list of iterators instead of recursion, so `n_positions`
+    isn't limited by Python's recursion limit.
+    '''
+    iterators = [None] * n_positions
+    values = [None] * n_positions
+    position = 0
+    while position >= 0:
+        if position == n_positions:
+            yield
+            position -= 1
+            continue
+        if iterators[position] is None:
+            iterators[position] = iterate_candidates(position)
+        else:
+            take_out(position, values[position])
+        for value in iterators[position]:
+            values[position] = value
+            put_in(position, value)
+            position += 1
+            break
+        else:
+            iterators[position] = None
+            position -= 1
+
+
+def _iterate_recurrent_perm_sequences(sequence, n_elements, fixed_map,
+                                      start=None):
+    '''
+    Iterate over the perm sequences of a recurrent, non-combination space.
+
+    At each position, `PermSpace.__getitem__` tries the available values in
+    the order of their first appearance in what's left of `sequence`, after
+    removing the first appearance of each value already used. So if a value
+    was used `n` times, it's ordered by the position of its `n+1`th
+    appearance in `sequence`. Values that are still needed for fixed positions
+    further on aren't available.
+    '''
+    appearances = collections.OrderedDict()
+    for position, value in enumerate(sequence):
+        appearances.setdefault(value, []).append(position)
+    n_uses = dict.fromkeys(appearances, 0)
+    n_reserved = collections.Counter(fixed_map.values())
+    perm_sequence = [None] * n_elements
+
+    def iterate_candidates(position):
+        if position in fixed_map:
+            return iter((fixed_map[position],))
+        candidates = sorted(
+            (value for value, value_appearances in appearances.items() if
+             n_uses[value] + n_reserved[value] < len(value_appearances)),
+            key=lambda value: appearances[value][n_uses[value]]
+        )
+        if start is not None:
+            candidates = candidates[candidates.index(start[position]):]
+        return iter(candidates)
+
+    def put_in(position, value):
+        perm_sequence[position] = value
+        n_uses[value] += 1
+        if position in fixed_map:
+            n_reserved[value] -= 1
+
+    def take_out(position, value):
+        n_uses[value] -= 1
+        if position in fixed_map:
+            n_reserved[value] += 1
+
+    for _ in _search_depth_first(n_elements, iterate_candidates, put_in,
+                                 take_out):
+        yield tuple(perm_sequence)
+        start = None
+
+
+def _iterate_recurrent_comb_sequences(sequence, n_elements, start=None):
+    '''
+    Iterate over the comb sequences of a recurrent space.
+
+    Each comb is taken from what's left of `sequence` after the appearance of
+    the previous item in the comb. At each position the values are tried in
+    the order of their first appearance in what's left, and once all the
+    combs starting with a value were produced, that value is excluded from
+    the rest of the comb, like `PermSpace.__getitem__` does. This makes every
+    combination of values appear exactly once.
+    '''
+    appearances = {}
+    for position, value in enumerate(sequence):
+        appearances.setdefault(value, []).append(position)
+    comb_sequence = [None] * n_elements
+    excluded_values = set()
+    # For each depth, the position in `sequence` of its value, and the number
+    # of items after it that aren't excluded:
+    chosen_positions = [-1] * n_elements
+    n_items_left_after = [len(sequence)] + [None] * n_elements
+
+    def iterate_candidates(depth):
+        # `n_items_left` is the number of items from `position` on that aren't
+        # excluded. It's kept up to date as we go rather than counted for
+        # each candidate.
+        n_items_left = n_items_left_after[depth]
+        newly_excluded_values = []
+        for position in range(chosen_positions[depth - 1] + 1 if depth else 0,
+                              len(sequence)):
+            value = sequence[position]
+            if value in excluded_values:
+                continue
+            if n_items_left - 1 < n_elements - depth - 1:
+                break # Not enough items left, here or further on.
+            if start is None or value == start[depth]:
+                yield (position, n_items_left - 1)
+            appearances_of_value = appearances[value]
+            n_items_left -= len(appearances_of_value) - \
+                            bisect.bisect_left(appearances_of_value, position)
+            excluded_values.add(value)
+            newly_excluded_values.append(value)
+        excluded_values.difference_update(newly_excluded_values)
+
+    def put_in(depth, position_and_n_items_left):
+        position, n_items_left = position_and_n_items_left
+        comb_sequence[depth] = sequence[position]
+        chosen_positions[depth] = position
+        n_items_left_after[depth + 1] = n_items_left
+
+    for _ in _search_depth_first(n_elements, iterate_candidates, put_in,
+                                 lambda depth, value: None):
+        yield tuple(comb_sequence)
+        start = None
+
+
+def _iterate_degreed_perm_sequences(sequence_length, fixed_map,
+                                    n_cycles_in_fixed_items,
+                                    degreed_perm_counter, start=None):
+    '''
+    Iterate over the perm sequences of a degreed space.
+
+    The space is taken as unrapplied and undapplied, so `fixed_map` maps
+    indices to indices. Values are tried in ascending order at each position,
+    and a value is used only if `degreed_perm_counter` says that some perm of
+    the space's degrees starts with the values chosen so far.
+    '''
+    perm_sequence = [fixed_map.get(i) for i in range(sequence_length)]
+    is_available = [True] * sequence_length
+    for value in fixed_map.values():
+        is_available[value] = False
+    free_positions = [i for i in range(sequence_length) if i not in fixed_map]
+    # The number of cycles closed before each depth:
+    n_cycles = [n_cycles_in_fixed_items] + [None] * len(free_positions)
+
+    def iterate_candidates(depth):
+        position = free_positions[depth]
+        n_free_items = len(free_positions) - depth - 1
+        first_value = 0 if start is None else start[position]
+        for value in range(first_value, sequence_length):
+            if not is_available[value]:
+                continue
+            ### Checking whether we closed a cycle: ###########################
+            #                                                                 #
+            current = value
+            while perm_sequence[current] is not None:
+                current = perm_sequence[current]
+            candidate_n_cycles = n_cycles[depth] + (current == position)
+            #                                                                 #
+            ### Finished checking whether we closed a cycle. ##################
+            if degreed_perm_counter.count(n_free_items, candidate_n_cycles):
+                yield (value, candidate_n_cycles)
+
+    def put_in(depth, value_and_n_cycles):
+        value, n_cycles[depth + 1] = value_and_n_cycles
+        perm_sequence[free_positions[depth]] = value
+        is_available[value] = False
+
+    def take_out(depth, value_and_n_cycles):
+        value, _ = value_and_n_cycles
+        perm_sequence[free_positions[depth]] = None
+        is_available[value] = True
+
+    for _ in _search_depth_first(len(free_positions), iterate_candidates,
+                                 put_in, take_out):
+        yield tuple(perm_sequence)
+        start = None
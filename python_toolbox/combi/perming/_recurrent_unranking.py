@@ -0,0 +1,223 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for unranking and ranking perms in recurrent spaces.
+
+These work on vectors of how many times each value is left, rather than on
+temporary `PermSpace` objects. See `unrank_recurrent_perm` and
+`unrank_recurrent_comb` for more details.
+'''
+
+import collections
+
+from .calculating_length import (calculate_length_of_recurrent_perm_space,
+                                 calculate_length_of_recurrent_comb_space)
+
+
+def _get_length(n_elements, counts, is_combination):
+    '''
+    Get the number of perms of `n_elements` items taken from a multiset.
+
+    `counts` is the number of times each value is in the multiset. The lengths
+    are memoized in the caches of `calculating_length`, which are keyed by the
+    shape of the multiset, so they're shared between all the multisets that
+    have the same shape.
+    '''
+    counts = [count for count in counts if count]
+    if n_elements == 0:
+        return 1
+    elif n_elements > sum(counts):
+        return 0
+    elif is_combination:
+        return calculate_length_of_recurrent_comb_space(n_elements, counts)
+    else:
+        return calculate_length_of_recurrent_perm_space(n_elements, counts)
+
+
+class _RecurrentPermWalk:
+    '''
+    A walk over the positions of a recurrent perm, choosing a value for each.
+
+    At each position, `PermSpace.__getitem__` orders the available values by
+    their first appearance in what's left of the sequence, after removing the
+    first appearance of each value already used. So if a value was used `n`
+    times, it's ordered by the position of its `n+1`th appearance in the
+    sequence. Values needed for fixed positions further on aren't available.
+    '''
+    def __init__(self, sequence, n_elements, fixed_map):
+        self.n_elements = n_elements
+        self.fixed_map = fixed_map
+        self.appearances = collections.OrderedDict()
+        for position, value in enumerate(sequence):
+            self.appearances.setdefault(value, []).append(position)
+        self.n_uses = dict.fromkeys(self.appearances, 0)
+        n_reserved = collections.Counter(fixed_map.values())
+        self.n_free = {value: len(appearances) - n_reserved[value] for
+                       value, appearances in self.appearances.items()}
+        self.n_free_positions = n_elements - len(fixed_map)
+
+
+    def iterate_candidate_lengths(self):
+        '''
+        Iterate over the candidates for the next free position, in order.
+
+        Yields tuples of a value and the number of perms that continue with
+        it.
+        '''
+        self.n_free_positions -= 1
+        candidates = sorted(
+            (value for value, n_free in self.n_free.items() if n_free),
+            key=lambda value: self.appearances[value][self.n_uses[value]]
+        )
+        counts = list(self.n_free.values())
+        length_by_count = {}
+        for value in candidates:
+            count = self.n_free[value]
+            try:
+                length = length_by_count[count]
+            except KeyError:
+                counts.remove(count)
+                counts.append(count - 1)
+                length = length_by_count[count] = _get_length(
+                    self.n_free_positions, counts, is_combination=False
+                )
+                counts[-1] = count
+            yield value, length
+
+
+    def use(self, value, is_fixed=False):
+        self.n_uses[value] += 1
+        if not is_fixed:
+            self.n_free[value] -= 1
+
+
+def unrank_recurrent_perm(sequence, n_elements, fixed_map, index):
+    '''
+    Get the sequence of perm number `index` of a recurrent space.
+
+    The space is undapplied and isn't a combination space, and `fixed_map`
+    maps indices to values. At each position, candidates that lead to the same
+    shape of multiset share one length calculation.
+    '''
+    walk = _RecurrentPermWalk(sequence, n_elements, fixed_map)
+    perm_sequence = []
+    wip_index = index
+    for position in range(n_elements):
+        if position in fixed_map:
+            value = fixed_map[position]
+            walk.use(value, is_fixed=True)
+        else:
+            for value, length in walk.iterate_candidate_lengths():
+                if wip_index < length:
+                    break
+                wip_index -= length
+            else:
+                raise IndexError
+            walk.use(value)
+        perm_sequence.append(value)
+    assert wip_index == 0
+    return tuple(perm_sequence)
+
+
+def rank_recurrent_perm(sequence, n_elements, fixed_map, perm_sequence):
+    '''
+    Get the index of the perm with `perm_sequence` in a recurrent space.
+
+    This is the inverse of `unrank_recurrent_perm`. Raises `ValueError` if
+    the perm isn't in the space.
+    '''
+    walk = _RecurrentPermWalk(sequence, n_elements, fixed_map)
+    index = 0
+    for position, value in enumerate(perm_sequence):
+        if position in fixed_map:
+            if value != fixed_map[position]:
+                raise ValueError
+            walk.use(value, is_fixed=True)
+            continue
+        for candidate, length in walk.iterate_candidate_lengths():
+            if candidate == value:
+                break
+            index += length
+        else:
+            raise ValueError
+        walk.use(value)
+    return index
+
+
+def _iterate_comb_candidate_lengths(sequence, n_elements, depth,
+                                    first_position, excluded_values):
+    '''
+    Iterate over the candidates for position `depth` of a recurrent comb.
+
+    The candidates are the values in `sequence[first_position:]` that aren't
+    in `excluded_values`, in the order of their first appearance there. Each
+    comb takes the rest of its items from after the appearance of the
+    previous one, and once all the combs starting with a value were counted,
+    that value is excluded from the rest of the comb, like
+    `PermSpace.__getitem__` does.
+
+    Yields tuples of a value, its position and the number of combs that
+    continue with it. `excluded_values` is updated with each value after it's
+    yielded.
+    '''
+    n_left = collections.Counter(sequence[first_position:])
+    for position in range(first_position, len(sequence)):
+        value = sequence[position]
+        n_left[value] -= 1
+        if value in excluded_values:
+            continue
+        length = _get_length(
+            n_elements - depth - 1,
+            [count for value_, count in n_left.items() if value_ not in
+             excluded_values],
+            is_combination=True
+        )
+        yield value, position, length
+        excluded_values.add(value)
+
+
+def unrank_recurrent_comb(sequence, n_elements, index):
+    '''Get the sequence of comb number `index` of a recurrent space.'''
+    excluded_values = set()
+    comb_sequence = []
+    first_position = 0
+    wip_index = index
+    for depth in range(n_elements):
+        for value, position, length in _iterate_comb_candidate_lengths(
+                      sequence, n_elements, depth, first_position,
+                      excluded_values):
+            if wip_index < length:
+                break
+            wip_index -= length
+        else:
+            raise IndexError
+        comb_sequence.append(value)
+        first_position = position + 1
+    assert wip_index == 0
+    return tuple(comb_sequence)
+
+
+def rank_recurrent_comb(sequence, n_elements, comb_sequence):
+    '''
+    Get the index of the comb with `comb_sequence` in a recurrent space.
+
+    This is the inverse of `unrank_recurrent_comb`. Raises `ValueError` if
+    the comb isn't in the space.
+    '''
+    excluded_values = set()
+    first_position = 0
+    index = 0
+    for depth, value in enumerate(comb_sequence):
+        for candidate, position, length in _iterate_comb_candidate_lengths(
+                      sequence, n_elements, depth, first_position,
+                      excluded_values):
+            if candidate == value:
+                if not length:
+                    raise ValueError
+                break
+            index += length
+        else:
+            raise ValueError
+        first_position = position + 1
+    return index
@@ -0,0 +1,85 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines tools for constructing random perms directly.
+
+See `make_random_perm_sequence` for more details.
+'''
+
+import collections
+
+from ._recurrent_unranking import _get_length
+
+
+def _make_random_recurrent_values(free_values, n_free_positions,
+                                  random_generator):
+    '''
+    Choose values for the free positions of a partial recurrent perm.
+
+    Taking the first items of a shuffled multiset doesn't give every
+    arrangement the same chance, so the values are chosen one by one, each
+    with a probability proportional to the number of perms that continue with
+    it.
+    '''
+    counts = collections.Counter(free_values)
+    values = []
+    for n_positions_left in range(n_free_positions - 1, -1, -1):
+        wip_number = random_generator.randrange(
+            _get_length(n_positions_left + 1, counts.values(),
+                        is_combination=False)
+        )
+        for value, count in counts.items():
+            if not count:
+                continue
+            counts[value] -= 1
+            length = _get_length(n_positions_left, counts.values(),
+                                 is_combination=False)
+            if wip_number < length:
+                break
+            counts[value] += 1
+            wip_number -= length
+        else:
+            raise RuntimeError
+        values.append(value)
+    return values
+
+
+def make_random_perm_sequence(perm_space, random_generator):
+    '''
+    Make the sequence of a random perm of `perm_space`, uniformly.
+
+    This constructs the perm directly, with a partial Fisher-Yates shuffle of
+    the free values, (which is what `random.Random.sample` does,) or with
+    sequential sampling of the multiset for partial recurrent spaces. The
+    sequence is undapplied, like the ones `Perm` is made from.
+
+    Returns `None` for spaces that have no direct way, i.e. degreed, sliced
+    and recurrent combination spaces; pick a random index for those.
+    '''
+    if perm_space.is_degreed or perm_space.is_sliced:
+        return None
+
+    if perm_space.is_combination:
+        if perm_space.is_recurrent or perm_space.is_fixed:
+            return None
+        indices = random_generator.sample(range(perm_space.sequence_length),
+                                          perm_space.n_elements)
+        return tuple(map(perm_space.sequence.__getitem__, sorted(indices)))
+
+    fixed_map = perm_space._undapplied_fixed_map
+    n_free_positions = perm_space.n_elements - len(fixed_map)
+    if perm_space.is_recurrent and perm_space.is_partial:
+        free_values = _make_random_recurrent_values(
+            perm_space.free_values, n_free_positions, random_generator
+        )
+    else:
+        # A full shuffle of a multiset gives every arrangement of it the same
+        # chance, so recurrent spaces that aren't partial get here too.
+        free_values = random_generator.sample(perm_space.free_values,
+                                              n_free_positions)
+    free_values_iterator = iter(free_values)
+    return tuple(
+        fixed_map[i] if i in fixed_map else next(free_values_iterator)
+        for i in range(perm_space.n_elements)
+    )
@@ -1,12 +1,197 @@
 # Copyright 2009-2017 Ram Rachum.
 # This program is distributed under the MIT license.
 
+'''
+Defines tools for calculating the lengths of recurrent spaces.
+
+The lengths are memoized in two `LengthCache`s, one for `PermSpace`s and one
+for `CombSpace`s, which can be swapped for bounded ones with
+`set_length_caches`, and saved and loaded with `save_length_caches` and
+`load_length_caches`.
+'''
+
+import collections
+import collections.abc
 import itertools
+import json
 
 from python_toolbox import nifty_collections
+from python_toolbox.caching.eviction_policies import _get_policy_type
+
+infinity = float('inf')
+
+
+LengthCacheInfo = collections.namedtuple(
+    'LengthCacheInfo', ('hits', 'misses', 'evictions', 'current_size',
+                        'max_size')
+)
+'''
+Statistics about a `LengthCache`, as returned by its `cache_info` method.
+
+`hits` and `misses` are the numbers of lookups that did and didn't find a
+length in the cache. `evictions` is the number of lengths thrown away to keep
+within `max_size`.
+'''
+
+
+def _make_key(k, fbb):
+    '''
+    Encode `k` and a `FrozenBagBag` as a compact, canonical cache key.
+
+    The key is a flat tuple of `k` followed by the numbers of recurrences of
+    the items, sorted, so it's cheap to hash and compare. `fbb` may be a
+    `FrozenBagBag`, or any other mapping like it, or just an iterable of the
+    numbers of recurrences, in which case no mapping has to be built.
+    '''
+    if isinstance(fbb, collections.abc.Mapping):
+        fbb = itertools.chain.from_iterable(
+            itertools.repeat(n_recurrences, count) for n_recurrences, count
+            in fbb.items()
+        )
+    return (k,) + tuple(sorted(filter(None, fbb)))
+
+
+class LengthCache(collections.abc.MutableMapping):
+    '''
+    Cache of lengths of recurrent spaces, optionally bounded.
+
+    Keys are made by `_make_key`, and values are lengths. With a `max_size`,
+    lengths are thrown away when the cache gets too big, as chosen by
+    `eviction_policy`, which is the name of a built-in eviction policy of
+    `caching.cache` or an `EvictionPolicy` subclass.
+    '''
+    def __init__(self, max_size=infinity, eviction_policy='lru'):
+        self.max_size = max_size
+        self._lengths = {}
+        if max_size != infinity:
+            self.eviction_policy = _get_policy_type(eviction_policy)(max_size)
+        else:
+            self.eviction_policy = None
+        self.n_hits = 0
+        self.n_misses = 0
+        self.n_evictions = 0
+
+
+    def __getitem__(self, key):
+        try:
+            length = self._lengths[key]
+        except KeyError:
+            self.n_misses += 1
+            raise
+        self.n_hits += 1
+        if self.eviction_policy is not None:
+            self.eviction_policy.record_hit(key)
+        return length
+
+
+    def __contains__(self, key):
+        # Unlike `__getitem__`, this doesn't count as a use of the key.
+        return key in self._lengths
+
+
+    def __setitem__(self, key, length):
+        if self.eviction_policy is None:
+            self._lengths[key] = length
+        elif key in self._lengths:
+            self._lengths[key] = length
+            self.eviction_policy.record_hit(key)
+        else:
+            while len(self._lengths) >= self.max_size:
+                victim = self.eviction_policy.get_victim(key)
+                del self._lengths[victim]
+                self.eviction_policy.record_eviction(victim)
+                self.n_evictions += 1
+            self._lengths[key] = length
+            self.eviction_policy.record_insertion(key)
+
+
+    def __delitem__(self, key):
+        del self._lengths[key]
+        if self.eviction_policy is not None:
+            self.eviction_policy.record_removal(key)
+
+
+    def __iter__(self):
+        return iter(self._lengths)
+
+
+    def __len__(self):
+        return len(self._lengths)
+
+
+    def clear(self):
+        self._lengths.clear()
+        if self.eviction_policy is not None:
+            self.eviction_policy.clear()
+
+
+    def cache_info(self):
+        '''Get a `LengthCacheInfo` with statistics about the cache.'''
+        return LengthCacheInfo(hits=self.n_hits, misses=self.n_misses,
+                               evictions=self.n_evictions,
+                               current_size=len(self),
+                               max_size=self.max_size)
+
+
+    def __repr__(self):
+        return (f'<{type(self).__name__}: {len(self)} lengths, max_size='
+                f'{self.max_size}>')
+
 
+_length_of_recurrent_perm_space_cache = LengthCache()
+_length_of_recurrent_comb_space_cache = LengthCache()
+
+
+def get_length_caches():
+    '''Get the `LengthCache`s for perm spaces and for comb spaces.'''
+    return (_length_of_recurrent_perm_space_cache,
+            _length_of_recurrent_comb_space_cache)
+
+
+def set_length_caches(perm_space_cache=None, comb_space_cache=None):
+    '''
+    Replace the caches used for lengths of perm spaces and of comb spaces.
+
+    Each cache may be a `LengthCache`, (e.g. one with a `max_size` for a
+    long-running process,) or any other mutable mapping. A cache that's `None`
+    is left as it is.
+    '''
+    global _length_of_recurrent_perm_space_cache, \
+                                          _length_of_recurrent_comb_space_cache
+    if perm_space_cache is not None:
+        _length_of_recurrent_perm_space_cache = perm_space_cache
+    if comb_space_cache is not None:
+        _length_of_recurrent_comb_space_cache = comb_space_cache
+
+
+def save_length_caches(path):
+    '''
+    Save the lengths in the caches to a file at `path`.
+
+    The file is JSON, so it's safe to load in other processes, like workers
+    that should start with a warm cache. See `load_length_caches`.
+    '''
+    with open(path, 'w') as file:
+        json.dump(
+            {name: [[list(key), length] for key, length in cache.items()]
+             for name, cache in zip(('perm', 'comb'), get_length_caches())},
+            file
+        )
+
+
+def load_length_caches(path):
+    '''
+    Load lengths saved by `save_length_caches` into the current caches.
+
+    Lengths that are already in the caches are kept. If a cache is bounded,
+    only as many lengths as it can hold are kept.
+    '''
+    with open(path) as file:
+        saved = json.load(file)
+    for name, cache in zip(('perm', 'comb'), get_length_caches()):
+        for key, length in saved[name]:
+            cache[tuple(key)] = length
 
-_length_of_recurrent_perm_space_cache = {}
 
 def calculate_length_of_recurrent_perm_space(k, fbb):
     '''
@@ -16,30 +201,28 @@ def calculate_length_of_recurrent_perm_space(k, fbb):
     is the space's `FrozenBagBag`, meaning a bag where each key is the number
     of recurrences of an item and each count is the number of different items
     that have this number of recurrences. (See documentation of `FrozenBagBag`
-    for more info.)
+    for more info.) `fbb` may also be given as an iterable of the numbers of
+    recurrences, in which case the `FrozenBagBag` is made only if the length
+    isn't cached.
 
     It's assumed that the space is not a `CombSpace`, it's not fixed, not
     degreed and not sliced.
     '''
     cache = _length_of_recurrent_perm_space_cache
-    if not isinstance(fbb, nifty_collections.FrozenBagBag):
-        fbb = nifty_collections.FrozenBagBag(fbb)
-    ### Checking for edge cases: ##############################################
-    #                                                                         #
-    if k == 0:
+    if k == 0: # The only edge case that doesn't need the key.
         return 1
-    elif k == 1:
-        assert fbb
-        # (Works because `FrozenBagBag` has a functioning `__bool__`, unlike
-        # Python's `Counter`.)
-        return fbb.n_elements
-    #                                                                         #
-    ### Finished checking for edge cases. #####################################
+    key = _make_key(k, fbb)
+    if k == 1:
+        # The key has the number of recurrences of each item after `k`:
+        assert len(key) >= 2
+        return len(key) - 1
 
     try:
-        return cache[(k, fbb)]
+        return cache[key]
     except KeyError:
         pass
+    if not isinstance(fbb, nifty_collections.FrozenBagBag):
+        fbb = nifty_collections.FrozenBagBag(fbb)
 
     # This is a 2-phase algorithm, similar to recursion but not really
     # recursion since we don't want to abuse the stack.
@@ -53,8 +236,10 @@ def calculate_length_of_recurrent_perm_space(k, fbb):
     # simplest ones and making our way up to the original FBB. The simplest
     # FBBs will be solved trivially, and then as they get progressively more
     # complex, each FBB will be solved using the solutions of its sub-FBB.
-    # Every solution will be stored in the global cache.
-
+    # Every solution will be stored in the cache. Until we're done, solutions
+    # are also kept in `solutions`, because a bounded cache might evict them
+    # before we get to use them.
+    solutions = {}
 
     ### Doing phase one, getting all sub-FBBs: ################################
     #                                                                         #
@@ -62,11 +247,15 @@ def calculate_length_of_recurrent_perm_space(k, fbb):
     current_fbbs = {fbb}
     while len(levels) < k and current_fbbs:
         k_ = k - len(levels)
-        levels.append(
-            {fbb_: fbb_.get_sub_fbbs_for_one_key_removed()
-             for fbb_ in current_fbbs if (k_, fbb_) not in cache}
-        )
-        current_fbbs = set(itertools.chain(*levels[-1].values()))
+        level = {}
+        for fbb_ in current_fbbs:
+            key_ = _make_key(k_, fbb_)
+            if key_ in cache:
+                solutions[key_] = cache[key_]
+            else:
+                level[fbb_] = fbb_.get_sub_fbbs_for_one_key_removed()
+        levels.append(level)
+        current_fbbs = set(itertools.chain(*level.values()))
     #                                                                         #
     ### Finished doing phase one, getting all sub-FBBs. #######################
 
@@ -75,25 +264,24 @@ def calculate_length_of_recurrent_perm_space(k, fbb):
     for k_, level in enumerate(reversed(levels), (k - len(levels) + 1)):
         if k_ == 1:
             for fbb_, sub_fbb_bag in level.items():
-                cache[(k_, fbb_)] = fbb_.n_elements
+                solutions[_make_key(k_, fbb_)] = fbb_.n_elements
         else:
             for fbb_, sub_fbb_bag in level.items():
-                cache[(k_, fbb_)] = sum(
-                    (cache[(k_ - 1, sub_fbb)] * factor for
+                solutions[_make_key(k_, fbb_)] = sum(
+                    (solutions[_make_key(k_ - 1, sub_fbb)] * factor for
                            sub_fbb, factor in sub_fbb_bag.items())
                 )
     #                                                                         #
     ### Finished doing phase two, solving FBBs from trivial to complex. #######
 
-    return cache[(k, fbb)]
+    cache.update(solutions)
+    return solutions[key]
 
 
 
 
 ###############################################################################
 
-_length_of_recurrent_comb_space_cache = {}
-
 def calculate_length_of_recurrent_comb_space(k, fbb):
     '''
     Calculate the length of a recurrent `CombSpace`.
@@ -102,29 +290,27 @@ def calculate_length_of_recurrent_comb_space(k, fbb):
     is the space's `FrozenBagBag`, meaning a bag where each key is the number
     of recurrences of an item and each count is the number of different items
     that have this number of recurrences. (See documentation of `FrozenBagBag`
-    for more info.)
+    for more info.) `fbb` may also be given as an iterable of the numbers of
+    recurrences, in which case the `FrozenBagBag` is made only if the length
+    isn't cached.
 
     It's assumed that the space is not fixed, not degreed and not sliced.
     '''
     cache = _length_of_recurrent_comb_space_cache
-    if not isinstance(fbb, nifty_collections.FrozenBagBag):
-        fbb = nifty_collections.FrozenBagBag(fbb)
-    ### Checking for edge cases: ##############################################
-    #                                                                         #
-    if k == 0:
+    if k == 0: # The only edge case that doesn't need the key.
         return 1
-    elif k == 1:
-        assert fbb
-        # (Works because `FrozenBagBag` has a functioning `__bool__`,
-        # unlike Python's `Counter`.)
-        return fbb.n_elements
-    #                                                                         #
-    ### Finished checking for edge cases. #####################################
+    key = _make_key(k, fbb)
+    if k == 1:
+        # The key has the number of recurrences of each item after `k`:
+        assert len(key) >= 2
+        return len(key) - 1
 
     try:
-        return cache[(k, fbb)]
+        return cache[key]
     except KeyError:
         pass
+    if not isinstance(fbb, nifty_collections.FrozenBagBag):
+        fbb = nifty_collections.FrozenBagBag(fbb)
 
     # This is a 2-phase algorithm, similar to recursion but not really
     # recursion since we don't want to abuse the stack.
@@ -138,8 +324,10 @@ def calculate_length_of_recurrent_comb_space(k, fbb):
     # simplest ones and making our way up to the original FBB. The simplest
     # FBBs will be solved trivially, and then as they get progressively more
     # complex, each FBB will be solved using the solutions of its sub-FBB.
-    # Every solution will be stored in the global cache.
-
+    # Every solution will be stored in the cache. Until we're done, solutions
+    # are also kept in `solutions`, because a bounded cache might evict them
+    # before we get to use them.
+    solutions = {}
 
     ### Doing phase one, getting all sub-FBBs: ################################
     #                                                                         #
@@ -147,11 +335,17 @@ def calculate_length_of_recurrent_comb_space(k, fbb):
     current_fbbs = {fbb}
     while len(levels) < k and current_fbbs:
         k_ = k - len(levels)
-        levels.append(
-            {fbb_: fbb_.get_sub_fbbs_for_one_key_and_previous_piles_removed()
-             for fbb_ in current_fbbs if (k_, fbb_) not in cache}
-        )
-        current_fbbs = set(itertools.chain(*levels[-1].values()))
+        level = {}
+        for fbb_ in current_fbbs:
+            key_ = _make_key(k_, fbb_)
+            if key_ in cache:
+                solutions[key_] = cache[key_]
+            else:
+                get_sub_fbbs = \
+                       fbb_.get_sub_fbbs_for_one_key_and_previous_piles_removed
+                level[fbb_] = get_sub_fbbs()
+        levels.append(level)
+        current_fbbs = set(itertools.chain(*level.values()))
     #                                                                         #
     ### Finished doing phase one, getting all sub-FBBs. #######################
 
@@ -160,16 +354,15 @@ def calculate_length_of_recurrent_comb_space(k, fbb):
     for k_, level in enumerate(reversed(levels), (k - len(levels) + 1)):
         if k_ == 1:
             for fbb_, sub_fbbs in level.items():
-                cache[(k_, fbb_)] = len(sub_fbbs)
+                solutions[_make_key(k_, fbb_)] = len(sub_fbbs)
         else:
             for fbb_, sub_fbbs in level.items():
-                cache[(k_, fbb_)] = sum(
-                    (cache[(k_ - 1, sub_fbb)] for sub_fbb in sub_fbbs)
+                solutions[_make_key(k_, fbb_)] = sum(
+                    (solutions[_make_key(k_ - 1, sub_fbb)] for
+                                                         sub_fbb in sub_fbbs)
                 )
     #                                                                         #
     ### Finished doing phase two, solving FBBs from trivial to complex. #######
 
-    return cache[(k, fbb)]
-
-
-
+    cache.update(solutions)
+    return solutions[key]
@@ -3,16 +3,17 @@
 
 import functools
 import abc
+import array
 import collections
 import numbers
 
 from python_toolbox import misc_tools
 from python_toolbox import nifty_collections
-from python_toolbox import caching
 from python_toolbox import sequence_tools
 from python_toolbox import cute_iter_tools
 
 from .. import misc
+from . import perm_algebra
 
 
 infinity = float('inf')
@@ -55,6 +56,65 @@ class PermAsDictoid(sequence_tools.CuteSequenceMixin, _BasePermView,
 
 
 
+class _DerivedProperty:
+    '''
+    A property of a `Perm` that's calculated once, and then cached.
+
+    `Perm` has `__slots__` to keep it small, so unlike `CachedProperty`, this
+    caches its value in the perm's `_derived` slot, which is `None` until the
+    first derived property is calculated, and then a small `dict`. A value
+    that's the perm itself isn't cached, because that would make a reference
+    cycle.
+    '''
+    def __init__(self, getter, doc=None):
+        self.getter = getter
+        self.__doc__ = doc or getattr(getter, '__doc__', None)
+
+
+    def __get__(self, perm, perm_type=None):
+        if perm is None:
+            return self
+        derived = perm._derived
+        try:
+            return derived[self]
+        except (TypeError, KeyError): # (`TypeError` for `derived is None`.)
+            pass
+        value = self.getter(perm)
+        if value is not perm:
+            if derived is None:
+                derived = perm._derived = {}
+            derived[self] = value
+        return value
+
+
+def _compact_perm_sequence(perm_sequence, sequence_length):
+    '''
+    Get a compact version of a perm sequence of small non-negative integers.
+
+    Uses `bytes` for spaces of up to 256 items, and an `array` of 2-byte
+    integers for spaces of up to 65536 items, which take a fraction of the
+    memory of a `tuple` of `int`s. If `perm_sequence` has anything that
+    doesn't fit, (which can only happen if it isn't a valid perm of the
+    space,) it's returned as it is.
+    '''
+    try:
+        if sequence_length <= 256:
+            return bytes(perm_sequence)
+        elif sequence_length <= 65536:
+            return array.array('H', perm_sequence)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    return perm_sequence
+
+
+def _get_perm_by_index(perm_type, perm_space, index):
+    '''Get perm number `index` of `perm_space` as a `perm_type`.'''
+    perm = perm_space[index]
+    if type(perm) is not perm_type:
+        perm = perm_type(perm._perm_sequence, perm_space)
+    return perm
+
+
 class PermType(abc.ABCMeta):
     '''
     Metaclass for `Perm` and `Comb`.
@@ -86,7 +146,13 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
         >>> perm_space.index(perm)
         23
 
+    Perms are kept small, so you can hold millions of them: There's no
+    `__dict__`, the sequence of a perm that isn't rapplied is stored as
+    `bytes` or an `array` of integers, and properties like `inverse` and
+    `n_cycles` are calculated only when asked for, into a side slot.
+
     '''
+    __slots__ = ('nominal_perm_space', '_perm_sequence', '_derived')
 
     @classmethod
     def coerce(cls, item, perm_space=None):
@@ -131,27 +197,79 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
         #                                                                     #
         ### Finished analyzing `perm_space`. ##################################
 
-        self.is_rapplied = self.nominal_perm_space.is_rapplied
-        self.is_recurrent = self.nominal_perm_space.is_recurrent
-        self.is_partial = self.nominal_perm_space.is_partial
-        self.is_combination = self.nominal_perm_space.is_combination
-        self.is_dapplied = self.nominal_perm_space.is_dapplied
-        self.is_pure = not (self.is_rapplied or self.is_dapplied
-                            or self.is_partial or self.is_combination)
+        if self.is_rapplied:
+            self._perm_sequence = perm_sequence
+        else:
+            self._perm_sequence = _compact_perm_sequence(
+                perm_sequence, self.nominal_perm_space.sequence_length
+            )
+        self._derived = None
 
-        if not self.is_rapplied: self.unrapplied = self
-        if not self.is_dapplied: self.undapplied = self
-        if not self.is_combination: self.uncombinationed = self
+        assert self.is_combination == isinstance(self, Comb)
 
-        self._perm_sequence = sequence_tools. \
-             ensure_iterable_is_immutable_sequence(perm_sequence)
 
-        assert self.is_combination == isinstance(self, Comb)
+    is_rapplied = property(lambda self: self.nominal_perm_space.is_rapplied)
+    is_recurrent = property(lambda self: self.nominal_perm_space.is_recurrent)
+    is_partial = property(lambda self: self.nominal_perm_space.is_partial)
+    is_combination = property(
+        lambda self: self.nominal_perm_space.is_combination
+    )
+    is_dapplied = property(lambda self: self.nominal_perm_space.is_dapplied)
+    is_pure = property(
+        lambda self: not (self.is_rapplied or self.is_dapplied or
+                          self.is_partial or self.is_combination)
+    )
+
+    @property
+    def _is_algebra_fast(self):
+        '''
+        Whether this perm can use the fast path of `perm_algebra`.
+
+        That's the case for a pure perm of a type that doesn't customize
+        `__init__`, so we can make perms of its type without calling it.
+        '''
+        return self.is_pure and type(self).__init__ is Perm.__init__
+
 
+    @classmethod
+    def _make_unchecked(cls, perm_sequence, nominal_perm_space):
+        '''
+        Make a perm without going through `__init__`, which checks the space.
+
+        `perm_sequence` must already be compact, (see
+        `_compact_perm_sequence`,) and `nominal_perm_space` must be the
+        nominal perm space itself.
+        '''
+        perm = cls.__new__(cls)
+        perm.nominal_perm_space = nominal_perm_space
+        perm._perm_sequence = perm_sequence
+        perm._derived = None
+        return perm
 
-    _reduced = property(lambda self: (
-        type(self), self._perm_sequence, self.nominal_perm_space
-    ))
+
+    @property
+    def _reduced(self):
+        perm_sequence = self._perm_sequence
+        if isinstance(perm_sequence, array.array):
+            perm_sequence = perm_sequence.tobytes() # (Arrays aren't hashable.)
+        return (type(self), perm_sequence, self.nominal_perm_space)
+
+
+    def __reduce__(self):
+        '''
+        Pickle the perm as its index in its nominal perm space.
+
+        The space is pickled by the arguments that make it, and `pickle`
+        pickles it only once no matter how many perms share it. A perm that
+        isn't in its nominal perm space is pickled with its sequence.
+        '''
+        try:
+            index = self.nominal_perm_space.index(self)
+        except ValueError:
+            return (type(self), (tuple(self._perm_sequence),
+                                 self.nominal_perm_space))
+        return (_get_perm_by_index,
+                (type(self), self.nominal_perm_space, index))
 
     __iter__ = lambda self: iter(self._perm_sequence)
 
@@ -165,6 +283,10 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
     __bool__ = lambda self: bool(self._perm_sequence)
 
     def __contains__(self, item):
+        if isinstance(self._perm_sequence, bytes) and \
+                                       not isinstance(item, numbers.Integral):
+            # `bytes` would look for `item` as a sub-sequence.
+            return False
         try:
             return (item in self._perm_sequence)
         except TypeError:
@@ -195,12 +317,16 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
             4
 
         '''
+        if isinstance(self._perm_sequence, bytes) and \
+                                     not isinstance(member, numbers.Integral):
+            # `bytes` would look for `member` as a sub-sequence.
+            raise ValueError
         numerical_index = self._perm_sequence.index(member)
         return self.nominal_perm_space. \
                domain[numerical_index] if self.is_dapplied else numerical_index
 
 
-    @caching.CachedProperty
+    @_DerivedProperty
     def inverse(self):
         '''
         The inverse of this permutation.
@@ -227,6 +353,11 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
             raise TypeError("Rapplied perms don't have an inverse.")
         if self.is_dapplied:
             raise TypeError("Dapplied perms don't have an inverse.")
+        if self._is_algebra_fast:
+            return self._make_unchecked(
+                perm_algebra.invert(self._perm_sequence),
+                self.nominal_perm_space
+            )
         if self.is_rapplied:
             return self.nominal_perm_space[0] * self.unrapplied.inverse
         else:
@@ -239,15 +370,17 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
 
     __invert__ = lambda self: self.inverse
 
-    domain = caching.CachedProperty(
+    domain = property(
         lambda self: self.nominal_perm_space.domain,
-        '''The permutation's domain.'''
+        doc='''The permutation's domain.'''
     )
 
 
-    @caching.CachedProperty
+    @_DerivedProperty
     def unrapplied(self):
         '''An unrapplied version of this permutation.'''
+        if not self.is_rapplied:
+            return self
         ### Calculating the new perm sequence: ################################
         #                                                                     #
         # This is more complex than a one-line generator because of recurrent
@@ -268,19 +401,19 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
         assert not unrapplied.is_rapplied
         return unrapplied
 
-    undapplied = caching.CachedProperty(
+    undapplied = _DerivedProperty(
         lambda self: type(self)(
             self._perm_sequence,
             self.nominal_perm_space.undapplied
-        ),
+        ) if self.is_dapplied else self,
         '''An undapplied version of this permutation.'''
 
     )
-    uncombinationed = caching.CachedProperty(
+    uncombinationed = _DerivedProperty(
         lambda self: Perm(
             self._perm_sequence,
             self.nominal_perm_space.uncombinationed
-        ),
+        ) if self.is_combination else self,
         '''A non-combination version of this permutation.'''
 
     )
@@ -295,6 +428,9 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
                 raise IndexError
         else:
             i_to_use = i
+        if isinstance(i_to_use, slice):
+            # The compact `bytes` or `array` shouldn't leak out.
+            return tuple(self._perm_sequence[i_to_use])
         return self._perm_sequence[i_to_use]
 
     length = property(
@@ -343,13 +479,34 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
 
     __rmul__ = apply
 
-    __mul__ = lambda self, other: other.__rmul__(self)
-    # (Must define this explicitly because of Python special-casing
-    # multiplication of objects of the same type.)
+    def __mul__(self, other):
+        # (Must define this explicitly because of Python special-casing
+        # multiplication of objects of the same type.)
+        if isinstance(other, Perm) and self._is_algebra_fast and \
+                                 other._is_algebra_fast and \
+                                 self.nominal_perm_space.sequence_length == \
+                                 other.nominal_perm_space.sequence_length:
+            return type(other)._make_unchecked(
+                perm_algebra.compose(self._perm_sequence,
+                                     other._perm_sequence),
+                self.nominal_perm_space
+            )
+        return other.__rmul__(self)
+
 
     def __pow__(self, exponent):
-        '''Raise the perm by the power of `exponent`.'''
+        '''
+        Raise the perm by the power of `exponent`.
+
+        For pure perms, this rotates each cycle by `exponent` steps, which
+        takes O(n) time no matter how big `exponent` is.
+        '''
         assert isinstance(exponent, numbers.Integral)
+        if self._is_algebra_fast:
+            return self._make_unchecked(
+                perm_algebra.power(self._perm_sequence, exponent),
+                self.nominal_perm_space
+            )
         if exponent <= -1:
             return self.inverse ** (- exponent)
         elif exponent == 0:
@@ -359,7 +516,7 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
             return misc_tools.general_product((self,) * exponent)
 
 
-    @caching.CachedProperty
+    @_DerivedProperty
     def degree(self):
         '''
         The permutation's degree.
@@ -376,7 +533,7 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
             return len(self) - self.n_cycles
 
 
-    @caching.CachedProperty
+    @_DerivedProperty
     def n_cycles(self):
         '''
         The number of cycles in this permutation.
@@ -391,20 +548,24 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
             return self.unrapplied.n_cycles
         if self.is_dapplied:
             return self.undapplied.n_cycles
+        return len(perm_algebra.get_cycles(self._perm_sequence))
 
-        unvisited_items = set(self)
-        n_cycles = 0
-        while unvisited_items:
-            starting_item = current_item = next(iter(unvisited_items))
-
-            while current_item in unvisited_items:
-                unvisited_items.remove(current_item)
-                current_item = self[current_item]
 
-            if current_item == starting_item:
-                n_cycles += 1
+    @_DerivedProperty
+    def cycle_type(self):
+        '''
+        The lengths of this permutation's cycles, from longest to shortest.
 
-        return n_cycles
+        Two permutations are conjugate exactly when they have the same cycle
+        type.
+        '''
+        if self.is_partial:
+            return NotImplemented
+        if self.is_rapplied:
+            return self.unrapplied.cycle_type
+        if self.is_dapplied:
+            return self.undapplied.cycle_type
+        return perm_algebra.get_cycle_type(self._perm_sequence)
 
 
     def get_neighbors(self, *, degrees=(1,), perm_space=None):
@@ -437,19 +598,22 @@ class Perm(sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
     def __lt__(self, other):
         if isinstance(other, Perm) and \
                            self.nominal_perm_space == other.nominal_perm_space:
-            return self._perm_sequence < other._perm_sequence
+            # One sequence may be compact and the other not, so we compare
+            # them as tuples:
+            return tuple(self._perm_sequence) < tuple(other._perm_sequence)
         else:
             return NotImplemented
 
     __reversed__ = lambda self: type(self)(reversed(self._perm_sequence),
                                            self.nominal_perm_space)
 
-    items = caching.CachedProperty(PermItems)
-    as_dictoid = caching.CachedProperty(PermAsDictoid)
+    items = _DerivedProperty(PermItems)
+    as_dictoid = _DerivedProperty(PermAsDictoid)
 
 
 class UnrecurrentedMixin:
     '''Mixin for a permutation in a space that's been unrecurrented.'''
+    __slots__ = ()
     def __getitem__(self, i):
         return super().__getitem__(i)[1]
     def __iter__(self):
@@ -462,6 +626,7 @@ class UnrecurrentedMixin:
 
 class UnrecurrentedPerm(UnrecurrentedMixin, Perm):
     '''A permutation in a space that's been unrecurrented.'''
+    __slots__ = ()
 
 
 
@@ -0,0 +1,182 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines fast tools for the algebra of pure permutations.
+
+These work on perm sequences of the integers `0..n-1`, like `bytes`, `array`s
+or `tuple`s, rather than on `Perm` objects, and they don't check that their
+arguments are valid perms. `Perm` uses them for pure perms. A perm sequence
+`p` maps `i` to `p[i]`, and the product `p * q` maps `i` to `p[q[i]]`.
+
+The batch functions take matrices whose rows are perm sequences, like the
+ones made by `PermSpace.get_batch` for a pure space. If NumPy is installed,
+they work on all the rows at once and return 2D NumPy arrays; otherwise they
+return lists of `array.array('l')` rows.
+'''
+
+import array
+import numbers
+
+try:
+    import numpy
+except ImportError: # No NumPy; we'll go over the rows one by one.
+    numpy = None
+
+
+def _like(perm_sequence, values):
+    '''Make a perm sequence of the same type as `perm_sequence`.'''
+    if isinstance(perm_sequence, array.array):
+        return array.array(perm_sequence.typecode, values)
+    elif isinstance(perm_sequence, (bytes, bytearray)):
+        return bytes(values)
+    else:
+        return tuple(values)
+
+
+def compose(left, right):
+    '''Get the perm sequence of `left * right`, i.e. `i -> left[right[i]]`.'''
+    return _like(left, map(left.__getitem__, right))
+
+
+def invert(perm_sequence):
+    '''Get the perm sequence of the inverse of `perm_sequence`.'''
+    return _like(perm_sequence, sorted(range(len(perm_sequence)),
+                                       key=perm_sequence.__getitem__))
+
+
+def get_cycles(perm_sequence):
+    '''
+    Get the cycles of `perm_sequence`, as lists.
+
+    Each cycle starts with its smallest item, and the cycles are ordered by
+    their smallest items. Fixed points are cycles of length 1.
+    '''
+    is_visited = bytearray(len(perm_sequence))
+    cycles = []
+    for start, start_is_visited in enumerate(is_visited):
+        if start_is_visited:
+            continue
+        cycle = []
+        item = start
+        while not is_visited[item]:
+            is_visited[item] = True
+            cycle.append(item)
+            item = perm_sequence[item]
+        cycles.append(cycle)
+    return cycles
+
+
+def get_cycle_type(perm_sequence):
+    '''
+    Get the cycle type of `perm_sequence`.
+
+    That's the lengths of its cycles, from longest to shortest. Two perms are
+    conjugate exactly when they have the same cycle type.
+    '''
+    return tuple(sorted(map(len, get_cycles(perm_sequence)), reverse=True))
+
+
+def power(perm_sequence, exponent):
+    '''
+    Get the perm sequence of `perm_sequence` raised to the power `exponent`.
+
+    Each cycle is rotated by `exponent` steps, so this takes O(n) no matter
+    how big `exponent` is, and negative exponents need no inverse.
+    '''
+    assert isinstance(exponent, numbers.Integral)
+    result = list(range(len(perm_sequence)))
+    for cycle in get_cycles(perm_sequence):
+        shift = exponent % len(cycle)
+        if shift:
+            for item, image in zip(cycle, cycle[shift:] + cycle[:shift]):
+                result[item] = image
+    return _like(perm_sequence, result)
+
+
+###############################################################################
+
+
+def _to_matrix(perm_sequences):
+    '''Make a NumPy matrix of perm sequences.'''
+    if isinstance(perm_sequences, numpy.ndarray):
+        return perm_sequences.astype(numpy.int64, copy=False)
+    else:
+        return numpy.array([list(perm_sequence) for perm_sequence in
+                            perm_sequences], dtype=numpy.int64)
+
+
+def _compose_matrices(left, right):
+    return numpy.take_along_axis(left, right, axis=1)
+
+
+def compose_batch(left, right):
+    '''Get the products of the rows of `left` by the rows of `right`.'''
+    if numpy is not None:
+        return _compose_matrices(_to_matrix(left), _to_matrix(right))
+    else:
+        return [array.array('l', map(left_row.__getitem__, right_row))
+                for left_row, right_row in zip(left, right)]
+
+
+def invert_batch(perm_sequences):
+    '''Get the inverses of the rows of `perm_sequences`.'''
+    if numpy is not None:
+        return numpy.argsort(_to_matrix(perm_sequences), axis=1)
+    else:
+        return [array.array('l', invert(perm_sequence)) for perm_sequence in
+                perm_sequences]
+
+
+def power_batch(perm_sequences, exponent):
+    '''
+    Raise all the rows of `perm_sequences` to the power `exponent`.
+
+    With NumPy, this is done by repeated squaring of the whole matrix, taking
+    O(log(exponent)) matrix compositions.
+    '''
+    assert isinstance(exponent, numbers.Integral)
+    if numpy is None:
+        return [array.array('l', power(perm_sequence, exponent)) for
+                perm_sequence in perm_sequences]
+
+    matrix = _to_matrix(perm_sequences)
+    if exponent < 0:
+        matrix = numpy.argsort(matrix, axis=1)
+        exponent = -exponent
+    result = numpy.broadcast_to(numpy.arange(matrix.shape[1]),
+                                matrix.shape).copy()
+    while exponent:
+        if exponent & 1:
+            result = _compose_matrices(result, matrix)
+        exponent >>= 1
+        if exponent:
+            matrix = _compose_matrices(matrix, matrix)
+    return result
+
+
+def count_cycles_batch(perm_sequences):
+    '''
+    Get the number of cycles of each row of `perm_sequences`.
+
+    With NumPy, every item is labeled with the smallest item in its cycle by
+    pointer doubling, so all the rows are done together in O(log(n))
+    matrix operations, and the number of cycles is the number of items that
+    are their own label. Returns a 1D NumPy array, or an `array.array('l')`.
+    '''
+    if numpy is None:
+        return array.array('l', (len(get_cycles(perm_sequence)) for
+                                 perm_sequence in perm_sequences))
+
+    matrix = _to_matrix(perm_sequences)
+    n_items = matrix.shape[1]
+    labels = numpy.broadcast_to(numpy.arange(n_items), matrix.shape)
+    jumps = matrix
+    # After `k` rounds, each label is the smallest of the `2 ** k` items that
+    # follow it in its cycle, starting with itself:
+    n_steps_covered = 1
+    while n_steps_covered < n_items:
+        labels = numpy.minimum(labels, _compose_matrices(labels, jumps))
+        jumps = _compose_matrices(jumps, jumps)
+        n_steps_covered *= 2
+    return (labels == numpy.arange(n_items)).sum(axis=1)
@@ -14,11 +14,17 @@ from python_toolbox import math_tools
 from python_toolbox import sequence_tools
 from python_toolbox import cute_iter_tools
 from python_toolbox import nifty_collections
-from python_toolbox import dict_tools
 from python_toolbox import misc_tools
 
 from .. import misc
+from .._sharding_mixin import _ShardingMixin
+from .._sampling_mixin import _SamplingMixin
 from . import variations
+from . import _iterating
+from . import _batching
+from . import _degreed_unranking
+from . import _recurrent_unranking
+from . import _sampling
 from .calculating_length import *
 from .variations import UnallowedVariationSelectionException
 from ._variation_removing_mixin import _VariationRemovingMixin
@@ -58,8 +64,9 @@ class PermSpaceType(abc.ABCMeta):
 
 
 class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
-                _FixedMapManagingMixin, sequence_tools.CuteSequenceMixin,
-                collections.abc.Sequence, metaclass=PermSpaceType):
+                _FixedMapManagingMixin, _ShardingMixin, _SamplingMixin,
+                sequence_tools.CuteSequenceMixin, collections.abc.Sequence,
+                metaclass=PermSpaceType):
     '''
     A space of permutations on a sequence.
 
@@ -407,12 +414,9 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
         if self.is_degreed:
             assert not self.is_recurrent and not self.is_partial and \
                                                         not self.is_combination
-            return sum(
-                math_tools.abs_stirling(
-                    self.sequence_length - len(self.fixed_map),
-                    self.sequence_length - degree -
-                                    self._n_cycles_in_fixed_items_of_just_fixed
-                ) for degree in self.degrees
+            return self._degreed_perm_counter.count(
+                self.sequence_length - len(self.fixed_map),
+                self._n_cycles_in_fixed_items_of_just_fixed
             )
         elif self.is_fixed:
             assert not self.is_degreed and not self.is_combination
@@ -453,6 +457,17 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
                 # This division is always without a remainder, because math.
 
 
+    @caching.CachedProperty
+    def _degreed_perm_counter(self):
+        '''
+        Counter of the perms of our degrees that complete a partial perm.
+
+        This is used for unranking and ranking perms in degreed spaces.
+        '''
+        return _degreed_unranking.DegreedPermCounter(self.sequence_length,
+                                                     self.degrees)
+
+
     @caching.CachedProperty
     def variation_selection(self):
         '''
@@ -552,7 +567,8 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
         elif self.is_sliced:
             return self.unsliced[i + self.canonical_slice.start]
         elif self.is_dapplied:
-            return self.perm_type(self.undapplied[i], perm_space=self)
+            return self.perm_type(self.undapplied[i]._perm_sequence,
+                                  perm_space=self)
 
         #######################################################################
         elif self.is_degreed:
@@ -571,108 +587,27 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
             # If that wasn't an example of asserting one's dominance, I don't
             # know what is.
 
-            available_values = list(self.free_values)
-            wip_perm_sequence_dict = dict(self.fixed_map)
-            wip_n_cycles_in_fixed_items = \
-                                    self._n_cycles_in_fixed_items_of_just_fixed
-            wip_i = i
-            for j in self.sequence:
-                if j in wip_perm_sequence_dict:
-                    continue
-                for unused_value in available_values:
-                    candidate_perm_sequence_dict = dict(wip_perm_sequence_dict)
-                    candidate_perm_sequence_dict[j] = unused_value
-
-                    ### Checking whether we closed a cycle: ###################
-                    #                                                         #
-                    if j == unused_value:
-                        closed_cycle = True
-                    else:
-                        current = j
-                        while True:
-                            current = candidate_perm_sequence_dict[current]
-                            if current == j:
-                                closed_cycle = True
-                                break
-                            elif current not in candidate_perm_sequence_dict:
-                                closed_cycle = False
-                                break
-                    #                                                         #
-                    ### Finished checking whether we closed a cycle. ##########
-
-                    candidate_n_cycles_in_fixed_items = \
-                                     wip_n_cycles_in_fixed_items + closed_cycle
-
-                    candidate_fixed_perm_space_length = sum(
-                        math_tools.abs_stirling(
-                            self.sequence_length -
-                                             len(candidate_perm_sequence_dict),
-                            self.sequence_length - degree -
-                                              candidate_n_cycles_in_fixed_items
-                        ) for degree in self.degrees
-                    )
-
-
-                    if wip_i < candidate_fixed_perm_space_length:
-                        available_values.remove(unused_value)
-                        wip_perm_sequence_dict[j] = unused_value
-                        wip_n_cycles_in_fixed_items = \
-                                              candidate_n_cycles_in_fixed_items
-
-                        break
-                    wip_i -= candidate_fixed_perm_space_length
-                else:
-                    raise RuntimeError
-            assert wip_i == 0
-            return self.perm_type((wip_perm_sequence_dict[k] for k in
-                                   self.domain), self)
+            return self.perm_type(
+                _degreed_unranking.unrank_degreed_perm(
+                    self.sequence_length, self.fixed_map,
+                    self._degreed_perm_counter, i
+                ),
+                self
+            )
 
         #######################################################################
         elif self.is_recurrent:
             assert not self.is_dapplied and not self.is_degreed and \
                                                              not self.is_sliced
-            available_values = list(self.sequence)
-            reserved_values = nifty_collections.Bag(self.fixed_map.values())
-            wip_perm_sequence_dict = dict(self.fixed_map)
-            wip_i = i
-            shit_set = set()
-            for j in range(self.n_elements):
-                if j in self.fixed_map:
-                    available_values.remove(self.fixed_map[j])
-                    reserved_values[self.fixed_map[j]] -= 1
-                    continue
-                unused_values = [
-                    item for item in
-                    nifty_collections.OrderedBag(available_values) -
-                    reserved_values if item not in shit_set
-                ]
-                for unused_value in unused_values:
-                    wip_perm_sequence_dict[j] = unused_value
-
-                    candidate_sub_perm_space = \
-                                             PermSpace._create_with_cut_prefix(
-                        self.sequence,
-                        n_elements=self.n_elements,
-                        fixed_map=wip_perm_sequence_dict,
-                        is_combination=self.is_combination,
-                        shit_set=shit_set, perm_type=self.perm_type
-                    )
-
-                    if wip_i < candidate_sub_perm_space.length:
-                        available_values.remove(unused_value)
-                        break
-                    else:
-                        wip_i -= candidate_sub_perm_space.length
-                        if self.is_combination:
-                            shit_set.add(wip_perm_sequence_dict[j])
-                        del wip_perm_sequence_dict[j]
-                else:
-                    raise RuntimeError
-            assert wip_i == 0
-            return self.perm_type(
-                dict_tools.get_tuple(wip_perm_sequence_dict, self.domain),
-                self
-            )
+            if self.is_combination:
+                perm_sequence = _recurrent_unranking.unrank_recurrent_comb(
+                    self.sequence, self.n_elements, i
+                )
+            else:
+                perm_sequence = _recurrent_unranking.unrank_recurrent_perm(
+                    self.sequence, self.n_elements, self.fixed_map, i
+                )
+            return self.perm_type(perm_sequence, self)
 
         #######################################################################
         elif self.is_fixed:
@@ -723,6 +658,15 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
             return self.perm_type(result, self)
 
 
+    def _make_random_item(self, random_generator):
+        perm_sequence = _sampling.make_random_perm_sequence(self,
+                                                            random_generator)
+        if perm_sequence is None:
+            return super()._make_random_item(random_generator)
+        perm = self.perm_type(perm_sequence, self)
+        return perm, perm
+
+
     enumerated_sequence = caching.CachedProperty(
         lambda self: tuple(enumerate(self.sequence))
     )
@@ -732,8 +676,22 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
         '''In partial perm spaces, number of elements that aren't used.'''
     )
 
-    __iter__ = lambda self: (self[i] for i in
-                                         sequence_tools.CuteRange(self.length))
+    def __iter__(self):
+        '''
+        Iterate over the perms in the space.
+
+        This steps from each perm to the next instead of unranking each index,
+        so it's much faster than `self[i] for i in range(len(self))`, while
+        giving the same perms in the same order.
+        '''
+        perm_type = self.perm_type
+        for perm_sequence in _iterating.iterate_perm_sequences(self):
+            yield perm_type(perm_sequence, self)
+
+
+    def _iterate_range(self, start, stop):
+        return iter(self[start:stop])
+
     _reduced = property(
         lambda self: (
             type(self), self.sequence, self.domain,
@@ -784,73 +742,27 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
         #######################################################################
         elif self.is_degreed:
             if perm.is_rapplied: return self.unrapplied.index(perm.unrapplied)
-            wip_perm_number = 0
-            wip_perm_sequence_dict = dict(self.fixed_map)
-            unused_values = list(self.free_values)
-            for i, value in enumerate(perm._perm_sequence):
-                if i in self.fixed_indices:
-                    continue
-                unused_values.remove(value)
-                lower_values = [j for j in unused_values if j < value]
-                for lower_value in lower_values:
-                    temp_fixed_map = dict(wip_perm_sequence_dict)
-                    temp_fixed_map[i] = lower_value
-                    wip_perm_number += PermSpace(
-                        self.sequence_length, degrees=self.degrees,
-                        fixed_map=temp_fixed_map
-                    ).length
-
-                wip_perm_sequence_dict[self.domain[i]] = value
-
-            perm_number = wip_perm_number
+            for key, value in self.fixed_map.items():
+                if perm._perm_sequence[key] != value:
+                    raise ValueError
+            perm_number = _degreed_unranking.rank_degreed_perm(
+                self.sequence_length, self.fixed_map,
+                self._degreed_perm_counter, perm._perm_sequence
+            )
 
         #######################################################################
         elif self.is_recurrent:
             assert not self.is_degreed and not self.is_dapplied
 
-            wip_perm_number = 0
-            unused_values = list(self.sequence)
-            reserved_values = list(self.fixed_map.values())
-            perm_sequence_list = list(perm._perm_sequence)
-            shit_set = set()
-            for i, value in enumerate(perm._perm_sequence):
-                if i in self.fixed_map:
-                    if self.fixed_map[i] == value:
-                        unused_values.remove(value)
-                        reserved_values.remove(value)
-                        continue
-                    else:
-                        raise ValueError
-                lower_values = [
-                    thing for thing in
-                    nifty_collections.OrderedSet(unused_values) if
-                    (thing not in reserved_values or unused_values.count(thing)
-                     > reserved_values.count(thing)) and
-                    unused_values.index(thing) < unused_values.index(value) and
-                                                          thing not in shit_set
-                ]
-                unused_values.remove(value)
-                for lower_value in lower_values:
-                    temp_fixed_map = dict(
-                            enumerate(perm_sequence_list[:i] + [lower_value])
-                    )
-                    temp_fixed_map.update(self.fixed_map)
-
-                    candidate_sub_perm_space = \
-                                             PermSpace._create_with_cut_prefix(
-                        self.sequence,
-                        n_elements=self.n_elements,
-                        fixed_map=temp_fixed_map,
-                        is_combination=self.is_combination,
-                        shit_set=shit_set, perm_type=self.perm_type
-                    )
-
-                    wip_perm_number += candidate_sub_perm_space.length
-                    if self.is_combination:
-                        shit_set.add(lower_value)
-
-
-            perm_number = wip_perm_number
+            if self.is_combination:
+                perm_number = _recurrent_unranking.rank_recurrent_comb(
+                    self.sequence, self.n_elements, perm._perm_sequence
+                )
+            else:
+                perm_number = _recurrent_unranking.rank_recurrent_perm(
+                    self.sequence, self.n_elements, self.fixed_map,
+                    perm._perm_sequence
+                )
 
         #######################################################################
         elif self.is_fixed:
@@ -915,6 +827,53 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
         return perm_number - self.canonical_slice.start
 
 
+    def get_batch(self, indices):
+        '''
+        Get the perms numbered `indices`, as a matrix of value indices.
+
+        This is much faster than `[self[i] for i in indices]`, because no
+        `Perm` objects are created. Each row of the matrix has the indices in
+        `self.sequence` of the values of one perm, ordered by the space's
+        indices rather than its domain. (In recurrent spaces, the `n`th use of
+        a value in a perm gets the index of its `n`th appearance in the
+        sequence.)
+
+        The matrix is a 2D NumPy array if NumPy is installed, and otherwise a
+        list of `array.array('l')` rows. Where possible, all the perms are
+        unranked together with NumPy. Otherwise, the indices are sorted and
+        only the first of each run of close indices is unranked; we step from
+        it to the rest of the run.
+
+        To get the `Perm` of a row, use `self.perm_type(map(self.sequence.
+        __getitem__, row), self)`, or just `self[i]`.
+        '''
+        return _batching.get_batch(self, indices)
+
+
+    def to_array(self, start=0, stop=None):
+        '''
+        Get the perms from number `start` up to `stop` as a matrix.
+
+        See documentation of `get_batch` for more details.
+        '''
+        return self.get_batch(range(*slice(start, stop).indices(self.length)))
+
+
+    def index_batch(self, value_indices):
+        '''
+        Get the index numbers of the perms that are rows of `value_indices`.
+
+        This is the inverse of `get_batch`. The rows are given as value
+        indices, like `get_batch` returns them. Raises `ValueError` if any of
+        the rows isn't a perm in this space.
+
+        Returns a 1D NumPy array if NumPy is installed, and otherwise an
+        `array.array('q')`. (For spaces with more than `2 ** 63` perms, it's a
+        NumPy array of Python `int`s, or a list of them.)
+        '''
+        return _batching.index_batch(self, value_indices)
+
+
     @caching.CachedProperty
     def short_length_string(self):
         '''Short string describing size of space, e.g. "12!"'''
@@ -935,6 +894,30 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
 
 
     def __reduce__(self, *args, **kwargs):
+        '''
+        Pickle the space by the arguments that make it, not by its state.
+
+        This keeps pickles small, which matters when spaces are sent to
+        other processes, (like shards by `parallel_map`,) and the cached
+        properties are calculated again by whoever unpickles the space.
+        '''
+        from .comb_space import CombSpace
+        if type(self) in (PermSpace, CombSpace):
+            return (
+                functools.partial(
+                    PermSpace, domain=self.domain if self.is_dapplied else
+                    None, n_elements=self.n_elements,
+                    fixed_map=self.fixed_map,
+                    degrees=self.degrees if self.is_degreed else None,
+                    is_combination=self.is_combination,
+                    slice_=self.canonical_slice if self.is_sliced else None,
+                    perm_type=self.perm_type if self.is_typed else None
+                ),
+                (self.sequence if self.is_rapplied else
+                 self.sequence_length,)
+            )
+        # This is a subclass that might need arguments we don't know about,
+        # so we pickle its state:
         #######################################################################
         #                                                                     #
         self._just_fixed
@@ -952,58 +935,6 @@ class PermSpace(_VariationRemovingMixin, _VariationAddingMixin,
         '''Coerce `perm` to be a permutation of this space.'''
         return self.perm_type(perm, self)
 
-    prefix = None
-
-    @classmethod
-    def _create_with_cut_prefix(cls, sequence, domain=None, *,
-        n_elements=None, fixed_map=None, degrees=None, is_combination=False,
-        slice_=None, perm_type=None, shit_set=frozenset()):
-        '''
-        Create a `PermSpace`, cutting a prefix off the start if possible.
-
-        This is used internally in `PermSpace.__getitem__` and
-        `PermSpace.index`. It's important to cut off the prefix, especially for
-        `CombSpace` because in such cases it obviates the need for a
-        `fixed_map`, and `CombSpace` doesn't work with `fixed_map`.
-        '''
-        if degrees is not None:
-            raise NotImplementedError
-
-        prefix = []
-        fixed_map = dict(fixed_map)
-        for i in sequence_tools.CuteRange(infinity):
-            try:
-                prefix.append(fixed_map[i])
-            except KeyError:
-                break
-            else:
-                del fixed_map[i]
-                n_elements -= 1
-
-
-        sequence = list(sequence)
-        for item in prefix:
-            if is_combination:
-                sequence = sequence[sequence.index(item) + 1:]
-            else:
-                sequence[sequence.index(item)] = misc.MISSING_ELEMENT
-                # More efficient than removing the element, we filter these out
-                # later.
-
-        shit_set = {misc.MISSING_ELEMENT} | shit_set
-        sequence = [item for item in sequence if item not in shit_set]
-
-        fixed_map = {key - len(prefix): value
-                                           for key, value in fixed_map.items()}
-
-        perm_space = cls(
-            sequence, n_elements=n_elements, fixed_map=fixed_map,
-            is_combination=is_combination, slice_=slice_,
-            perm_type=perm_type
-        )
-        perm_space.prefix = tuple(prefix)
-        return perm_space
-
 
 
 
@@ -6,8 +6,13 @@ import collections
 from python_toolbox import math_tools
 from python_toolbox import sequence_tools
 
+from . import _batching
+from ._sharding_mixin import _ShardingMixin
+from ._sampling_mixin import _SamplingMixin
 
-class ProductSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
+
+class ProductSpace(_ShardingMixin, _SamplingMixin,
+                   sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
     '''
     A product space between sequences.
 
@@ -53,14 +58,102 @@ class ProductSpace(sequence_tools.CuteSequenceMixin, collections.abc.Sequence):
         if not (0 <= i < self.length):
             raise IndexError
 
+        return tuple(sequence[index] for sequence, index in
+                     zip(self.sequences, self._get_indices(i)))
+
+
+    def _get_indices(self, i):
+        '''Get the index in each of the sequences of item number `i`.'''
         wip_i = i
         reverse_indices = []
         for sequence_length in reversed(self.sequence_lengths):
             wip_i, current_index = divmod(wip_i, sequence_length)
             reverse_indices.append(current_index)
         assert wip_i == 0
-        return tuple(sequence[index] for sequence, index in
-                     zip(self.sequences, reversed(reverse_indices)))
+        return reverse_indices[::-1]
+
+
+    def __iter__(self):
+        return self._iterate_range(0, self.length)
+
+
+    def _iterate_range(self, start, stop):
+        '''
+        Iterate over the items from index `start` to `stop`.
+
+        This works like an odometer: Only the first item is found by division.
+        Then we go over the last sequence, and when it runs out, we advance
+        the sequence before it, carrying over to the ones before that as
+        needed.
+        '''
+        if start >= stop:
+            return
+        if not self.sequences:
+            yield ()
+            return
+        indices = self._get_indices(start)
+        items = [sequence[index] for sequence, index in
+                 zip(self.sequences, indices)]
+        last_sequence = self.sequences[-1]
+        last_sequence_length = self.sequence_lengths[-1]
+        n_items_left = stop - start
+        while True:
+            prefix = tuple(items[:-1])
+            run_length = min(last_sequence_length - indices[-1], n_items_left)
+            for item in map(last_sequence.__getitem__,
+                            range(indices[-1], indices[-1] + run_length)):
+                yield prefix + (item,)
+            n_items_left -= run_length
+            if not n_items_left:
+                return
+
+            ### Carrying over: ################################################
+            #                                                                 #
+            indices[-1] = 0
+            for position in range(len(self.sequences) - 2, -1, -1):
+                sequence = self.sequences[position]
+                indices[position] += 1
+                if indices[position] < self.sequence_lengths[position]:
+                    items[position] = sequence[indices[position]]
+                    break
+                indices[position] = 0
+                items[position] = sequence[0]
+            #                                                                 #
+            ### Finished carrying over. #######################################
+
+
+    def get_batch(self, indices):
+        '''
+        Get the items numbered `indices`, as a matrix of indices.
+
+        Each row of the matrix has the index of one item in each of the
+        sequences. The matrix is a 2D NumPy array if NumPy is installed, and
+        otherwise a list of `array.array('l')` rows. With NumPy, all the items
+        are found together, one column at a time.
+        '''
+        n_sequences = len(self.sequences)
+        if _batching.can_use_numpy(self.length):
+            numpy = _batching.numpy
+            wip_indices = _batching.normalize_index_array(indices,
+                                                          self.length)
+            columns = []
+            for sequence_length in reversed(self.sequence_lengths):
+                wip_indices, column = numpy.divmod(wip_indices,
+                                                   sequence_length)
+                columns.append(column)
+            return numpy.stack(columns[::-1], axis=1) if columns else \
+                            numpy.zeros((len(wip_indices), 0), numpy.int64)
+        return _batching.make_matrix(
+            [self._get_indices(i) for i in
+             _batching.normalize_indices(indices, self.length)],
+            n_sequences
+        )
+
+
+    def _make_random_item(self, random_generator):
+        indices = tuple(map(random_generator.randrange, self.sequence_lengths))
+        return indices, tuple(sequence[index] for sequence, index in
+                              zip(self.sequences, indices))
 
 
     _reduced = property(lambda self: (type(self), self.sequences))
@@ -338,6 +338,8 @@ class AlternativeLengthMixin:
     number that `len` supports, it'll return that, otherwise it'll show a
     helpful error message.
     '''
+    __slots__ = ()
+
     def __len__(self):
         length = self.length
         if (length <= sys.maxsize) and isinstance(length, int):
@@ -3,13 +3,14 @@
 
 '''Defines various data types, similarly to the stdlib's `collections`.'''
 
-from .ordered_dict import OrderedDict
+from .ordered_dict import OrderedDict, IndexedOrderedDict
 from .various_ordered_sets import OrderedSet, FrozenOrderedSet, EmittingOrderedSet
 from .weak_key_default_dict import WeakKeyDefaultDict
 from .weak_key_identity_dict import WeakKeyIdentityDict
 from .lazy_tuple import LazyTuple
 from .various_frozen_dicts import FrozenDict, FrozenOrderedDict
 from .bagging import Bag, OrderedBag, FrozenBag, FrozenOrderedBag
+from .columnar_bagging import ColumnarBag
 from .frozen_bag_bag import FrozenBagBag
 from ..cute_enum import CuteEnum
 
@@ -0,0 +1,277 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines `IndexedKeys`, an ordered sequence of distinct keys with positions.
+
+See its documentation for more details.
+'''
+
+import itertools
+
+
+_default_block_size = 128
+
+
+class _Block(list):
+    '''A run of consecutive keys, which knows its position among the runs.'''
+    __slots__ = ('position',)
+
+
+class _FenwickTree:
+    '''
+    The sizes of a list of blocks, with prefix sums in O(log n).
+
+    Changing a size or appending one also takes O(log n). Positions are
+    0-based; internally the tree is 1-based, with a dummy item at 0.
+    '''
+    __slots__ = ('tree',)
+
+    def __init__(self, sizes=()):
+        tree = [0]
+        tree.extend(sizes)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+
+    def add(self, position, delta):
+        '''Add `delta` to the size at `position`.'''
+        tree = self.tree
+        i = position + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+
+    def get_prefix_sum(self, position):
+        '''Get the sum of the sizes before `position`.'''
+        tree = self.tree
+        total = 0
+        i = position
+        while i:
+            total += tree[i]
+            i &= i - 1
+        return total
+
+
+    def append(self, size):
+        '''Add a size at the end.'''
+        i = len(self.tree)
+        self.tree.append(size + self.get_prefix_sum(i - 1) -
+                         self.get_prefix_sum(i - (i & -i)))
+
+
+    def pop(self):
+        '''Remove the last size.'''
+        self.tree.pop()
+
+
+    def find(self, k):
+        '''
+        Find item number `k`.
+
+        Returns a tuple of the position of the block that has it and its index
+        in that block. `k` must be smaller than the sum of all sizes.
+        '''
+        tree = self.tree
+        position = 0
+        bit = 1 << (len(tree) - 1).bit_length() >> 1
+        while bit:
+            next_position = position + bit
+            if next_position < len(tree) and tree[next_position] <= k:
+                position = next_position
+                k -= tree[next_position]
+            bit >>= 1
+        return position, k
+
+
+
+class IndexedKeys:
+    '''
+    An ordered sequence of distinct, hashable keys, with a position index.
+
+    This is the storage of `OrderedSet`, `FrozenOrderedSet` and
+    `IndexedOrderedDict`. The keys are kept in plain lists of up to about
+    `block_size` keys each, and a dict maps each key to its block. A Fenwick
+    tree of the sizes of the blocks finds the key at an index, and the index
+    of a key, in O(log n).
+
+    Inserting a key at any index and removing one usually take O(log n), plus
+    moving up to `block_size` pointers in a list, which is done in C. But when
+    an insertion splits a full block in two, or a removal empties a block
+    that isn't the last, the blocks after it are renumbered and the Fenwick
+    tree is rebuilt, in O(n / block_size). Since a block takes about
+    `block_size` insertions to fill, or as many removals to empty, this
+    averages to O(log n + n / block_size ** 2) per insertion or removal.
+
+    As long as keys are only appended and popped from the end, all blocks but
+    the last are full, so a key is found by index in O(1) by dividing.
+    '''
+    __slots__ = ('block_size', '_blocks', '_block_by_key', '_sizes',
+                 '_length', '_is_append_only')
+
+    def __init__(self, keys=(), block_size=_default_block_size):
+        self.block_size = block_size
+        self.reorder(keys)
+
+
+    def reorder(self, keys):
+        '''
+        Replace the keys with `keys`, in their order, in O(n).
+
+        This is how the keys are sorted, rather than by moving them one by
+        one. Later duplicates in `keys` are ignored.
+        '''
+        keys = list(keys)
+        block_size = self.block_size
+        self._blocks = [_Block(keys[start : start + block_size]) for start
+                        in range(0, len(keys), block_size)]
+        for position, block in enumerate(self._blocks):
+            block.position = position
+        self._block_by_key = dict(zip(keys, itertools.chain.from_iterable(
+            itertools.repeat(block, len(block)) for block in self._blocks
+        )))
+        if len(self._block_by_key) < len(keys):
+            return self.reorder(dict.fromkeys(keys))
+        self._sizes = _FenwickTree(map(len, self._blocks))
+        self._length = len(keys)
+        self._is_append_only = True
+
+
+    def clear(self):
+        '''Remove all the keys.'''
+        self.reorder(())
+
+
+    def __len__(self):
+        return self._length
+
+
+    def __contains__(self, key):
+        return key in self._block_by_key
+
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._blocks)
+
+
+    def __reversed__(self):
+        return itertools.chain.from_iterable(map(reversed,
+                                                 reversed(self._blocks)))
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(map(self.__getitem__,
+                            range(*i.indices(self._length))))
+        if i < 0:
+            i += self._length
+        if not (0 <= i < self._length):
+            raise IndexError('Index out of range.')
+        if self._is_append_only:
+            position, offset = divmod(i, self.block_size)
+        else:
+            position, offset = self._sizes.find(i)
+        return self._blocks[position][offset]
+
+
+    def index(self, key):
+        '''Get the index of `key`. Raises `ValueError` if it's missing.'''
+        try:
+            block = self._block_by_key[key]
+        except KeyError:
+            raise ValueError(f'{key!r} is not in the keys.') from None
+        if self._is_append_only:
+            start = block.position * self.block_size
+        else:
+            start = self._sizes.get_prefix_sum(block.position)
+        return start + block.index(key)
+
+
+    def append(self, key):
+        '''Add `key` at the end. `key` must not be in the keys already.'''
+        assert key not in self._block_by_key
+        if self._blocks and len(self._blocks[-1]) < self.block_size:
+            block = self._blocks[-1]
+            block.append(key)
+            self._sizes.add(block.position, 1)
+        else:
+            block = _Block((key,))
+            block.position = len(self._blocks)
+            self._blocks.append(block)
+            self._sizes.append(1)
+        self._block_by_key[key] = block
+        self._length += 1
+
+
+    def insert(self, index, key):
+        '''
+        Add `key` before the key at `index`, like `list.insert`.
+
+        `key` must not be in the keys already.
+        '''
+        if index < 0:
+            index = max(index + self._length, 0)
+        if index >= self._length:
+            return self.append(key)
+        assert key not in self._block_by_key
+        position, offset = self._sizes.find(index)
+        block = self._blocks[position]
+        block.insert(offset, key)
+        self._block_by_key[key] = block
+        self._sizes.add(position, 1)
+        self._length += 1
+        self._is_append_only = False
+        if len(block) >= 2 * self.block_size:
+            self._split(block)
+
+
+    def _split(self, block):
+        '''Split `block` into two halves, in O(n / block_size).'''
+        new_block = _Block(block[len(block) // 2:])
+        del block[len(block) // 2:]
+        self._block_by_key.update(dict.fromkeys(new_block, new_block))
+        self._blocks.insert(block.position + 1, new_block)
+        self._renumber_blocks(block.position + 1)
+
+
+    def _renumber_blocks(self, start):
+        '''
+        Update the positions of the blocks from `start` on.
+
+        The Fenwick tree is rebuilt from scratch, since all the positions
+        after `start` have moved.
+        '''
+        for position in range(start, len(self._blocks)):
+            self._blocks[position].position = position
+        self._sizes = _FenwickTree(map(len, self._blocks))
+
+
+    def remove(self, key):
+        '''Remove `key`. Raises `KeyError` if it's missing.'''
+        block = self._block_by_key.pop(key)
+        if block[-1] == key and block.position == len(self._blocks) - 1:
+            block.pop()
+        else:
+            block.remove(key)
+            self._is_append_only = False
+        self._length -= 1
+        if block:
+            self._sizes.add(block.position, -1)
+        elif block.position == len(self._blocks) - 1:
+            self._blocks.pop()
+            self._sizes.pop()
+        else:
+            del self._blocks[block.position]
+            self._renumber_blocks(block.position)
+
+
+    def __reduce__(self):
+        return (type(self), (list(self), self.block_size))
+
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, list(self))
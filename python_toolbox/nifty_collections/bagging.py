@@ -535,13 +535,82 @@ class _BaseBagMixin:
 
 
 class _MutableBagMixin(_BaseBagMixin):
-    '''Mixin for a bag that's mutable. (i.e. not frozen.)'''
+    '''
+    Mixin for a bag that's mutable. (i.e. not frozen.)
+
+    The bag keeps a running total of its elements, and a histogram of its
+    counts, (how many keys have each count,) which are updated whenever a
+    count changes. This makes `n_elements` and `frozen_bag_bag` O(1) rather
+    than O(n); the `FrozenBagBag` is made only when first asked for after the
+    histogram changed.
+    '''
+
+    def __init__(self, iterable={}):
+        super().__init__(iterable)
+        self._reset_totals()
+
+
+    def _reset_totals(self):
+        '''Count the totals from scratch.'''
+        self._n_elements = sum(self._dict.values())
+        self._count_histogram = {}
+        _count_elements(self._count_histogram, self._dict.values())
+        self._frozen_bag_bag = None
+
+
+    def _record_count_change(self, old_count, new_count):
+        '''Update the totals after a key's count changed.'''
+        if old_count == new_count:
+            return
+        self._n_elements += new_count - old_count
+        count_histogram = self._count_histogram
+        if old_count:
+            if count_histogram[old_count] == 1:
+                del count_histogram[old_count]
+            else:
+                count_histogram[old_count] -= 1
+        if new_count:
+            count_histogram[new_count] = count_histogram.get(new_count, 0) + 1
+        self._frozen_bag_bag = None
+
+
+    n_elements = property(
+        lambda self: self._n_elements,
+        doc='''Number of total elements in the bag.'''
+    )
+
+    @property
+    def frozen_bag_bag(self):
+        '''
+        A `FrozenBagBag` of this bag.
+
+        This means, a bag where `3: 4` means "The original bag has 4 different
+        keys with a value of 3."
+
+        Example:
+
+            >>> bag = Bag('abracadabra')
+            >>> bag
+            Bag({'b': 2, 'r': 2, 'a': 5, 'd': 1, 'c': 1})
+            >>> bag.frozen_bag_bag
+            FrozenBagBag({1: 2, 2: 2, 5: 1})
+
+        '''
+        if self._frozen_bag_bag is None:
+            from .frozen_bag_bag import FrozenBagBag
+            self._frozen_bag_bag = FrozenBagBag(self._count_histogram)
+        return self._frozen_bag_bag
+
 
     def __setitem__(self, i, count):
         try:
-            super().__setitem__(i, _process_count(count))
+            count = _process_count(count)
         except _ZeroCountAttempted:
             del self[i]
+            return
+        old_count = self._dict.get(i, 0)
+        super().__setitem__(i, count)
+        self._record_count_change(old_count, count)
 
 
     def setdefault(self, key, default=None):
@@ -562,9 +631,11 @@ class _MutableBagMixin(_BaseBagMixin):
         # avoiding raising exceptions where someone would try to explicitly
         # delete them.
         try:
-            del self._dict[key]
+            count = self._dict.pop(key)
         except KeyError:
             pass
+        else:
+            self._record_count_change(count, 0)
 
     def pop(self, key, default=_NO_DEFAULT):
         '''
@@ -732,7 +803,17 @@ class _MutableBagMixin(_BaseBagMixin):
         '''
         Pop an item from this bag, returning `(key, count)` and removing it.
         '''
-        return self._dict.popitem()
+        key, count = self._dict.popitem()
+        self._record_count_change(count, 0)
+        return (key, count)
+
+    def clear(self):
+        '''Remove all items from this bag.'''
+        self._dict.clear()
+        self._reset_totals()
+
+    # A shallow copy can't share `_dict`, or its totals would go stale:
+    __copy__ = lambda self: type(self)(self)
 
     def get_frozen(self):
         '''Get a frozen version of this bag.'''
@@ -951,7 +1032,9 @@ class OrderedBag(_OrderedBagMixin, _MutableBagMixin, _OrderedDictDelegator):
         By default, the item will be popped from the end. Pass `last=False` to
         pop from the start.
         '''
-        return self._dict.popitem(last=last)
+        key, count = self._dict.popitem(last=last)
+        self._record_count_change(count, 0)
+        return (key, count)
     move_to_end = misc_tools.ProxyProperty(
         '._dict.move_to_end',
         doc='Move a key to the end (or start by passing `last=False`.)'
@@ -988,8 +1071,6 @@ class FrozenBag(_BaseBagMixin, _FrozenBagMixin, FrozenDict):
     Also, unlike `collections.Counter`, it's immutable, therefore it's also
     hashable, and thus it can be used as a key in dicts and sets.
     '''
-    def __hash__(self):
-        return hash((type(self), frozenset(self.items())))
 
 
 class FrozenOrderedBag(_OrderedBagMixin, _FrozenBagMixin, _BaseBagMixin,
@@ -1021,7 +1102,10 @@ class FrozenOrderedBag(_OrderedBagMixin, _FrozenBagMixin, _BaseBagMixin,
 
     '''
     def __hash__(self):
-        return hash((type(self), tuple(self.items())))
+        # Unlike in `FrozenBag`, the order of the items counts.
+        if self._hash is None:
+            self._hash = hash((type(self), tuple(self.items())))
+        return self._hash
 
     @_BootstrappedCachedProperty
     def reversed(self):
@@ -0,0 +1,678 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''
+Defines `ColumnarBag`, a bag that keeps its counts in an array.
+
+See its documentation for more details.
+'''
+
+import collections
+import copy
+import itertools
+import operator
+
+try:
+    import numpy
+except ImportError: # No NumPy; counts will be kept in lists.
+    numpy = None
+
+from python_toolbox import math_tools
+
+from .bagging import (_MutableBagMixin, _BaseBagMixin, FrozenBag,
+                      _process_count, _ZeroCountAttempted)
+from . import bagging
+
+
+_max_int64 = 2 ** 63 - 1
+
+
+class KeyInterner:
+    '''
+    Gives each key a permanent integer id, in the order they're first seen.
+
+    Bags that share an interner keep their counts at the same positions, so
+    operations between them don't need to look up any keys.
+    '''
+    def __init__(self):
+        self.ids = {}
+        self.keys = []
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def get_id(self, key):
+        '''Get the id of `key`, giving it a new one if it has none.'''
+        try:
+            return self.ids[key]
+        except KeyError:
+            id_ = self.ids[key] = len(self.keys)
+            self.keys.append(key)
+            return id_
+
+
+    def get_ids(self, keys):
+        '''Get the ids of the list `keys`, giving new ones where needed.'''
+        ids = list(map(self.ids.get, keys))
+        if None in ids:
+            new_keys = dict.fromkeys(itertools.compress(
+                keys, map(operator.is_, ids, itertools.repeat(None))
+            ))
+            self.ids.update(zip(new_keys, itertools.count(len(self.keys))))
+            self.keys.extend(new_keys)
+            ids = list(map(self.ids.__getitem__, keys))
+        return ids
+
+
+###############################################################################
+### Defining tools for count vectors: #########################################
+#                                                                             #
+# A count vector is a 1D NumPy array of counts by key id, or a `list` if NumPy
+# isn't installed. NumPy arrays have an `int64` dtype, unless some count is
+# too big for it, in which case they have an `object` dtype and hold Python
+# `int`s. Ids past the end of a vector have a count of zero.
+
+def _make_vector(counts):
+    '''Make a count vector from a list of non-negative `int`s.'''
+    if numpy is None:
+        return list(counts)
+    elif counts and max(counts) > _max_int64:
+        return numpy.array(counts, dtype=object)
+    else:
+        return numpy.array(counts, dtype=numpy.int64)
+
+
+def _make_zero_vector(length):
+    if numpy is None:
+        return [0] * length
+    else:
+        return numpy.zeros(length, dtype=numpy.int64)
+
+
+def _get_resized_vector(vector, length):
+    '''Get `vector` padded with zeros to `length`, or itself if long enough.'''
+    if len(vector) >= length:
+        return vector
+    elif isinstance(vector, list):
+        return vector + [0] * (length - len(vector))
+    else:
+        resized_vector = numpy.zeros(length, dtype=vector.dtype)
+        resized_vector[:len(vector)] = vector
+        return resized_vector
+
+
+def _get_grown_vector(vector, length):
+    '''
+    Get `vector` with room for `length` counts, or itself if it has room.
+
+    The vector's length is at least doubled, so adding keys one by one takes
+    amortized O(1) time each. The extra counts are zeros, like the counts
+    past the end of a vector.
+    '''
+    if len(vector) >= length:
+        return vector
+    return _get_resized_vector(vector, max(length, 2 * len(vector)))
+
+
+def _get_max(vector):
+    if not len(vector):
+        return 0
+    return max(vector) if isinstance(vector, list) else int(vector.max())
+
+
+def _widen_if_needed(vectors, bound):
+    '''
+    Get `vectors` with an `object` dtype if any result might reach `bound`.
+
+    NumPy's `int64` would silently overflow, so big counts are kept in Python
+    `int`s.
+    '''
+    if any(isinstance(vector, list) or vector.dtype == object for vector in
+           vectors) or bound <= _max_int64:
+        return vectors
+    return tuple(vector.astype(object) for vector in vectors)
+
+
+def _subtract_truncating(a, b, out=None):
+    result = numpy.subtract(a, b, out=out)
+    return numpy.maximum(result, 0, out=result)
+
+
+_numpy_operations = {
+    'max': lambda a, b, out=None: numpy.maximum(a, b, out=out),
+    'min': lambda a, b, out=None: numpy.minimum(a, b, out=out),
+    'add': lambda a, b, out=None: numpy.add(a, b, out=out),
+    'subtract': _subtract_truncating,
+}
+
+_list_operations = {
+    'max': lambda a, b: list(map(max, a, b)),
+    'min': lambda a, b: list(map(min, a, b)),
+    'add': lambda a, b: list(map(operator.add, a, b)),
+    'subtract': lambda a, b: [max(x - y, 0) for x, y in zip(a, b)],
+}
+
+
+def _combine_vectors(operation, a, b, in_place=False):
+    '''
+    Combine two count vectors of the same length, key by key.
+
+    `operation` is one of `'max'`, `'min'`, `'add'` and `'subtract'`, which
+    truncates at zero. If `in_place=True`, the result is written into `a` when
+    possible; the result is returned either way.
+    '''
+    if isinstance(a, list):
+        result = _list_operations[operation](a, b)
+        if in_place:
+            a[:] = result
+            return a
+        return result
+    if operation == 'add':
+        a, b = _widen_if_needed((a, b), _get_max(a) + _get_max(b))
+    elif a.dtype != b.dtype:
+        a, b = a.astype(object), b.astype(object)
+    return _numpy_operations[operation](a, b, out=(a if in_place else None))
+
+
+def _apply_to_vector(operation, vector, number, modulo=None):
+    '''
+    Apply an arithmetic `operation` with `number` to each count in `vector`.
+
+    `operation` is one of `'multiply'`, `'floor_divide'`, `'mod'` and
+    `'power'`. Returns a new vector.
+    '''
+    if operation == 'multiply':
+        bound = _get_max(vector) * number
+    elif operation == 'power' and modulo is None:
+        bound = _get_max(vector) ** number
+    else:
+        bound = 0
+    if isinstance(vector, list):
+        if operation == 'power':
+            return [pow(count, number, modulo) for count in vector]
+        function = {'multiply': operator.mul, 'mod': operator.mod,
+                    'floor_divide': operator.floordiv}[operation]
+        return [function(count, number) for count in vector]
+    (vector,) = _widen_if_needed((vector,), bound)
+    if operation == 'power':
+        if vector.dtype == object or modulo is not None:
+            return numpy.array([pow(count, number, modulo) for count in
+                                vector.tolist()], dtype=vector.dtype)
+        return numpy.power(vector, number)
+    return getattr(numpy, operation)(vector, number)
+
+#                                                                             #
+### Finished defining tools for count vectors. ################################
+###############################################################################
+
+
+def _process_counts(counts):
+    '''
+    Check that `counts` are non-negative integers, and get them as `int`s.
+
+    Zero counts are allowed, and counts like `2.0` are turned into `2`, like
+    in `Bag`.
+    '''
+    if numpy is not None and isinstance(counts, numpy.ndarray) and \
+                                                 counts.dtype.kind in 'iu':
+        counts = counts.tolist()
+    else:
+        counts = list(counts)
+    if set(map(type, counts)) <= {int}:
+        if counts and min(counts) < 0:
+            raise TypeError("`Bag` doesn't support negative counts.")
+        return counts
+    processed_counts = []
+    for count in counts:
+        try:
+            processed_counts.append(_process_count(count))
+        except _ZeroCountAttempted:
+            processed_counts.append(0)
+    return processed_counts
+
+
+class ColumnarBag(_MutableBagMixin, collections.abc.MutableMapping):
+    '''
+    A bag that keeps its counts in an array, for big bags.
+
+    This behaves like `Bag`, but each key is interned to an integer id by a
+    `KeyInterner`, and the counts are kept in an integer array by id, (a NumPy
+    array if NumPy is installed.) Operations between bags that share an
+    interner, like `|`, `&`, `+`, `-` and comparisons, and arithmetic with
+    integers, work on the whole arrays at once, without looking up keys. The
+    in-place operators write into the existing array when it's long enough.
+
+    Each bag gets its own interner, which is shared by its copies and by the
+    results of operations on it. Pass `interner=` to share one between bags
+    made separately. Operations with a bag that has a different interner
+    match its keys one by one. Ids are never freed, and a bag's array is at
+    least as long as the highest id it ever had; it grows by doubling, so
+    adding keys one by one is cheap.
+
+    Use `update_from_counts` to add many counts at once.
+    '''
+    _dict_type = dict
+
+    def _set_counts(self, counts):
+        self._count_vector = counts
+        self._n_keys = None # Counted again when needed.
+
+    _counts = property(
+        lambda self: self._count_vector, _set_counts,
+        doc='''
+        The count vector of the bag.
+
+        Setting it makes the number of keys be counted again. Code that
+        changes single counts in place should keep `_n_keys` up to date
+        instead.
+        '''
+    )
+
+    def __init__(self, iterable={}, *, interner=None):
+        if interner is None:
+            interner = iterable.interner if \
+                          isinstance(iterable, ColumnarBag) else KeyInterner()
+        self.interner = interner
+        if isinstance(iterable, ColumnarBag) and \
+                                            iterable.interner is self.interner:
+            self._counts = copy.copy(iterable._counts)
+        else:
+            self._counts = _make_zero_vector(0)
+            if isinstance(iterable, collections.abc.Mapping):
+                self.update_from_counts(iterable.keys(), iterable.values())
+            else:
+                counter = {}
+                bagging._count_elements(counter, iterable)
+                self.update_from_counts(counter.keys(), counter.values())
+
+
+    def update_from_counts(self, keys, counts):
+        '''
+        Add `counts` to the counts of `keys`, in bulk.
+
+        `keys` and `counts` are iterables of the same length; `counts` may be
+        a NumPy array. A key may appear more than once.
+        '''
+        keys = list(keys)
+        counts = _process_counts(counts)
+        if len(keys) != len(counts):
+            raise ValueError('`keys` and `counts` must have the same length.')
+        if not keys:
+            return
+        ids = self.interner.get_ids(keys)
+        counts_vector = _get_grown_vector(self._counts, max(ids) + 1)
+        if isinstance(counts_vector, list):
+            for id_, count in zip(ids, counts):
+                counts_vector[id_] += count
+        else:
+            (counts_vector,) = _widen_if_needed(
+                (counts_vector,), _get_max(counts_vector) + sum(counts)
+            )
+            numpy.add.at(counts_vector, ids, _make_vector(counts).astype(
+                counts_vector.dtype
+            ))
+        self._counts = counts_vector
+
+
+    def _get_id(self, key):
+        '''Get the id of `key` if it may have a count, or else `None`.'''
+        id_ = self.interner.ids.get(key)
+        if id_ is not None and id_ < len(self._counts):
+            return id_
+        return None
+
+
+    def __getitem__(self, key):
+        id_ = self._get_id(key)
+        return 0 if id_ is None else int(self._counts[id_])
+
+
+    def __setitem__(self, key, count):
+        try:
+            count = _process_count(count)
+        except _ZeroCountAttempted:
+            del self[key]
+            return
+        id_ = self.interner.get_id(key)
+        old_count = self[key]
+        # Growing and widening don't change the number of keys, so they skip
+        # the `_counts` setter:
+        self._count_vector = _get_grown_vector(self._count_vector, id_ + 1)
+        if count > _max_int64:
+            (self._count_vector,) = _widen_if_needed((self._count_vector,),
+                                                     count)
+        self._count_vector[id_] = count
+        if self._n_keys is not None and not old_count:
+            self._n_keys += 1
+
+
+    def __delitem__(self, key):
+        # Like `Bag`, deleting a missing key isn't an error.
+        id_ = self._get_id(key)
+        if id_ is not None and self._count_vector[id_]:
+            self._count_vector[id_] = 0
+            if self._n_keys is not None:
+                self._n_keys -= 1
+
+
+    def _get_ids(self):
+        '''Get the ids of the keys that have counts, in order.'''
+        if isinstance(self._counts, list):
+            return list(itertools.compress(range(len(self._counts)),
+                                           self._counts))
+        return numpy.flatnonzero(self._counts).tolist()
+
+
+    def __iter__(self):
+        return map(self.interner.keys.__getitem__, self._get_ids())
+
+
+    def __len__(self):
+        if self._n_keys is None:
+            if isinstance(self._counts, list):
+                self._n_keys = len(self._counts) - self._counts.count(0)
+            else:
+                self._n_keys = int(numpy.count_nonzero(self._counts))
+        return self._n_keys
+
+
+    def __contains__(self, key):
+        return self[key] >= 1
+
+
+    def values(self):
+        return _ColumnarBagValuesView(self)
+
+
+    def items(self):
+        return _ColumnarBagItemsView(self)
+
+
+    def clear(self):
+        self._counts = _make_zero_vector(0)
+
+
+    n_elements = property(
+        lambda self: int(sum(self._counts)) if
+                   isinstance(self._counts, list) else int(self._counts.sum()),
+        doc='''Number of total elements in the bag.'''
+    )
+
+    @property
+    def frozen_bag_bag(self):
+        '''
+        A `FrozenBagBag` of this bag.
+
+        This means, a bag where `3: 4` means "The original bag has 4 different
+        keys with a value of 3." It's counted from the array each time.
+        '''
+        from .frozen_bag_bag import FrozenBagBag
+        if isinstance(self._counts, list):
+            return FrozenBagBag(self.values())
+        counts, n_keys = numpy.unique(self._counts[self._counts > 0],
+                                      return_counts=True)
+        return FrozenBagBag(dict(zip(counts.tolist(), n_keys.tolist())))
+
+    __bool__ = lambda self: bool(len(self))
+
+
+    def popitem(self):
+        '''
+        Pop an item from this bag, returning `(key, count)` and removing it.
+        '''
+        ids = self._get_ids()
+        if not ids:
+            raise KeyError('popitem(): bag is empty')
+        key = self.interner.keys[ids[-1]]
+        return (key, self.pop(key))
+
+
+    def copy(self):
+        return type(self)(self)
+
+
+    def __reduce__(self):
+        return (type(self), (dict(self.items()),))
+
+
+    __deepcopy__ = lambda self, memo: type(self)(
+                                       copy.deepcopy(dict(self.items()), memo))
+
+
+    def __repr__(self):
+        if not self:
+            return f'{type(self).__name__}()'
+        return f'{type(self).__name__}({dict(self.items())})'
+
+
+    ###########################################################################
+    ### Defining operations between bags: #####################################
+    #                                                                         #
+    def _get_aligned_vectors(self, other, add_missing_keys=False):
+        '''
+        Get the count vectors of this bag and `other`, at the same length.
+
+        `other` may be any bag. If it doesn't share this bag's interner, its
+        keys are matched to this bag's ids one by one. Keys that this bag's
+        interner doesn't know are interned if `add_missing_keys=True`, and
+        left out otherwise.
+
+        Returns `(counts, other_counts, were_keys_left_out)`.
+        '''
+        were_keys_left_out = False
+        if not (isinstance(other, ColumnarBag) and
+                                            other.interner is self.interner):
+            items = other.items()
+            if not add_missing_keys:
+                known_ids = self.interner.ids
+                all_items = tuple(items)
+                items = [(key, count) for key, count in all_items if
+                         key in known_ids]
+                were_keys_left_out = len(items) < len(all_items)
+            other = ColumnarBag(dict(items), interner=self.interner)
+        length = max(len(self._counts), len(other._counts))
+        return (_get_resized_vector(self._counts, length),
+                _get_resized_vector(other._counts, length),
+                were_keys_left_out)
+
+
+    def _combine(self, other, operation):
+        if not isinstance(other, _BaseBagMixin):
+            return NotImplemented
+        # Keys that only `other` has can only be in the result of `|` and `+`.
+        counts, other_counts, _ = self._get_aligned_vectors(
+            other, add_missing_keys=(operation in ('max', 'add'))
+        )
+        result = type(self)(interner=self.interner)
+        result._counts = _combine_vectors(operation, counts, other_counts)
+        return result
+
+
+    def _combine_in_place(self, other, operation):
+        if not isinstance(other, _BaseBagMixin):
+            return NotImplemented
+        self._counts, other_counts, _ = self._get_aligned_vectors(
+            other, add_missing_keys=(operation in ('max', 'add'))
+        )
+        self._counts = _combine_vectors(operation, self._counts, other_counts,
+                                        in_place=True)
+        return self
+
+
+    __or__ = lambda self, other: self._combine(other, 'max')
+    __and__ = lambda self, other: self._combine(other, 'min')
+    __add__ = lambda self, other: self._combine(other, 'add')
+    __sub__ = lambda self, other: self._combine(other, 'subtract')
+    __ior__ = lambda self, other: self._combine_in_place(other, 'max')
+    __iand__ = lambda self, other: self._combine_in_place(other, 'min')
+    __iadd__ = lambda self, other: self._combine_in_place(other, 'add')
+    __isub__ = lambda self, other: self._combine_in_place(other, 'subtract')
+
+    __or__.__doc__ = _BaseBagMixin.__or__.__doc__
+    __and__.__doc__ = _BaseBagMixin.__and__.__doc__
+    __add__.__doc__ = _BaseBagMixin.__add__.__doc__
+    __sub__.__doc__ = _BaseBagMixin.__sub__.__doc__
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnarBag) and \
+                                            other.interner is self.interner:
+            counts, other_counts, _ = self._get_aligned_vectors(other)
+            if isinstance(counts, list):
+                return counts == other_counts
+            return bool(numpy.array_equal(counts, other_counts))
+        return collections.abc.Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def _compare(self, other, is_contained, is_strict):
+        '''
+        Check whether this bag is contained in `other`, or contains it.
+
+        If `is_strict=True`, the bags must also differ.
+        '''
+        counts, other_counts, were_keys_left_out = \
+                                              self._get_aligned_vectors(other)
+        # Keys left out are ones that `other` has and this bag doesn't.
+        if were_keys_left_out and not is_contained:
+            return False
+        comparison = operator.le if is_contained else operator.ge
+        if isinstance(counts, list):
+            result = all(map(comparison, counts, other_counts))
+            is_different = counts != other_counts
+        else:
+            result = bool(comparison(counts, other_counts).all())
+            is_different = not numpy.array_equal(counts, other_counts)
+        if is_strict:
+            return result and (is_different or were_keys_left_out)
+        return result
+
+    def __le__(self, other):
+        if not isinstance(other, _BaseBagMixin):
+            return NotImplemented
+        return self._compare(other, is_contained=True, is_strict=False)
+
+    def __ge__(self, other):
+        if not isinstance(other, _BaseBagMixin):
+            return NotImplemented
+        return self._compare(other, is_contained=False, is_strict=False)
+
+    def __lt__(self, other):
+        if not isinstance(other, _BaseBagMixin):
+            return NotImplemented
+        return self._compare(other, is_contained=True, is_strict=True)
+
+    def __gt__(self, other):
+        if not isinstance(other, _BaseBagMixin):
+            return NotImplemented
+        return self._compare(other, is_contained=False, is_strict=True)
+    #                                                                         #
+    ### Finished defining operations between bags. ############################
+    ###########################################################################
+
+    ###########################################################################
+    ### Defining arithmetic with integers: ####################################
+    #                                                                         #
+    # Negative numbers and other odd cases are left to the general
+    # implementation of `_BaseBagMixin`, which raises the same errors as
+    # `Bag`.
+
+    def _apply(self, operation, number, modulo=None):
+        result = type(self)(interner=self.interner)
+        result._counts = _apply_to_vector(operation, self._counts,
+                                          int(number), modulo)
+        return result
+
+    def __mul__(self, other):
+        if not math_tools.is_integer(other) or other < 0:
+            return super().__mul__(other)
+        return self._apply('multiply', other)
+
+    __rmul__ = lambda self, other: self * other
+
+    def __floordiv__(self, other):
+        if isinstance(other, _BaseBagMixin):
+            counts, other_counts, were_keys_left_out = \
+                                              self._get_aligned_vectors(other)
+            if were_keys_left_out:
+                # `other` has a key that this bag doesn't.
+                return 0
+            if isinstance(counts, list):
+                pairs = [(count, other_count) for count, other_count in
+                         zip(counts, other_counts) if other_count]
+            else:
+                mask = other_counts > 0
+                pairs = list(zip(counts[mask].tolist(),
+                                 other_counts[mask].tolist()))
+            if not pairs:
+                raise ZeroDivisionError
+            return min(count // other_count for count, other_count in pairs)
+        if not math_tools.is_integer(other) or other <= 0:
+            return super().__floordiv__(other)
+        return self._apply('floor_divide', other)
+
+    def __mod__(self, other):
+        if not math_tools.is_integer(other) or other <= 0:
+            return super().__mod__(other)
+        return self._apply('mod', other)
+
+    def __divmod__(self, other):
+        if not math_tools.is_integer(other) or other <= 0:
+            return super().__divmod__(other)
+        return (self // other, self % other)
+
+    def __pow__(self, other, modulo=None):
+        if not math_tools.is_integer(other) or other < 0 or \
+                                       (modulo is not None and modulo <= 0):
+            return super().__pow__(other, modulo)
+        return self._apply('power', other, modulo)
+
+    def __imul__(self, other):
+        result = self * other
+        if result is NotImplemented:
+            return NotImplemented
+        self._counts = result._counts
+        return self
+
+    def __ifloordiv__(self, other):
+        if not math_tools.is_integer(other):
+            return NotImplemented
+        self._counts = (self // other)._counts
+        return self
+
+    def __imod__(self, other):
+        if isinstance(other, _BaseBagMixin):
+            return super().__imod__(other)
+        result = self % other
+        if result is NotImplemented:
+            return NotImplemented
+        self._counts = result._counts
+        return self
+
+    def __ipow__(self, other, modulo=None):
+        result = self.__pow__(other, modulo)
+        if result is NotImplemented:
+            return NotImplemented
+        self._counts = result._counts
+        return self
+    #                                                                         #
+    ### Finished defining arithmetic with integers. ###########################
+    ###########################################################################
+
+
+class _ColumnarBagValuesView(collections.abc.ValuesView):
+    def __iter__(self):
+        counts = self._mapping._counts
+        ids = self._mapping._get_ids()
+        if isinstance(counts, list):
+            return map(counts.__getitem__, ids)
+        return iter(counts[ids].tolist())
+
+
+class _ColumnarBagItemsView(collections.abc.ItemsView):
+    def __iter__(self):
+        return zip(self._mapping, _ColumnarBagValuesView(self._mapping))
+
+
+ColumnarBag._frozen_type = FrozenBag
@@ -55,13 +55,16 @@ class FrozenBagBag(FrozenBag):
         The results come in a `FrozenBag`, where each count is the number of
         different options for making that sub-FBB.
         '''
+        # Each sub-FBB is made with `copy`, so its hash is derived from ours
+        # rather than calculated from scratch when it's put in the bag.
+        hash(self)
         sub_fbbs_bag = Bag()
         for key_to_reduce, value_of_key_to_reduce in self.items():
-            sub_fbb_prototype = Bag(self)
-            sub_fbb_prototype[key_to_reduce] -= 1
-            sub_fbb_prototype[key_to_reduce - 1] += 1
-            sub_fbbs_bag[FrozenBagBag(sub_fbb_prototype)] = \
-                                                         value_of_key_to_reduce
+            sub_fbb = self.copy({
+                key_to_reduce: value_of_key_to_reduce - 1,
+                key_to_reduce - 1: self[key_to_reduce - 1] + 1,
+            })
+            sub_fbbs_bag[sub_fbb] = value_of_key_to_reduce
         return FrozenBag(sub_fbbs_bag)
 
     def get_sub_fbbs_for_one_key_and_previous_piles_removed(self):
@@ -1,10 +1,16 @@
 # Copyright 2009-2017 Ram Rachum.
 # This program is distributed under the MIT license.
 
+import collections
+import operator
+
 from python_toolbox import comparison_tools
 
 from collections import OrderedDict as StdlibOrderedDict
 
+from .abstract import Ordered
+from ._indexed_keys import IndexedKeys
+
 
 class OrderedDict(StdlibOrderedDict):
     '''
@@ -12,6 +18,9 @@ class OrderedDict(StdlibOrderedDict):
 
     This is a subclass of `collections.OrderedDict` with a couple of
     improvements.
+
+    `index` goes over the keys; if you need it for big dicts, use
+    `IndexedOrderedDict`.
     '''
 
     def sort(self, key=None, reverse=False):
@@ -40,4 +49,200 @@ class OrderedDict(StdlibOrderedDict):
     @property
     def reversed(self):
         '''Get a version of this `OrderedDict` with key order reversed.'''
-        return type(self)(reversed(tuple(self.items())))
\ No newline at end of file
+        return type(self)(reversed(tuple(self.items())))
+
+
+class _IndexedKeysView(collections.abc.KeysView):
+    '''The keys of an `IndexedOrderedDict`, accessible by index.'''
+    def __getitem__(self, i):
+        return self._mapping._keys[i]
+
+    def __reversed__(self):
+        return reversed(self._mapping._keys)
+
+    def index(self, key):
+        '''Get the index number of `key`.'''
+        return self._mapping._keys.index(key)
+
+
+class _IndexedValuesView(collections.abc.ValuesView):
+    '''The values of an `IndexedOrderedDict`, accessible by index.'''
+    def __getitem__(self, i):
+        data = self._mapping._data
+        if isinstance(i, slice):
+            return [data[key] for key in self._mapping._keys[i]]
+        return data[self._mapping._keys[i]]
+
+    def __reversed__(self):
+        return map(self._mapping._data.__getitem__,
+                   reversed(self._mapping._keys))
+
+
+class _IndexedItemsView(collections.abc.ItemsView):
+    '''The items of an `IndexedOrderedDict`, accessible by index.'''
+    def __getitem__(self, i):
+        data = self._mapping._data
+        if isinstance(i, slice):
+            return [(key, data[key]) for key in self._mapping._keys[i]]
+        key = self._mapping._keys[i]
+        return (key, data[key])
+
+    def __reversed__(self):
+        data = self._mapping._data
+        return ((key, data[key]) for key in reversed(self._mapping._keys))
+
+
+class IndexedOrderedDict(Ordered, collections.abc.MutableMapping):
+    '''
+    A dictionary with an order, which keeps the position of each key.
+
+    This behaves like `OrderedDict`, except that `index` takes O(log n)
+    rather than going over the keys, and `keys()`, `values()` and `items()`
+    can be accessed by index, e.g. `indexed_ordered_dict.items()[7]`. Sorting
+    and `reorder` rearrange the keys in one pass, rather than by moving them
+    one by one.
+
+    The price is that `move_to_end` takes O(log n) rather than O(1), and
+    sometimes O(n / 128) when it splits or drops a block of keys, so for LRU
+    caches, which move a key on every access, `OrderedDict` is better.
+    See `IndexedKeys` for more details.
+    '''
+    def __init__(self, *args, **kwargs):
+        self._data = {}
+        self._keys = IndexedKeys()
+        self.update(*args, **kwargs)
+
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+
+    def __setitem__(self, key, value):
+        if key not in self._data:
+            self._keys.append(key)
+        self._data[key] = value
+
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._keys.remove(key)
+
+
+    def __iter__(self):
+        return iter(self._keys)
+
+
+    def __reversed__(self):
+        return reversed(self._keys)
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+    def keys(self):
+        return _IndexedKeysView(self)
+
+
+    def values(self):
+        return _IndexedValuesView(self)
+
+
+    def items(self):
+        return _IndexedItemsView(self)
+
+
+    def clear(self):
+        self._data.clear()
+        self._keys.clear()
+
+
+    def popitem(self, last=True):
+        '''
+        Remove and return a `(key, value)` pair.
+
+        Pairs are returned in LIFO order if `last` is true or FIFO order if
+        false.
+        '''
+        if not self:
+            raise KeyError('dictionary is empty')
+        key = self._keys[-1 if last else 0]
+        return (key, self.pop(key))
+
+
+    def move_to_end(self, key, last=True):
+        '''
+        Move an existing key to the end (or start if `last=False`.)
+
+        Raises `KeyError` if the key doesn't exist.
+        '''
+        self._keys.remove(key)
+        if last:
+            self._keys.append(key)
+        else:
+            self._keys.insert(0, key)
+
+
+    def index(self, key):
+        '''Get the index number of `key`.'''
+        return self._keys.index(key)
+
+
+    def reorder(self, keys):
+        '''
+        Rearrange the keys in place, to be in the order of `keys`.
+
+        `keys` must have each key of the dict exactly once. The values stay
+        with their keys.
+        '''
+        keys = tuple(keys)
+        if len(keys) != len(self._data) or \
+                         len(set(keys)) != len(keys) or \
+                         not all(map(self._data.__contains__, keys)):
+            raise ValueError('`keys` must have each key of the dict exactly '
+                             'once.')
+        self._keys.reorder(keys)
+
+
+    def sort(self, key=None, reverse=False):
+        '''
+        Sort the items according to their keys, changing the order in-place.
+
+        The optional `key` argument, (not to be confused with the dictionary
+        keys,) will be passed to the `sorted` function as a key function.
+        '''
+        key_function = \
+                   comparison_tools.process_key_function_or_attribute_name(key)
+        self._keys.reorder(sorted(self._keys, key=key_function,
+                                  reverse=reverse))
+
+
+    def copy(self):
+        '''Get a shallow copy of this `IndexedOrderedDict`.'''
+        return type(self)(self.items())
+
+
+    @property
+    def reversed(self):
+        '''Get a version of this dict with key order reversed.'''
+        return type(self)(reversed(self.items()))
+
+
+    def __eq__(self, other):
+        if isinstance(other, (IndexedOrderedDict, StdlibOrderedDict)):
+            return self._data == dict(other.items()) and \
+                                         all(map(operator.eq, self, other))
+        return super().__eq__(other)
+
+
+    __hash__ = None
+
+
+    def __repr__(self):
+        if not self:
+            return '%s()' % (type(self).__name__,)
+        return '%s(%r)' % (type(self).__name__, list(self.items()))
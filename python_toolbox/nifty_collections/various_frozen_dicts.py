@@ -4,14 +4,15 @@
 import collections
 import operator
 import functools
-import itertools
 
 from .abstract import Ordered
 from .ordered_dict import OrderedDict
 
 
 class _AbstractFrozenDict(collections.abc.Mapping):
-    _hash = None # Overridden by instance when calculating hash.
+    # Overridden by instance when calculating hash:
+    _hash = None
+    _items_hash = None
 
     def __init__(self, *args, **kwargs):
         self._dict = self._dict_type(*args, **kwargs)
@@ -21,24 +22,36 @@ class _AbstractFrozenDict(collections.abc.Mapping):
     __iter__ = lambda self: iter(self._dict)
 
     def copy(self, *args, **kwargs):
+        '''
+        Get a copy of this dict, with changes given like in `dict.update`.
+
+        If this dict's hash was already calculated, the copy's hash is derived
+        from it, in O(k) for k changes, rather than calculated from scratch.
+        '''
+        changes = dict(*args, **kwargs)
         base_dict = self._dict.copy()
-        base_dict.update(*args, **kwargs)
-        return type(self)(base_dict)
+        base_dict.update(changes)
+        frozen_dict = type(self)(base_dict)
+        if self._items_hash is not None:
+            # Each item's hash is XORed in, so XORing it again takes it out.
+            # We look at the new dict rather than `changes`, because the
+            # constructor may have processed the values, like in `FrozenBag`.
+            items_hash = self._items_hash
+            for key in changes:
+                if key in self._dict:
+                    items_hash ^= hash((key, self._dict[key]))
+                if key in frozen_dict._dict:
+                    items_hash ^= hash((key, frozen_dict._dict[key]))
+            frozen_dict._items_hash = items_hash
+        return frozen_dict
 
     def __hash__(self):
         if self._hash is None:
-            self._hash = functools.reduce(
-                operator.xor,
-                map(
-                    hash,
-                    itertools.chain(
-                        (h for h in self.items()),
-                        (type(self), len(self))
-                    )
-                ),
-                0
-            )
-
+            if self._items_hash is None:
+                self._items_hash = functools.reduce(
+                    operator.xor, map(hash, self._dict.items()), 0
+                )
+            self._hash = hash((type(self), len(self), self._items_hash))
         return self._hash
 
     __repr__ = lambda self: '%s(%s)' % (type(self).__name__,
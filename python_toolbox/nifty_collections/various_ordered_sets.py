@@ -12,9 +12,7 @@ from python_toolbox import context_management
 from python_toolbox import caching
 from python_toolbox import freezing
 
-
-
-KEY, PREV, NEXT = range(3)
+from ._indexed_keys import IndexedKeys
 
 
 class BaseOrderedSet(collections.abc.Set, collections.abc.Sequence):
@@ -23,40 +21,41 @@ class BaseOrderedSet(collections.abc.Set, collections.abc.Sequence):
 
     This behaves like a `set` except items have an order. (By default they're
     ordered by insertion order, but that order can be changed.)
+
+    Items can be accessed by index and the index of an item can be found in
+    O(log n), or in O(1) if items were only added at the end. Inserting and
+    removing items in the middle takes O(log n) most of the time, but
+    sometimes O(n / 128). See `IndexedKeys` for more details.
     '''
 
     def __init__(self, iterable=()):
-        self.__clear()
-        for item in iterable:
-            self.__add(item)
+        self._keys = IndexedKeys(iterable)
 
     def __getitem__(self, index):
-        for i, item in enumerate(self):
-            if i == index:
-                return item
-        else:
-            raise IndexError
+        if isinstance(index, slice):
+            return type(self)(self._keys[index])
+        return self._keys[index]
+
+    def index(self, key):
+        '''Get the index number of `key`. Raises `ValueError` if missing.'''
+        return self._keys.index(key)
+
+    def count(self, key):
+        '''Get the number of times `key` is in the set, i.e. 0 or 1.'''
+        return int(key in self._keys)
 
     def __len__(self):
-        return len(self._map)
+        return len(self._keys)
 
     def __contains__(self, key):
-        return key in self._map
+        return key in self._keys
 
 
     def __iter__(self):
-        end = self._end
-        curr = end[NEXT]
-        while curr is not end:
-            yield curr[KEY]
-            curr = curr[NEXT]
+        return iter(self._keys)
 
     def __reversed__(self):
-        end = self._end
-        curr = end[PREV]
-        while curr is not end:
-            yield curr[KEY]
-            curr = curr[PREV]
+        return reversed(self._keys)
 
     def __repr__(self):
         if not self:
@@ -72,9 +71,7 @@ class BaseOrderedSet(collections.abc.Set, collections.abc.Sequence):
 
     def __clear(self):
         '''Clear the ordered set, removing all items.'''
-        self._end = []
-        self._end += [None, self._end, self._end]
-        self._map = {}
+        self._keys.clear()
 
 
     def __add(self, key, last=True):
@@ -86,14 +83,11 @@ class BaseOrderedSet(collections.abc.Set, collections.abc.Sequence):
         Specify `last=False` to add the item at the start of the ordered set.
         '''
 
-        if key not in self._map:
-            end = self._end
+        if key not in self._keys:
             if last:
-                last = end[PREV]
-                last[NEXT] = end[PREV] = self._map[key] = [key, last, end]
+                self._keys.append(key)
             else:
-                first = end[NEXT]
-                first[PREV] = end[NEXT] = self._map[key] = [key, end, first]
+                self._keys.insert(0, key)
 
 
 
@@ -122,12 +116,21 @@ class OrderedSet(BaseOrderedSet, collections.abc.MutableSet):
     add = BaseOrderedSet._BaseOrderedSet__add
     clear = BaseOrderedSet._BaseOrderedSet__clear
 
+    def insert(self, index, key):
+        '''
+        Add an element to the set before the element at `index`.
+
+        This has no effect if the element is already present.
+        '''
+        if key not in self._keys:
+            self._keys.insert(index, key)
+
+
     def move_to_end(self, key, last=True):
         '''
         Move an existing element to the end (or start if `last=False`.)
         '''
-        # Inefficient implementation until someone cares.
-        self.remove(key)
+        self._keys.remove(key)
         self.add(key, last=last)
 
 
@@ -138,13 +141,10 @@ class OrderedSet(BaseOrderedSet, collections.abc.MutableSet):
         The optional `key` argument will be passed to the `sorted` function as
         a key function.
         '''
-        # Inefficient implementation until someone cares.
         key_function = \
                    comparison_tools.process_key_function_or_attribute_name(key)
-        sorted_members = sorted(tuple(self), key=key_function, reverse=reverse)
-
-        self.clear()
-        self |= sorted_members
+        self._keys.reorder(sorted(self._keys, key=key_function,
+                                  reverse=reverse))
 
 
     def discard(self, key):
@@ -153,16 +153,22 @@ class OrderedSet(BaseOrderedSet, collections.abc.MutableSet):
 
         If the element is not a member, do nothing.
         '''
-        if key in self._map:
-            key, prev, next = self._map.pop(key)
-            prev[NEXT] = next
-            next[PREV] = prev
+        if key in self._keys:
+            self._keys.remove(key)
+
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            for key in self._keys[index]:
+                self.discard(key)
+        else:
+            self.discard(self._keys[index])
 
     def pop(self, last=True):
         '''Remove and return an arbitrary set element.'''
         if not self:
             raise KeyError('set is empty')
-        key = next(reversed(self) if last else iter(self))
+        key = self._keys[-1 if last else 0]
         self.discard(key)
         return key
 
@@ -188,7 +194,7 @@ class EmittingOrderedSet(OrderedSet):
 
         This has no effect if the element is already present.
         '''
-        if key not in self._map:
+        if key not in self:
             super().add(key, last=last)
             self._emit()
 
@@ -198,10 +204,30 @@ class EmittingOrderedSet(OrderedSet):
 
         If the element is not a member, do nothing.
         '''
-        if key in self._map:
+        if key in self:
             super().discard(key)
             self._emit()
 
+    def insert(self, index, key):
+        '''
+        Add an element to the set before the element at `index`.
+
+        This has no effect if the element is already present.
+        '''
+        if key not in self:
+            super().insert(index, key)
+            self._emit()
+
+    def sort(self, key=None, reverse=False):
+        '''
+        Sort the items according to their keys, changing the order in-place.
+
+        The optional `key` argument will be passed to the `sorted` function as
+        a key function.
+        '''
+        super().sort(key=key, reverse=reverse)
+        self._emit()
+
     def clear(self):
         '''Clear the ordered set, removing all items.'''
         if self:
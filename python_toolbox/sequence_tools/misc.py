@@ -262,6 +262,8 @@ def ensure_iterable_is_sequence(iterable, default_type=tuple,
 
 class CuteSequenceMixin(misc_tools.AlternativeLengthMixin):
     '''A sequence mixin that adds extra functionality.'''
+    __slots__ = ()
+
     def take_random(self):
         '''Take a random item from the sequence.'''
         return self[random.randint(0, get_length(self) - 1)]
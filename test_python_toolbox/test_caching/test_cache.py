@@ -4,16 +4,25 @@
 '''Testing module for `python_toolbox.caching.cache`.'''
 
 
+import asyncio
 import datetime as datetime_module
+import inspect
+import os
 import re
+import subprocess
+import sys
+import threading
+import time
 import weakref
 
 from python_toolbox import caching
 from python_toolbox.caching import cache
+from python_toolbox.caching._cache_store import _CacheStore, _CacheEntry
 from python_toolbox import misc_tools
 from python_toolbox import temp_value_setting
 from python_toolbox import cute_testing
 from python_toolbox import gc_tools
+from python_toolbox import temp_file_tools
 
 
 @misc_tools.set_attributes(i=0)
@@ -230,3 +239,683 @@ def test_time_to_keep():
         fixed_time += datetime_module.timedelta(days=1000)
         assert list(map(f, 'abcdef')) == [13, 14, 15, 16, 17, 18]
         assert f(a='d', b='meow') == 19
+
+
+def test_argument_shapes():
+    '''Test `cache` with the various signature shapes it specializes for.'''
+
+    @misc_tools.set_attributes(i=0)
+    def argumentless_func():
+        try:
+            return argumentless_func.i
+        finally:
+            argumentless_func.i += 1
+
+    f = cache()(argumentless_func)
+    assert f() == f() == f() == 0
+
+    @misc_tools.set_attributes(i=0)
+    def keyword_only_func(a, *, b=2, c=3):
+        try:
+            return keyword_only_func.i
+        finally:
+            keyword_only_func.i += 1
+
+    g = cache()(keyword_only_func)
+    assert g(1) == g(1, b=2) == g(a=1, c=3, b=2) == 0
+    assert g(1, c=4) == g(1, b=2, c=4) == 1
+    assert g(1, b=3) == 2
+    assert g(1) == 0
+
+    h = cache()(counting_func)
+    assert h((1, 2)) == h((1, 2)) == h(a=(1, 2), b=2)
+    assert h((1, 2)) != h((1, 2), 3)
+    assert h(a=1, meow=2) == h(1, meow=2) != h(a=1, meow=3)
+
+    # A tuple with an unhashable element falls back to sleekreffing:
+    assert h((1, [2])) == h((1, [2])) != h((1, [3]))
+
+    # Mixing simple and weakreffable arguments still doesn't leak:
+    class A: pass
+    a = A()
+    assert h(1, a) == h(1, a) != h(1, 2)
+    a_ref = weakref.ref(a)
+    del a
+    gc_tools.collect()
+    assert a_ref() is None
+
+
+def test_time_to_keep_with_max_size():
+    '''Test combining `time_to_keep` with `max_size`.'''
+    counting_func.i = 0
+    f = cache(max_size=3, time_to_keep={'days': 10})(counting_func)
+
+    start_datetime = datetime_module.datetime.now()
+    fixed_time = start_datetime
+    def _mock_now():
+        return fixed_time
+
+    with temp_value_setting.TempValueSetter(
+                                  (caching.decorators, '_get_now'), _mock_now):
+        assert list(map(f, 'abc')) == [0, 1, 2]
+        assert f('a') == 0 # Now `b` is the least-recently-used.
+        fixed_time += datetime_module.timedelta(days=5)
+        assert f('d') == 3 # And now `b` is thrown out.
+        assert f('b') == 4 # And now `c` is thrown out.
+        assert list(map(f, 'adb')) == [0, 3, 4]
+        fixed_time += datetime_module.timedelta(days=6)
+        # `a` expired, but `d` and `b`, which were added later, didn't:
+        assert list(map(f, 'adb')) == [5, 3, 4]
+        fixed_time += datetime_module.timedelta(days=5)
+        assert list(map(f, 'bda')) == [6, 7, 5]
+
+
+def test_expiry_queue_compaction():
+    '''Test the expiry queue doesn't grow with entries evicted early.'''
+    store = _CacheStore(max_size=10,
+                        time_to_keep=datetime_module.timedelta(days=1),
+                        get_now=datetime_module.datetime.now)
+    for i in range(1000):
+        store[i] = _CacheEntry(i)
+    assert len(store) == 10
+    assert list(store) == list(range(990, 1000))
+    assert len(store._expiry_queue) <= 2 * len(store) + 17
+
+
+def test_time_to_keep_per_result():
+    '''Test giving a function as `time_to_keep`.'''
+    counting_func.i = 0
+    f = cache(
+        time_to_keep=lambda result:
+                          datetime_module.timedelta(days=(10 * (result + 1)))
+    )(counting_func)
+
+    start_datetime = datetime_module.datetime.now()
+    fixed_time = start_datetime
+    def _mock_now():
+        return fixed_time
+
+    with temp_value_setting.TempValueSetter(
+                                  (caching.decorators, '_get_now'), _mock_now):
+        assert list(map(f, 'cba')) == [0, 1, 2] # Kept 10, 20, 30 days.
+        fixed_time += datetime_module.timedelta(days=15)
+        assert list(map(f, 'abc')) == [2, 1, 3] # New `c` kept 40 days.
+        fixed_time += datetime_module.timedelta(days=10)
+        assert list(map(f, 'abc')) == [2, 4, 3]
+        fixed_time += datetime_module.timedelta(days=100)
+        assert list(map(f, 'abc')) == [5, 6, 7]
+
+
+def test_thread_safe():
+    '''Test `cache(thread_safe=True)` computes each result only once.'''
+    n_threads = 8
+    calls = []
+    may_finish = threading.Event()
+
+    @cache(thread_safe=True)
+    def f(x):
+        calls.append(x)
+        may_finish.wait()
+        if x == 'bad':
+            raise ValueError(x)
+        return x * 2
+
+    results = [None] * n_threads
+    def run(i):
+        results[i] = f(3)
+    threads = [threading.Thread(target=run, args=(i,))
+               for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    while f.cache_lock_statistics().coalesced_calls < n_threads - 1:
+        time.sleep(0.001)
+    may_finish.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [3]
+    assert results == [6] * n_threads
+    assert f(3) == 6
+    assert calls == [3]
+    lock_statistics = f.cache_lock_statistics()
+    assert isinstance(lock_statistics, caching.LockStatistics)
+    assert lock_statistics.coalesced_calls == n_threads - 1
+    assert lock_statistics.acquisitions >= n_threads
+    assert 0 <= lock_statistics.contentions <= lock_statistics.acquisitions
+
+    # Exceptions aren't cached:
+    with cute_testing.RaiseAssertor(ValueError):
+        f('bad')
+    with cute_testing.RaiseAssertor(ValueError):
+        f('bad')
+    assert calls == [3, 'bad', 'bad']
+
+    f.cache_clear()
+    assert f(3) == 6
+    assert calls == [3, 'bad', 'bad', 3]
+
+
+def test_thread_safe_coalesced_calls_are_hits():
+    '''Test that a call waiting for another thread's result is a hit.'''
+    may_finish = threading.Event()
+
+    @cache(thread_safe=True)
+    def f(x):
+        may_finish.wait()
+        return x * 2
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(f(3)),
+                                daemon=True) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    while f.cache_lock_statistics().coalesced_calls < 1:
+        time.sleep(0.001)
+    may_finish.set()
+    for thread in threads:
+        thread.join(10)
+    assert results == [6, 6]
+    cache_info = f.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 1)
+    assert f.cache_lock_statistics().coalesced_calls == 1
+
+
+def test_thread_safe_failed_store():
+    '''Test that a call after a result failed to be stored doesn't hang.'''
+    calls = []
+    sizes = iter((ValueError('bad size'), 1, 1))
+
+    def get_size(value):
+        size = next(sizes)
+        if isinstance(size, Exception):
+            raise size
+        return size
+
+    @cache(max_bytes=10, get_size=get_size, thread_safe=True)
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    with cute_testing.RaiseAssertor(ValueError):
+        f(1)
+    results = []
+    thread = threading.Thread(target=lambda: results.append(f(1)),
+                              daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert results == [2]
+    assert f(1) == 2
+    assert calls == [1, 1]
+
+
+def test_thread_safe_lru():
+    '''Test `cache(thread_safe=True)` with `max_size` under many threads.'''
+    @cache(max_size=5, thread_safe=True)
+    def f(x):
+        return x ** 2
+
+    def run(i):
+        for j in range(300):
+            assert f((i * j) % 17) == ((i * j) % 17) ** 2
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert f(16) == 256
+
+
+def test_thread_safe_lock_stripes():
+    '''Test that an unbounded thread-safe cache is split into lock stripes.'''
+    from python_toolbox.caching._thread_safety import n_lock_stripes
+    calls = []
+
+    @cache(thread_safe=True)
+    def f(x):
+        calls.append(x)
+        return repr(x)
+
+    keys = tuple(range(4 * n_lock_stripes))
+    def run(i):
+        for key in keys:
+            assert f(key) == repr(key)
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(calls) == list(keys)
+    cache_info = f.cache_info()
+    assert cache_info.current_size == len(keys)
+    assert (cache_info.hits, cache_info.misses) == (7 * len(keys), len(keys))
+    assert f.cache_lock_statistics().acquisitions >= 8 * len(keys)
+
+    f.cache_clear((5,))
+    assert f.cache_info().current_size == len(keys) - 1
+    assert f(5) == '5'
+    assert calls.count(5) == 2
+    f.cache_clear((5,))
+
+    # Keys with weakreffed arguments are deleted from their stripe when the
+    # arguments die:
+    class A:
+        pass
+    g = cache(thread_safe=True)(lambda x: repr(x))
+    a = A()
+    assert g(a) == repr(a)
+    assert g(1) == '1'
+    assert g.cache_info().current_size == 2
+    del a
+    gc_tools.collect()
+    assert g.cache_info().current_size == 1
+
+    f.cache_clear()
+    assert f.cache_info().current_size == 0
+    assert f(3) == '3'
+    assert len(calls) == len(keys) + 2
+
+
+def test_coroutine_function():
+    '''Test `cache` on an `async def` function.'''
+    calls = []
+
+    @cache()
+    async def f(x, y=1):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        if x == 'bad':
+            raise ValueError(x)
+        return x * y
+
+    assert inspect.iscoroutinefunction(f)
+    cute_testing.assert_same_signature(f, f.__wrapped__)
+
+    async def main():
+        assert await f(3) == await f(3, 1) == await f(y=1, x=3) == 3
+        assert calls == [3]
+        # Concurrent awaiters share one computation:
+        assert await asyncio.gather(*(f(4) for _ in range(5))) == [4] * 5
+        assert calls == [3, 4]
+        # Exceptions aren't cached:
+        for _ in range(2):
+            with cute_testing.RaiseAssertor(ValueError):
+                await f('bad')
+        assert calls == [3, 4, 'bad', 'bad']
+
+    asyncio.run(main())
+
+
+def test_coroutine_function_cancellation():
+    '''Test cancelling awaiters of a cached `async def` function.'''
+    calls = []
+
+    @cache(max_size=2)
+    async def f(x):
+        calls.append(x)
+        await asyncio.sleep(0.05)
+        return x
+
+    async def main():
+        # Cancelling one awaiter doesn't disturb the other:
+        first, second = (asyncio.ensure_future(f(1)) for _ in range(2))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == 1
+        assert first.cancelled()
+        assert await f(1) == 1
+        assert calls == [1]
+
+        # Cancelling all awaiters cancels the computation, and nothing is
+        # cached:
+        lone = asyncio.ensure_future(f(2))
+        await asyncio.sleep(0.01)
+        lone.cancel()
+        await asyncio.sleep(0.1)
+        assert lone.cancelled()
+        assert await f(2) == 2
+        assert calls == [1, 2, 2]
+
+        # Cancelling right away, before the computation even started:
+        immediately_cancelled = asyncio.ensure_future(f(3))
+        await asyncio.sleep(0)
+        immediately_cancelled.cancel()
+        await asyncio.sleep(0)
+        assert await f(3) == 3
+
+        # LRU eviction works as usual:
+        assert await f(1) == 1
+        assert calls == [1, 2, 2, 3, 3, 1]
+
+    asyncio.run(main())
+
+
+def test_coroutine_function_thread_safe():
+    '''Test `thread_safe=True` is refused for coroutine functions.'''
+    async def f(): pass
+    with cute_testing.RaiseAssertor(NotImplementedError):
+        cache(thread_safe=True)(f)
+
+
+def test_cache_info():
+    '''Test the `cache_info` method of cached functions.'''
+    f = cache(max_size=2)(counting_func)
+    assert f.cache_info() == caching.CacheInfo(
+        hits=0, misses=0, disk_hits=0, evictions=0, expirations=0,
+        current_size=0, current_bytes=None, time_saved=0.0,
+        latency_histogram=None
+    )
+    f(1)
+    f(1)
+    f(a=1)
+    f(2)
+    f(3)
+    cache_info = f.cache_info()
+    assert (cache_info.hits, cache_info.misses, cache_info.evictions,
+            cache_info.current_size) == (2, 3, 1, 2)
+    assert cache_info.time_saved >= 0
+    f.cache_clear()
+    assert f.cache_info().current_size == 0
+    assert f.cache_info().hits == 2
+
+    @cache(time_to_keep={'seconds': 0.1})
+    def g(x):
+        time.sleep(0.01)
+        return x
+
+    g(1)
+    g(1)
+    cache_info = g.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 1)
+    assert cache_info.time_saved >= 0.01
+    time.sleep(0.2)
+    g(1)
+    assert g.cache_info().expirations == 1
+
+    h = cache(thread_safe=True, track_latency=True)(counting_func)
+    for i in (1, 1, 1, 2):
+        h(i)
+    cache_info = h.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (2, 2)
+    assert sum(cache_info.latency_histogram.values()) == 4
+    assert list(cache_info.latency_histogram) == \
+                                       sorted(cache_info.latency_histogram)
+
+
+def test_cache_registry():
+    '''Test `caching.get_cached_functions` and `caching.get_cache_infos`.'''
+    f = cache()(counting_func)
+    assert f in caching.get_cached_functions()
+    f(1)
+    cache_infos = caching.get_cache_infos()
+    assert cache_infos[f].misses == 1
+    assert all(isinstance(cache_info, caching.CacheInfo) for cache_info in
+               cache_infos.values())
+
+    f_ref = weakref.ref(f)
+    del f, cache_infos
+    gc_tools.collect()
+    assert f_ref() is None
+
+
+def test_get_size():
+    '''Test `caching.get_size` estimates sizes of nested objects.'''
+    assert caching.get_size(7) == sys.getsizeof(7)
+    big_bytes = b'x' * 10_000
+    assert 10_000 <= caching.get_size(big_bytes) < 10_200
+    assert caching.get_size([big_bytes, big_bytes]) < 10_300 # Counted once.
+    assert caching.get_size({'a': [big_bytes]}) > 10_000
+    assert caching.get_size(memoryview(big_bytes)) > 10_000
+
+    class A:
+        def __init__(self):
+            self.payload = bytearray(20_000)
+    class B:
+        __slots__ = ('payload',)
+        def __init__(self):
+            self.payload = bytearray(20_000)
+    assert caching.get_size(A()) > 20_000
+    assert caching.get_size(B()) > 20_000
+
+    cycle = []
+    cycle.append(cycle)
+    assert caching.get_size(cycle) == sys.getsizeof(cycle)
+    assert caching.get_size(A) == 0 # Classes are shared, so not counted.
+
+
+def test_max_bytes():
+    '''Test `cache(max_bytes=...)` evicts in LRU order to stay in budget.'''
+    @cache(max_bytes=35_000)
+    def f(n_kilobytes):
+        return b'x' * (1_000 * n_kilobytes)
+
+    f(10)
+    f(10)
+    f(20)
+    assert f.cache_info().current_size == 2
+    assert 30_000 <= f.cache_info().current_bytes <= 35_000
+    f(10) # Now `f(20)` is the least-recently-used.
+    f(5)
+    assert f.cache_info().current_size == 2
+    assert f.cache_info().evictions == 1
+    assert f.cache_info().misses == 3
+    f(10)
+    assert f.cache_info().misses == 3
+    f(100) # Bigger than the whole budget, so it isn't kept.
+    assert f.cache_info().current_bytes <= 35_000
+
+    # A custom sizer:
+    g = cache(max_bytes=3, get_size=len)(lambda x: x)
+    g('ab')
+    g('c')
+    assert g.cache_info().current_size == 2
+    g('d')
+    assert g.cache_info().current_size == 2
+    assert g.cache_info().current_bytes == 2
+
+
+def test_memory_budget():
+    '''Test sharing a `caching.MemoryBudget` between cached functions.'''
+    budget = caching.MemoryBudget(25)
+
+    @cache(max_bytes=budget, get_size=len)
+    def f(x):
+        return x * 10
+
+    @cache(max_bytes=budget, get_size=len, thread_safe=True)
+    def g(x):
+        return x * 10
+
+    f('a')
+    g('b')
+    assert budget.n_bytes == 20
+    f('a')
+    g('c') # Evicts `g('b')`, which was used less recently than `f('a')`.
+    assert budget.n_bytes == 20
+    assert (f.cache_info().current_size, g.cache_info().current_size) == \
+                                                                        (1, 1)
+    assert g.cache_info().evictions == 1
+    g('d') # Evicts `f('a')`.
+    assert (f.cache_info().current_size, g.cache_info().current_size) == \
+                                                                        (0, 2)
+    assert f.cache_info().evictions == 1
+    f.cache_clear()
+    g.cache_clear()
+    assert budget.n_bytes == 0
+
+    g('e')
+    assert budget.n_bytes == 10
+    del g
+    gc_tools.collect()
+    assert budget.n_bytes == 0
+
+
+def test_disk_tier():
+    '''Test caching results on disk with `disk_directory`.'''
+    calls = []
+
+    def make_f(**kwargs):
+        @cache(**kwargs)
+        def f(a, b=2, *, c=3):
+            calls.append((a, b, c))
+            return [a, b, c]
+        return f
+
+    with temp_file_tools.create_temp_folder() as temp_folder:
+        f = make_f(disk_directory=temp_folder)
+        assert f(1) == [1, 2, 3]
+        assert calls == [(1, 2, 3)]
+
+        # A fresh cache, as in another process, finds the result on disk, for
+        # all the ways of passing the same arguments:
+        other_f = make_f(disk_directory=temp_folder)
+        assert other_f(1, 2) == [1, 2, 3]
+        assert other_f(b=2, a=1, c=3) == [1, 2, 3]
+        assert calls == [(1, 2, 3)]
+        cache_info = other_f.cache_info()
+        assert (cache_info.hits, cache_info.misses, cache_info.disk_hits) == \
+                                                                     (1, 1, 1)
+
+        # Arguments without a stable encoding, like objects that would be
+        # pickled differently when equal, and unpicklable results skip the
+        # disk:
+        assert other_f(threading.Lock, c=threading.Lock()) is not None
+        assert make_f(disk_directory=temp_folder)(threading.Lock,
+                                                  c=threading.Lock())
+        date = datetime_module.date(2000, 1, 1)
+        assert other_f(date) == make_f(disk_directory=temp_folder)(date)
+        assert len(calls) == 5
+
+        # Functions with other names, or with other code, don't share
+        # entries, even if they're lambdas in one module:
+        g = cache(disk_directory=temp_folder)(lambda a: calls.append(a))
+        g(1)
+        h = cache(disk_directory=temp_folder)(lambda a: calls.append(a) or 2)
+        assert h(1) == 2
+        assert len(calls) == 7
+        assert cache(disk_directory=temp_folder)(
+                                        lambda a: calls.append(a) or 2)(1) == 2
+        assert len(calls) == 7
+
+        other_f.cache_clear()
+        make_f(disk_directory=temp_folder)(1)
+        assert len(calls) == 8
+
+
+def test_disk_key_function():
+    '''Test keying calls on disk with `disk_key_function`.'''
+    calls = []
+
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    def f(point):
+        calls.append(point)
+        return point.x + point.y
+
+    with temp_file_tools.create_temp_folder() as temp_folder:
+        for i in range(2):
+            cached_f = cache(disk_directory=temp_folder,
+                             disk_key_function=lambda point:
+                                                       (point.x, point.y))(f)
+            assert cached_f(Point(1, 2)) == 3
+            assert cached_f.cache_info().disk_hits == i
+        assert len(calls) == 1
+
+        cached_f = cache(disk_directory=temp_folder,
+                         disk_key_function=lambda point: point)(f)
+        with cute_testing.RaiseAssertor(TypeError):
+            cached_f(Point(1, 2))
+
+
+def test_disk_tier_thread_safe_and_coroutine():
+    '''Test the disk tier of thread-safe caches and of coroutine functions.'''
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    async def g(x):
+        calls.append(x)
+        return x * 3
+
+    with temp_file_tools.create_temp_folder() as temp_folder:
+        for i in range(2):
+            cached_f = cache(disk_directory=temp_folder, thread_safe=True)(f)
+            assert cached_f(7) == 14
+            cached_g = cache(disk_directory=temp_folder)(g)
+            assert asyncio.run(cached_g(7)) == 21
+            assert cached_f.cache_info().disk_hits == \
+                                          cached_g.cache_info().disk_hits == i
+        assert calls == [7, 7]
+
+
+def test_max_disk_bytes():
+    '''Test evicting the least-recently-accessed results from the disk.'''
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return b'.' * 1000
+
+    with temp_file_tools.create_temp_folder() as temp_folder:
+        cached_f = cache(disk_directory=temp_folder, max_disk_bytes=3500)(f)
+        for i in range(3):
+            cached_f(i)
+        time.sleep(0.01)
+        other_cached_f = cache(disk_directory=temp_folder)(f)
+        other_cached_f(0)
+        # Access times are written lazily, here when the cache is collected.
+        # Now `f(1)` is the oldest:
+        del other_cached_f
+        gc_tools.collect()
+        time.sleep(0.01)
+        cached_f(3)
+        assert calls == [0, 1, 2, 3]
+        new_cached_f = cache(disk_directory=temp_folder)(f)
+        for i in (0, 2, 3):
+            new_cached_f(i)
+        assert calls == [0, 1, 2, 3]
+        new_cached_f(1)
+        assert calls == [0, 1, 2, 3, 1]
+
+
+def test_disk_key_is_stable_between_processes():
+    '''Test that disk keys don't depend on the process's hash seed.'''
+    from python_toolbox.caching._disk_tier import get_stable_key
+    arguments = ('f', (1, 'a', frozenset('abcdef')),
+                 {'b': {'x': {1, 2, 3}, 'y': None}})
+    code = (
+        'from python_toolbox.caching._disk_tier import get_stable_key; '
+        f'print(get_stable_key(*{arguments!r}))'
+    )
+    for hash_seed in ('1', '2'):
+        output = subprocess.check_output(
+            [sys.executable, '-c', code],
+            env=dict(os.environ, PYTHONHASHSEED=hash_seed)
+        )
+        assert output.decode().strip() == get_stable_key(*arguments)
+
+
+def test_disk_keys_of_equal_numbers():
+    '''Test that equal numbers get the same key on disk, like in memory.'''
+    from python_toolbox.caching._disk_tier import get_stable_key
+    calls = []
+
+    def f(x):
+        calls.append(x)
+        return x
+
+    with temp_file_tools.create_temp_folder() as temp_folder:
+        assert cache(disk_directory=temp_folder)(f)(1) == 1
+        # Fresh caches, as in other processes, find the result of `f(1)`:
+        for x in (True, 1.0, 1 + 0j):
+            assert cache(disk_directory=temp_folder)(f)(x) == 1
+        assert calls == [1]
+
+    assert get_stable_key('f', ((1, 2.0), {0: frozenset({0.0})}), {}) == \
+           get_stable_key('f', ((True, 2), {False: frozenset({0j})}), {})
+    assert get_stable_key('f', (1.5,), {}) != get_stable_key('f', (1,), {})
+    assert get_stable_key('f', ((1,),), {}) != get_stable_key('f', ([1],), {})
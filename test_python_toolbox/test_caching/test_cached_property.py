@@ -3,8 +3,15 @@
 
 '''Testing module for `python_toolbox.caching.CachedProperty`.'''
 
+import asyncio
+import threading
+import time
+import warnings
+
 from python_toolbox import context_management
 from python_toolbox import misc_tools
+from python_toolbox import cute_testing
+from python_toolbox import gc_tools
 
 from python_toolbox.caching import cache, CachedType, CachedProperty
 from python_toolbox.context_management import (as_idempotent, as_reentrant,
@@ -205,3 +212,123 @@ def test_force_value_not_getter():
 
     a = A()
     assert a.personality == counting_func == a.personality == counting_func
+
+
+def test_slots():
+    '''Test `CachedProperty` on a class whose objects have no `__dict__`.'''
+    class A:
+        __slots__ = ('__weakref__',)
+        personality = CachedProperty(counting_func)
+
+    a1 = A()
+    assert a1.personality == a1.personality == a1.personality
+    a2 = A()
+    assert a2.personality == a2.personality == a1.personality + 1
+    assert len(A.personality._side_table) == 2
+    del a1, a2
+    gc_tools.collect()
+    assert not A.personality._side_table
+
+    class B:
+        __slots__ = ()
+        personality = CachedProperty(counting_func)
+
+    with cute_testing.RaiseAssertor(TypeError, '__weakref__'):
+        B().personality
+    assert not B.personality._side_table
+
+
+def test_invalidate():
+    '''Test invalidating a `CachedProperty`, also through dependencies.'''
+    class A:
+        def __init__(self, width):
+            self.width = width
+
+        area = CachedProperty(lambda self: self.width ** 2)
+        volume = CachedProperty(lambda self: self.area * self.width,
+                                depends_on=('area',))
+        description = CachedProperty(lambda self: f'{self.volume}',
+                                     depends_on=('volume',))
+
+    class B:
+        __slots__ = ('__weakref__', 'width')
+
+        def __init__(self, width):
+            self.width = width
+
+        area = A.area
+        volume = A.volume
+        description = A.description
+
+    for cls in (A, B):
+        thing = cls(2)
+        assert (thing.area, thing.volume, thing.description) == (4, 8, '8')
+        thing.width = 3
+        assert thing.description == '8'
+        cls.volume.invalidate(thing)
+        assert (thing.area, thing.volume, thing.description) == (4, 12, '12')
+        cls.area.invalidate(thing)
+        assert (thing.area, thing.volume, thing.description) == (9, 27, '27')
+        cls.area.invalidate(cls(1)) # Nothing cached, nothing to do.
+
+
+def test_thread_safe():
+    '''Test that a thread-safe `CachedProperty` calls its getter only once.'''
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def get_personality(self):
+        calls.append(self)
+        time.sleep(0.05)
+        return object()
+
+    class A:
+        personality = CachedProperty(get_personality, thread_safe=True)
+
+    a = A()
+    results = []
+
+    def target():
+        barrier.wait()
+        results.append(a.personality)
+
+    threads = [threading.Thread(target=target) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == [a]
+    assert len(set(map(id, results))) == 1
+    assert a.personality is results[0]
+
+
+def test_async():
+    '''Test `CachedProperty` with a coroutine function as the getter.'''
+    calls = []
+
+    class A:
+        @CachedProperty
+        async def personality(self):
+            calls.append(self)
+            await asyncio.sleep(0)
+            if len(calls) == 1:
+                raise ZeroDivisionError
+            return len(calls)
+
+    async def main():
+        a = A()
+        with cute_testing.RaiseAssertor(ZeroDivisionError):
+            await a.personality
+        assert await a.personality == await a.personality == 2
+        assert len(calls) == 2
+
+    asyncio.run(main())
+
+    # Without a running loop there's nothing to run the getter:
+    with warnings.catch_warnings(record=True) as caught_warnings:
+        warnings.simplefilter('always')
+        with cute_testing.RaiseAssertor(RuntimeError):
+            A().personality
+        gc_tools.collect()
+    assert not caught_warnings # The coroutine was closed.
+    assert len(calls) == 2
@@ -3,7 +3,10 @@
 
 '''Testing module for `python_toolbox.caching.CachedType`.'''
 
+import weakref
+
 from python_toolbox.caching import CachedType
+from python_toolbox import gc_tools
 
 
 def test():
@@ -20,4 +23,101 @@ def test_keyword_only_separator_and_annotations():
         def __init__(self, a: int, b: float, *, c: 'lol' = 7) -> None:
             pass
 
-    assert B(1, 2) is B(b=2, a=1, c=7) is not B(b=2, a=1, c=8)
\ No newline at end of file
+    assert B(1, 2) is B(b=2, a=1, c=7) is not B(b=2, a=1, c=8)
+
+
+def test_max_size():
+    '''Test a `CachedType` class with a `max_size`.'''
+    class C(metaclass=CachedType, max_size=2):
+        def __init__(self, a, *, b=0):
+            pass
+
+    c1 = C(1)
+    assert C(a=1, b=0) is c1
+    c2 = C(2)
+    C(1)
+    C(3) # Evicts `C(2)`, which was used less recently than `C(1)`.
+    assert C(1) is c1
+    assert C(2) is not c2
+
+    class D(C):
+        pass
+
+    d1 = D(1)
+    assert D(1) is d1 is not C(1)
+    D(2)
+    D(3)
+    assert D(1) is not d1
+
+
+def test_weak_values():
+    '''Test a `CachedType` class with `weak_values=True`.'''
+    class E(metaclass=CachedType, weak_values=True):
+        def __init__(self, a):
+            pass
+
+    e = E(1)
+    assert E(1) is e
+    del e
+    gc_tools.collect()
+    assert len(E._CachedType__cache) == 0
+
+    class F(metaclass=CachedType, weak_values=True, max_size=1):
+        def __init__(self, a):
+            pass
+
+    f1 = F(1)
+    f1_ref = weakref.ref(f1)
+    del f1
+    gc_tools.collect()
+    assert F(1) is f1_ref() is not None # Kept alive by the `max_size`.
+    F(2)
+    gc_tools.collect()
+    assert f1_ref() is None
+
+
+def test_weak_values_with_dead_arguments():
+    '''Test that keys with dead arguments leave the `max_size` cache too.'''
+    class Thing:
+        pass
+
+    class H(metaclass=CachedType, weak_values=True, max_size=10):
+        def __init__(self, thing):
+            pass
+
+    thing = Thing()
+    h_ref = weakref.ref(H(thing))
+    gc_tools.collect()
+    assert H(thing) is h_ref() is not None
+    assert len(H._CachedType__strong_cache) == 1
+    del thing
+    gc_tools.collect()
+    assert len(H._CachedType__strong_cache) == 0
+    assert len(H._CachedType__cache) == 0
+    assert h_ref() is None
+
+
+def test_weakreffable_arguments():
+    '''Test that weakreffable arguments aren't kept alive.'''
+    class Thing:
+        pass
+
+    class G(metaclass=CachedType):
+        def __init__(self, thing, *args):
+            pass
+
+    thing = Thing()
+    g = G(thing, 1, 2)
+    assert G(thing, 1, 2) is g is not G(thing, 1)
+    assert len(G._CachedType__cache) == 2
+    del thing
+    gc_tools.collect()
+    assert len(G._CachedType__cache) == 0
+
+
+def test_default_init():
+    '''Test a `CachedType` class that doesn't define `__init__`.'''
+    class H(metaclass=CachedType):
+        pass
+
+    assert H() is H()
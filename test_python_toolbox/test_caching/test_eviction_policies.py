@@ -0,0 +1,184 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''Testing module for `python_toolbox.caching.eviction_policies`.'''
+
+import random
+
+import pytest
+
+from python_toolbox import caching
+from python_toolbox.caching import cache
+from python_toolbox.caching._cache_store import _CacheStore, _CacheEntry
+from python_toolbox import cute_testing
+
+
+policy_names = ('lru', 'lfu', 'arc', 'tinylfu')
+
+
+def make_store(policy_name, max_size):
+    return _CacheStore(
+        max_size=max_size,
+        eviction_policy=caching.eviction_policies._policies_by_name[
+            policy_name
+        ]
+    )
+
+
+def replay(store, keys):
+    '''Look up each of `keys` in `store`, and return the hit ratio.'''
+    n_hits = 0
+    for key in keys:
+        try:
+            store[key]
+        except KeyError:
+            store[key] = _CacheEntry(key)
+        else:
+            n_hits += 1
+    return n_hits / len(keys)
+
+
+@pytest.mark.parametrize('policy_name', policy_names)
+def test_max_size(policy_name):
+    '''Test that every policy keeps the cache within `max_size`.'''
+    calls = []
+
+    @cache(max_size=10, eviction_policy=policy_name)
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    r = random.Random(0)
+    for _ in range(1000):
+        x = r.randrange(30)
+        assert f(x) == x * 2
+        assert f.cache_info().current_size <= 10
+    cache_info = f.cache_info()
+    assert cache_info.hits > 0
+    assert cache_info.evictions == cache_info.misses - 10
+    assert len(calls) == cache_info.misses
+
+    store = make_store(policy_name, 10)
+    replay(store, [r.randrange(30) for _ in range(1000)])
+    assert len(store.eviction_policy) == len(store) == 10
+    del store[next(iter(store))]
+    store.pop(next(iter(store)))
+    assert len(store.eviction_policy) == len(store) == 8
+    store.clear()
+    assert len(store.eviction_policy) == len(store) == 0
+    replay(store, range(20))
+    assert len(store.eviction_policy) == len(store) == 10
+
+
+@pytest.mark.parametrize('policy_name', policy_names)
+def test_max_bytes(policy_name):
+    '''Test that every policy works with `max_bytes`.'''
+    f = cache(max_bytes=50, get_size=len,
+              eviction_policy=policy_name)(lambda x: x * 10)
+    for x in 'abcdefgabcab':
+        f(x)
+        assert f.cache_info().current_bytes <= 50
+    assert f.cache_info().current_size == 5
+
+
+def test_lfu():
+    '''Test that `'lfu'` keeps the most frequently used results.'''
+    store = make_store('lfu', 3)
+    replay(store, (1, 1, 1, 2, 2, 3))
+    replay(store, (4,)) # Evicts 3.
+    replay(store, (5,)) # Evicts 4.
+    assert set(store) == {1, 2, 5}
+    replay(store, range(100, 200)) # A scan.
+    assert {1, 2} <= set(store)
+
+
+def test_lfu_after_removals():
+    '''Test that `'lfu'` finds the lowest frequency after removals.'''
+    policy = caching.eviction_policies.LfuPolicy(10)
+    for key in 'abc':
+        policy.record_insertion(key)
+    for key in 'bbc':
+        policy.record_hit(key)
+    policy.record_removal('a')
+    policy.record_hit('b')
+    assert policy.get_victim() == 'c'
+
+    # Against a slow model: The lowest frequency, and the least recently
+    # used among those.
+    policy = caching.eviction_policies.LfuPolicy(10)
+    frequencies = {}
+    r = random.Random(0)
+    for time in range(3000):
+        key = r.randrange(20)
+        if key not in frequencies:
+            policy.record_insertion(key)
+            frequencies[key] = [1, time]
+        elif r.random() < 0.2:
+            policy.record_removal(key)
+            del frequencies[key]
+        else:
+            policy.record_hit(key)
+            frequencies[key][0] += 1
+            frequencies[key][1] = time
+        if frequencies:
+            assert policy.get_victim() == min(frequencies,
+                                              key=frequencies.__getitem__)
+            if r.random() < 0.1:
+                victim = policy.get_victim()
+                policy.record_eviction(victim)
+                del frequencies[victim]
+        assert len(policy) == len(frequencies)
+
+
+@pytest.mark.parametrize('policy_name', ('lfu', 'arc', 'tinylfu'))
+def test_scan_resistance(policy_name):
+    '''Test that scans don't flush the popular results, unlike with LRU.'''
+    r = random.Random(0)
+    keys = []
+    for i in range(200):
+        keys.extend(r.randrange(50) for _ in range(50))
+        if i % 20 == 0:
+            keys.extend(range(1000 * i, 1000 * i + 300))
+    lru_hit_ratio = replay(make_store('lru', 100), keys)
+    assert replay(make_store(policy_name, 100), keys) > lru_hit_ratio + 0.02
+
+
+def test_arc_adapts():
+    '''Test that `'arc'` does as well as LRU on a recency-friendly trace.'''
+    keys = [i // 3 for i in range(3000)]
+    assert replay(make_store('arc', 10), keys) == \
+                             replay(make_store('lru', 10), keys) == 2 / 3
+
+
+def test_tinylfu_admission():
+    '''Test that `'tinylfu'` doesn't admit results seen only once.'''
+    store = make_store('tinylfu', 100)
+    for _ in range(5):
+        replay(store, range(99))
+    replay(store, range(1000, 2000))
+    assert set(range(99)) <= set(store)
+    assert len(store) == 100
+
+
+def test_custom_policy():
+    '''Test using a custom `EvictionPolicy` subclass.'''
+    class MostRecentlyUsedPolicy(caching.EvictionPolicy):
+        def get_victim(self, incoming_key=None):
+            return next(reversed(self._keys))
+
+    calls = []
+
+    @cache(max_size=3, eviction_policy=MostRecentlyUsedPolicy)
+    def f(x):
+        calls.append(x)
+
+    for x in (1, 2, 3, 4, 5, 1, 2, 5):
+        f(x)
+    assert calls == [1, 2, 3, 4, 5]
+
+
+def test_invalid_policy():
+    with cute_testing.RaiseAssertor(ValueError, 'tinylfu'):
+        cache(max_size=3, eviction_policy='fifo')
+    with cute_testing.RaiseAssertor(TypeError):
+        cache(max_size=3, eviction_policy=dict)
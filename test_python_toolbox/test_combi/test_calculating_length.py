@@ -1,6 +1,7 @@
 # Copyright 2009-2017 Ram Rachum.
 # This program is distributed under the MIT license.
 
+from python_toolbox.nifty_collections import FrozenBagBag
 from python_toolbox.combi.perming.calculating_length import *
 
 def test_recurrent_perm_space_length():
@@ -13,3 +14,53 @@ def test_recurrent_comb_space_length():
     assert calculate_length_of_recurrent_comb_space(3, (3, 1, 1)) == 4
     assert calculate_length_of_recurrent_comb_space(2, (3, 2, 2, 1)) == 9
     assert calculate_length_of_recurrent_comb_space(3, (3, 2, 2, 1)) == 14
+
+
+def test_bounded_length_caches():
+    from python_toolbox.combi.perming import calculating_length
+    old_caches = get_length_caches()
+    perm_space_cache = LengthCache(max_size=5)
+    comb_space_cache = LengthCache(max_size=5, eviction_policy='lfu')
+    set_length_caches(perm_space_cache, comb_space_cache)
+    try:
+        assert get_length_caches() == (perm_space_cache, comb_space_cache)
+        assert calculate_length_of_recurrent_perm_space(3, (3, 2, 2, 1)) == 52
+        assert calculate_length_of_recurrent_perm_space(7, (3, 2, 2, 1)) == \
+                                                                          1680
+        assert calculate_length_of_recurrent_comb_space(5, (3, 2, 2, 1)) == \
+                                                                            14
+        assert len(perm_space_cache) == len(comb_space_cache) == 5
+        assert perm_space_cache.cache_info().evictions >= 1
+        assert calculate_length_of_recurrent_perm_space(7, (3, 2, 2, 1)) == \
+                                                                          1680
+        assert calculate_length_of_recurrent_perm_space(7, (1, 2, 2, 3)) == \
+                                                                          1680
+        cache_info = perm_space_cache.cache_info()
+        assert cache_info.hits >= 2
+        assert cache_info.max_size == 5
+        key = calculating_length._make_key(7, FrozenBagBag((3, 2, 2, 1)))
+        assert key == (7, 1, 2, 2, 3)
+    finally:
+        set_length_caches(*old_caches)
+
+
+def test_saving_and_loading_length_caches(tmp_path):
+    old_caches = get_length_caches()
+    set_length_caches(LengthCache(), LengthCache())
+    try:
+        assert calculate_length_of_recurrent_perm_space(3, (3, 1, 1)) == 13
+        assert calculate_length_of_recurrent_comb_space(3, (3, 1, 1)) == 4
+        path = tmp_path / 'lengths.json'
+        save_length_caches(str(path))
+        saved_caches = tuple(map(dict, get_length_caches()))
+
+        set_length_caches(LengthCache(), LengthCache())
+        load_length_caches(str(path))
+        assert tuple(map(dict, get_length_caches())) == saved_caches
+        perm_space_cache, comb_space_cache = get_length_caches()
+        assert calculate_length_of_recurrent_perm_space(3, (3, 1, 1)) == 13
+        assert calculate_length_of_recurrent_comb_space(3, (3, 1, 1)) == 4
+        assert perm_space_cache.cache_info().misses == 0
+        assert comb_space_cache.cache_info().misses == 0
+    finally:
+        set_length_caches(*old_caches)
@@ -1,10 +1,19 @@
 # Copyright 2009-2017 Ram Rachum.
 # This program is distributed under the MIT license.
 
+import pytest
+
 from python_toolbox import cute_testing
+from python_toolbox.sequence_tools import CuteRange
 
+from python_toolbox import combi
 from python_toolbox.combi import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def test_chain_spaces():
     chain_space = ChainSpace((range(3), 'meow', range(22, 19, -1)))
@@ -34,3 +43,31 @@ def test_chain_spaces():
     assert not ChainSpace(())
 
 
+
+
+def test_empty_sequences():
+    chain_space = ChainSpace(('abc', '', range(4), (), 'xy'))
+    items = ['a', 'b', 'c', 0, 1, 2, 3, 'x', 'y']
+    assert [chain_space[i] for i in range(len(items))] == items
+    for start, stop in ((0, 9), (2, 8), (3, 3), (7, 9)):
+        assert list(chain_space._iterate_range(start, stop)) == \
+                                                             items[start:stop]
+    with cute_testing.RaiseAssertor(IndexError): chain_space[9]
+
+
+@pytest.mark.parametrize('use_numpy', (False, True))
+def test_get_batch(use_numpy, monkeypatch):
+    if use_numpy and numpy is None:
+        pytest.skip('NumPy is not installed.')
+    monkeypatch.setattr(combi._batching, 'numpy',
+                        numpy if use_numpy else None)
+    chain_space = ChainSpace(('abc', '', range(4), (), 'xy'))
+    batch = chain_space.get_batch([0, 3, -1, 6])
+    assert [list(row) for row in batch] == [[0, 0], [2, 0], [4, 1], [2, 3]]
+    with cute_testing.RaiseAssertor(IndexError):
+        chain_space.get_batch([0, -10])
+
+    # An index in a sequence that's too big for `int64`:
+    chain_space = ChainSpace(('abc', CuteRange(10 ** 20)))
+    assert [list(row) for row in chain_space.get_batch([-1, 1])] == \
+                                                  [[1, 10 ** 20 - 1], [0, 1]]
@@ -0,0 +1,72 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+import functools
+import math
+import random
+
+import pytest
+
+from python_toolbox import misc_tools
+from python_toolbox.combi import *
+from python_toolbox.combi.perming import perm_algebra
+
+
+def test_perms():
+    perm_space = PermSpace(300)
+    random_generator = random.Random(0)
+    perms = [perm_space[random_generator.randrange(perm_space.length)]
+             for _ in range(3)]
+    perm, other_perm, third_perm = perms
+    assert perm * other_perm == other_perm.apply(perm)
+    assert (perm * other_perm) * third_perm == \
+                                             perm * (other_perm * third_perm)
+    assert perm * ~perm == ~perm * perm == perm_space[0]
+    assert perm ** 0 == perm_space[0]
+    assert perm ** 5 == misc_tools.general_product((perm,) * 5)
+    assert perm ** -3 == (~perm) ** 3
+    order = functools.reduce(lambda a, b: a * b // math.gcd(a, b),
+                             perm.cycle_type)
+    assert perm ** order == perm_space[0]
+    assert perm ** (10 ** 50 * order + 7) == perm ** 7
+    assert sum(perm.cycle_type) == 300
+    assert len(perm.cycle_type) == perm.n_cycles
+    assert perm.degree == 300 - perm.n_cycles
+
+    perm = Perm((1, 2, 0, 4, 3, 5))
+    assert perm.cycle_type == (3, 2, 1)
+    assert perm_algebra.get_cycles(perm._perm_sequence) == \
+                                                     [[0, 1, 2], [3, 4], [5]]
+    assert tuple(perm ** 2) == (2, 0, 1, 3, 4, 5)
+    assert tuple(perm ** -1) == (2, 0, 1, 4, 3, 5)
+    assert PermSpace('abc')[4].cycle_type == (3,)
+    assert PermSpace(3, domain='xyz')[1].cycle_type == (2, 1)
+
+
+@pytest.mark.parametrize('use_numpy', (True, False))
+def test_batches(use_numpy, monkeypatch):
+    if use_numpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(perm_algebra, 'numpy', None)
+    perm_space = PermSpace(7)
+    perms = [perm_space[i] for i in range(0, perm_space.length, 97)]
+    other_perms = perms[::-1]
+    perm_sequences = [tuple(perm) for perm in perms]
+    other_perm_sequences = [tuple(perm) for perm in other_perms]
+
+    def to_tuples(matrix):
+        return [tuple(map(int, row)) for row in matrix]
+
+    assert to_tuples(perm_algebra.compose_batch(perm_sequences,
+                                                other_perm_sequences)) == \
+           [tuple(perm * other_perm) for perm, other_perm in
+            zip(perms, other_perms)]
+    assert to_tuples(perm_algebra.invert_batch(perm_sequences)) == \
+                                           [tuple(~perm) for perm in perms]
+    for exponent in (-5, 0, 1, 2, 13):
+        assert to_tuples(perm_algebra.power_batch(perm_sequences,
+                                                  exponent)) == \
+                                 [tuple(perm ** exponent) for perm in perms]
+    assert list(map(int, perm_algebra.count_cycles_batch(perm_sequences))) \
+                                      == [perm.n_cycles for perm in perms]
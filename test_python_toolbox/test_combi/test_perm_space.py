@@ -2,10 +2,13 @@
 # This program is distributed under the MIT license.
 
 import pickle
+import array
 import itertools
 import functools
 import math
 
+import pytest
+
 from python_toolbox import cute_testing
 from python_toolbox import math_tools
 from python_toolbox import cute_iter_tools
@@ -414,6 +417,23 @@ def test_degreed_perm_space():
 
 
 
+def test_big_degreed_perm_space():
+    perm_space = PermSpace(60, degrees=(5, 30, 58), fixed_map={3: 3, 7: 9})
+    # Fixing 3 closes a cycle and fixing 7 doesn't, so it's like having two
+    # items and one cycle less:
+    assert perm_space.length == PermSpace(58, degrees=(4, 29, 57)).length
+    for i in (0, 1, 7 ** 40, perm_space.length // 3, perm_space.length - 1):
+        perm = perm_space[i]
+        assert perm.degree in (5, 30, 58)
+        assert perm[3] == 3 and perm[7] == 9
+        assert perm_space.index(perm) == i
+    perms = tuple(perm_space[10 ** 30 : 10 ** 30 + 5])
+    assert perms == tuple(perm_space[10 ** 30 + i] for i in range(5))
+
+    with cute_testing.RaiseAssertor(ValueError):
+        perm_space.index(PermSpace(60, degrees=5)[0])
+
+
 def test_partial_perm_space():
     empty_partial_perm_space = PermSpace(5, n_elements=6)
     assert empty_partial_perm_space.length == 0
@@ -603,6 +623,31 @@ def test_recurrent():
     assert PermSpace(4).unrecurrented == PermSpace(4)
 
 
+def test_long_recurrent():
+    perm_spaces = (
+        PermSpace('aaaaabbbbbcccccdddddeeeee'),
+        PermSpace('ab' * 15 + 'cdef' * 3, n_elements=20,
+                  fixed_map={0: 'f', 7: 'a'}),
+        CombSpace('abcde' * 10, 20),
+    )
+    for perm_space in perm_spaces:
+        length = perm_space.length
+        for i in (0, 1, length // 7, length // 2, length - 1):
+            perm = perm_space[i]
+            assert nifty_collections.Bag(perm) <= \
+                                     nifty_collections.Bag(perm_space.sequence)
+            assert perm_space.index(perm) == i
+        assert tuple(perm_space[5:10]) == \
+                                     tuple(perm_space[i] for i in range(5, 10))
+
+    perm_space = PermSpace('aaaaabbbbbcccccdddddeeeee')
+    assert perm_space[-1] == Perm('eeeeedddddcccccbbbbbaaaaa', perm_space)
+    with cute_testing.RaiseAssertor(ValueError):
+        perm_space.index('eeeeedddddcccccbbbbbaaaab')
+    with cute_testing.RaiseAssertor(ValueError):
+        perm_spaces[1].index(perm_spaces[1][0]._perm_sequence[::-1])
+
+
 def test_unrecurrented():
     recurrent_perm_space = combi.PermSpace('abcabc')
     unrecurrented_perm_space = recurrent_perm_space.unrecurrented
@@ -744,5 +789,151 @@ def test_variations_make_unequal():
     assert perm_space.get_typed(RedPerm) == perm_space.get_typed(RedPerm)
 
 
-
-
+def test_iteration_matches_indexing():
+    perm_spaces = (
+        PermSpace(5), PermSpace('meow'), PermSpace(5, n_elements=3),
+        PermSpace(5, fixed_map={1: 3, 4: 0}),
+        PermSpace('meow', domain='abcd', fixed_map={'b': 'o'}),
+        PermSpace(5, degrees=(1, 3)),
+        PermSpace('lovers', degrees=2, fixed_map={0: 'l'}),
+        PermSpace('abracadabra', n_elements=4),
+        PermSpace('bacab', fixed_map={3: 'a'}),
+        PermSpace('bacab', n_elements=3, fixed_map={1: 'a'}),
+        PermSpace('aabbc').unrecurrented,
+        CombSpace(6, 3), CombSpace('abcab', 3), CombSpace('bacab', 2),
+        PermSpace(4, perm_type=type('BluePerm', (Perm,), {})),
+    )
+    for perm_space in perm_spaces:
+        perms = tuple(perm_space)
+        assert perms == tuple(perm_space[i] for i in range(perm_space.length))
+        assert len(perms) == perm_space.length
+        assert hash(perms[-1]) == hash(perm_space[-1])
+        assert type(perms[0]) == type(perm_space[0])
+        for slice_ in (slice(1, 6), slice(-4, None), slice(3, 3)):
+            sliced_perm_space = perm_space[slice_]
+            assert tuple(sliced_perm_space) == perms[slice_]
+            assert tuple(sliced_perm_space[1:]) == perms[slice_][1:]
+
+
+def test_iterating_huge_and_long_spaces():
+    # Lengths above `sys.maxsize`:
+    assert next(iter(PermSpace(25))) == PermSpace(25)[0]
+    assert next(iter(PermSpace(21, fixed_map={0: 1}))) == \
+                                            PermSpace(21, fixed_map={0: 1})[0]
+    huge_perm_space = PermSpace(25)
+    assert tuple(itertools.islice(huge_perm_space[10 ** 20:], 2)) == \
+                  (huge_perm_space[10 ** 20], huge_perm_space[10 ** 20 + 1])
+
+    # Sequences longer than the recursion limit:
+    recurrent_perm_space = PermSpace('a' * 1200 + 'b')
+    assert tuple(itertools.islice(recurrent_perm_space, 3)) == \
+                                    tuple(recurrent_perm_space[i] for i in
+                                          range(3))
+    assert tuple(recurrent_perm_space[-2:]) == \
+                        (recurrent_perm_space[-2], recurrent_perm_space[-1])
+    degreed_perm_space = PermSpace(1200, degrees=1)
+    assert tuple(itertools.islice(degreed_perm_space, 3)) == \
+                                    tuple(degreed_perm_space[i] for i in
+                                          range(3))
+    recurrent_comb_space = CombSpace('a' * 1100 + 'b', 1100)
+    assert tuple(recurrent_comb_space) == \
+                          (recurrent_comb_space[0], recurrent_comb_space[1])
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@pytest.mark.parametrize('use_numpy', (False, True))
+def test_batches(use_numpy, monkeypatch):
+    if use_numpy and numpy is None:
+        pytest.skip('NumPy is not installed.')
+    monkeypatch.setattr(combi.perming._batching, 'numpy',
+                        numpy if use_numpy else None)
+    perm_spaces = (
+        PermSpace(6), PermSpace('meow', domain='abcd'),
+        PermSpace(7, n_elements=3), CombSpace('abcdefg', 4),
+        PermSpace(6, fixed_map={1: 3}), PermSpace('abracadabra', n_elements=3),
+        CombSpace('abcab', 3), PermSpace(5, degrees=(1, 3)),
+        PermSpace(7)[100:900], PermSpace(25)[10 ** 20:],
+    )
+    for perm_space in perm_spaces:
+        indices = [i for i in (0, -1, 5, 3, 4, 6, 13, 4) if
+                   i < perm_space.length] + [perm_space.length // 2]
+        batch = perm_space.get_batch(indices)
+        assert len(batch) == len(indices)
+        for i, value_indices in zip(indices, batch):
+            assert len(value_indices) == perm_space.n_elements
+            assert tuple(perm_space.sequence[value_index] for value_index in
+                         value_indices) == \
+                                         tuple(perm_space[i]._perm_sequence)
+        assert [int(i) for i in perm_space.index_batch(batch)] == \
+                                  [i % perm_space.length for i in indices]
+
+        assert [list(value_indices) for value_indices in
+                perm_space.to_array(2, 9)] == \
+                                  [list(value_indices) for value_indices in
+                                   perm_space.get_batch(range(2, min(
+                                       9, perm_space.length)))]
+
+        with cute_testing.RaiseAssertor(IndexError):
+            perm_space.get_batch([0, perm_space.length])
+        with cute_testing.RaiseAssertor(ValueError):
+            perm_space.index_batch([[perm_space.sequence_length] *
+                                    perm_space.n_elements])
+
+    perm_space = PermSpace(5)
+    with cute_testing.RaiseAssertor(ValueError):
+        perm_space.index_batch([[0, 0, 1, 2, 3]])
+    assert len(perm_space.to_array()) == 120
+    assert len(perm_space.to_array(-3)) == 3
+    assert len(perm_space.get_batch([])) == 0
+
+
+def test_compact_perms():
+    perm_spaces = (
+        PermSpace(5), PermSpace(300), PermSpace('aabcd', n_elements=3),
+        PermSpace(4, domain='wxyz', fixed_map={'w': 2}),
+        CombSpace('abcde', 3), PermSpace('aabc').unrecurrented,
+        PermSpace(6, degrees=2)[4:],
+    )
+    for perm_space in perm_spaces:
+        perm = perm_space[3]
+        assert not hasattr(perm, '__dict__')
+        assert perm._derived is None
+        unpickled_perm = pickle.loads(pickle.dumps(perm))
+        assert unpickled_perm == perm
+        assert hash(unpickled_perm) == hash(perm)
+        assert type(unpickled_perm) is type(perm)
+
+    perm = PermSpace(300)[10 ** 100]
+    assert isinstance(perm._perm_sequence, array.array)
+    assert perm.inverse is perm.inverse
+    assert perm.inverse.inverse == perm
+    assert perm.unrapplied is perm
+    assert perm ** 3 == perm * perm * perm
+    assert hash(perm) == hash(Perm(tuple(perm), PermSpace(300)))
+
+    perm = PermSpace(5)[10]
+    assert perm._perm_sequence == bytes((0, 2, 4, 1, 3))
+    assert b'\x02' not in perm
+    with cute_testing.RaiseAssertor(ValueError):
+        perm.index(b'\x02')
+    assert perm.index(4) == 2
+
+    # The compact sequences don't leak out:
+    assert PermSpace(5)[37][1:3] == (3, 0)
+    assert PermSpace(300)[5][1:3] == (1, 2)
+    assert CombSpace(5, 3)[2][:2] == (0, 1)
+    uncompacted_perm = Perm._make_unchecked((1, 0, 2, 3, 4), PermSpace(5))
+    assert perm < uncompacted_perm
+    assert not uncompacted_perm < perm
+    assert perm.items is perm.items
+    assert perm.as_dictoid is perm.as_dictoid
+
+    # Perms that share a space share it in the pickle too:
+    perms = list(PermSpace('abcdefgh'))[:100]
+    assert len(pickle.dumps(perms)) < 20 * len(perms)
+    assert pickle.loads(pickle.dumps(perms)) == perms
@@ -1,10 +1,21 @@
 # Copyright 2009-2017 Ram Rachum.
 # This program is distributed under the MIT license.
 
+import itertools
+
+import pytest
+
 from python_toolbox import cute_testing
+from python_toolbox.sequence_tools import CuteRange
 
+from python_toolbox import combi
 from python_toolbox.combi import *
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def test():
     huge_perm_space = PermSpace(range(100))
@@ -50,3 +61,42 @@ def test():
                                              ProductSpace((range(4), range(3)))
     assert ProductSpace((range(4), range(3))) != \
                                              ProductSpace((range(3), range(4)))
+
+
+def test_iterating():
+    sequences = ('abc', range(2), (), 'xy')
+    for n_sequences in range(1, 5):
+        product_space = ProductSpace(sequences[:n_sequences])
+        assert list(product_space) == \
+                             list(itertools.product(*sequences[:n_sequences]))
+    product_space = ProductSpace((range(2), 'xyz', range(3), 'pq'))
+    items = [product_space[i] for i in range(product_space.length)]
+    assert list(product_space) == items
+    for start, stop in ((0, 36), (5, 6), (5, 30), (17, 17), (34, 36)):
+        assert list(product_space._iterate_range(start, stop)) == \
+                                                             items[start:stop]
+    assert list(ProductSpace(())) == [()]
+
+
+@pytest.mark.parametrize('use_numpy', (False, True))
+def test_get_batch(use_numpy, monkeypatch):
+    if use_numpy and numpy is None:
+        pytest.skip('NumPy is not installed.')
+    monkeypatch.setattr(combi._batching, 'numpy',
+                        numpy if use_numpy else None)
+    product_space = ProductSpace((range(2), 'xyz', range(3)))
+    batch = product_space.get_batch([0, 7, -1, 17])
+    assert [list(row) for row in batch] == \
+                               [[0, 0, 0], [0, 2, 1], [1, 2, 2], [1, 2, 2]]
+    assert len(product_space.get_batch([])) == 0
+    with cute_testing.RaiseAssertor(IndexError):
+        product_space.get_batch([18])
+
+    huge_product_space = ProductSpace((range(10 ** 10),) * 3)
+    assert [list(row) for row in huge_product_space.get_batch([10 ** 25])] \
+                                                       == [[100000, 0, 0]]
+
+    # An index in a component that's too big for `int64`:
+    product_space = ProductSpace((range(3), 'ab', CuteRange(10 ** 20)))
+    assert [list(row) for row in product_space.get_batch([-1, 1])] == \
+                                         [[2, 1, 10 ** 20 - 1], [0, 0, 1]]
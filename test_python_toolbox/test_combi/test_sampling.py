@@ -0,0 +1,70 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+import collections
+import random
+
+import pytest
+
+from python_toolbox.combi import *
+
+
+def _check_uniform(space, n_draws_per_item=300):
+    random_generator = random.Random(0)
+    counter = collections.Counter(
+        space.random(random_generator) for _ in
+        range(n_draws_per_item * space.length)
+    )
+    assert set(counter) == set(space)
+    # Each item's count is binomial; allow for about 6 standard deviations:
+    for count in counter.values():
+        assert abs(count - n_draws_per_item) < 6 * n_draws_per_item ** 0.5
+
+
+def test_random():
+    spaces = (
+        PermSpace(4),
+        PermSpace('abcd', n_elements=3, domain='wxyz'),
+        PermSpace(5, n_elements=3, fixed_map={1: 4}),
+        PermSpace('aabbc'),
+        PermSpace('aaabbc', n_elements=3),
+        PermSpace('aaabbc', n_elements=4, fixed_map={1: 'c'}),
+        CombSpace(6, 3),
+        CombSpace('aabbbc', 3),
+        PermSpace(5, degrees=(1, 3)),
+        PermSpace(5)[7:50],
+        ProductSpace(('abc', range(4))),
+        ChainSpace(('abc', range(5))),
+    )
+    for space in spaces:
+        _check_uniform(space)
+
+    perm_space = PermSpace(1000)
+    assert perm_space.random(7) == perm_space.random(7)
+    assert perm_space.random(7) in perm_space
+
+
+def test_sample():
+    perm_space = PermSpace(10 ** 3, n_elements=5)
+    sample = perm_space.sample(100, seed=0)
+    assert not isinstance(sample, collections.abc.Sequence)
+    perms = list(sample)
+    assert len(set(perms)) == 100
+    assert all(perm in perm_space for perm in perms)
+    assert list(perm_space.sample(100, seed=0)) == perms
+
+    comb_space = CombSpace('aabbbc', 3)
+    assert sorted(comb_space.sample(comb_space.length, seed=1),
+                  key=comb_space.index) == list(comb_space)
+    assert len(set(comb_space.sample(4, seed=2))) == 4
+
+    map_space = MapSpace(lambda i: i % 2, range(10))
+    # Items are unique by index, not by value:
+    assert sorted(map_space.sample(10, seed=3)) == [0] * 5 + [1] * 5
+
+    product_space = ProductSpace(('ab', range(3)))
+    assert len(list(product_space.sample(50, unique=False, seed=4))) == 50
+    with pytest.raises(ValueError):
+        product_space.sample(7)
+    with pytest.raises(ValueError):
+        product_space.sample(-1)
@@ -0,0 +1,69 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+import pickle
+
+from python_toolbox import future_tools
+
+from python_toolbox.combi import *
+from python_toolbox.combi._sharding_mixin import Shard
+
+
+def test_shard():
+    perm_space = PermSpace('abcde', n_elements=4, fixed_map={0: 'c'})
+    shards = perm_space.shard(5)
+    assert len(shards) == 5
+    assert tuple(map(len, shards)) == (5, 5, 5, 5, 4)
+    assert sum((list(shard) for shard in shards), []) == list(perm_space)
+    assert shards[1][-1] == perm_space[9]
+    assert pickle.loads(pickle.dumps(shards[2])) == shards[2]
+    assert list(pickle.loads(pickle.dumps(shards[2]))) == list(shards[2])
+
+    assert len(CombSpace(5, 2).shard(100)) == 10
+    assert PermSpace(0, n_elements=0)[1:].shard(3) == ()
+
+    huge_perm_space = PermSpace(100)[10 ** 100:]
+    shards = huge_perm_space.shard(3)
+    assert sum(shard.length for shard in shards) == huge_perm_space.length
+    assert shards[1][0] == huge_perm_space[shards[0].length]
+    assert shards[1][5:7] == Shard(huge_perm_space, shards[1].start + 5,
+                                   shards[1].start + 7)
+    assert list(shards[1][-2:]) == [shards[1][-2], shards[1][-1]]
+
+
+def test_slicing_shards():
+    perm_space = PermSpace(4)
+    shard = perm_space.shard(2)[1]
+    assert shard[2:5] == Shard(perm_space, 14, 17)
+    assert list(shard[2:5]) == list(perm_space[14:17])
+    assert shard[:] == shard
+    assert shard[-3:] == Shard(perm_space, 21, 24)
+    assert shard[8:3] == Shard(perm_space, 20, 20)
+    assert shard[100:] == Shard(perm_space, 24, 24)
+    assert not shard[8:3]
+    assert shard[::5] == (perm_space[12], perm_space[17], perm_space[22])
+    assert shard[::-1] == tuple(reversed(list(shard)))
+    assert shard[3:0:-2] == (perm_space[15], perm_space[13])
+
+
+def test_parallel_map():
+    product_space = ProductSpace((range(4), 'abc'))
+    chain_space = ChainSpace(('abc', (item for item in range(10))))
+    map_space = MapSpace(str, range(100))
+    perm_space = PermSpace(5, degrees=2)[3:]
+    with future_tools.CuteThreadPoolExecutor(4) as executor:
+        for space in (product_space, chain_space, map_space, perm_space):
+            results = list(map(repr, space))
+            assert list(space.parallel_map(repr, executor, n_shards=3)) == \
+                                                                        results
+            assert sorted(space.parallel_map(repr, executor, n_shards=3,
+                                             as_completed=True)) == \
+                                                                sorted(results)
+
+
+def test_parallel_map_with_processes():
+    # Sending only the spaces' descriptions to the processes:
+    for space in (PermSpace('aabcd', n_elements=3)[5:],
+                  ChainSpace(((item for item in range(5)), 'xyz'))):
+        assert list(space.parallel_map(str, n_shards=4)) == \
+                                                          list(map(str, space))
@@ -19,7 +19,8 @@ from python_toolbox import cute_testing
 from python_toolbox import nifty_collections
 from python_toolbox.nifty_collections import (Bag, OrderedBag,
                                               FrozenBag, FrozenOrderedBag,
-                                              OrderedDict)
+                                              OrderedDict, ColumnarBag)
+from python_toolbox.nifty_collections import columnar_bagging
 
 infinity = float('inf')
 infinities = (infinity, -infinity)
@@ -72,7 +73,7 @@ class BaseBagTestCase(cute_testing.TestCase, metaclass=abc.ABCMeta):
         with cute_testing.RaiseAssertor(TypeError):
             - bag
 
-        assert re.match(r'^(Frozen)?(Ordered)?Bag\(.*$', repr(bag))
+        assert re.match(r'^(Frozen)?(Ordered)?(Columnar)?Bag\(.*$', repr(bag))
 
         assert bag.copy() == bag
 
@@ -425,6 +426,51 @@ class BaseMutableBagTestCase(BaseBagTestCase):
         assert type(frozen_bag).__name__ == f'Frozen{type(bag).__name__}'
         assert frozen_bag.get_mutable() == bag
 
+    def test_totals(self):
+        bag = self.bag_type('abracadabra')
+
+        def assert_totals_correct():
+            assert bag.n_elements == sum(bag.values())
+            assert bag.frozen_bag_bag == \
+                                  nifty_collections.FrozenBagBag(bag.values())
+
+        assert_totals_correct()
+        if not isinstance(bag, ColumnarBag): # It recounts each time.
+            assert bag.frozen_bag_bag is bag.frozen_bag_bag
+        bag['a'] = 2
+        assert_totals_correct()
+        bag['x'] += 3
+        assert_totals_correct()
+        del bag['b']
+        del bag['b']
+        bag['r'] = 0
+        assert_totals_correct()
+        assert bag.pop('c') == 1
+        bag.popitem()
+        assert_totals_correct()
+        bag.update({'a': 4, 'z': 1})
+        bag.setdefault('y', 2)
+        assert_totals_correct()
+        bag |= self.bag_type('aaaaaaaq')
+        bag += self.bag_type('abc')
+        bag -= self.bag_type('zz')
+        bag &= self.bag_type('aaabcxxxyy')
+        assert_totals_correct()
+        bag *= 3
+        bag //= 2
+        bag %= 3
+        bag **= 2
+        assert_totals_correct()
+        bag_copy = copy.copy(bag)
+        bag_copy['a'] += 10
+        assert_totals_correct()
+        assert bag_copy.n_elements == bag.n_elements + 10
+        bag.clear()
+        assert bag.n_elements == 0
+        assert bag.frozen_bag_bag == nifty_collections.FrozenBagBag({})
+        bag['a'] = 1
+        assert_totals_correct()
+
     def test_hash(self):
         bag = self.bag_type('abracadabra')
         assert not isinstance(bag, collections.abc.Hashable)
@@ -602,6 +648,16 @@ class BaseFrozenBagTestCase(BaseBagTestCase):
         assert mutable_bag.get_frozen() == bag
 
 
+    def test_copy_with_changes(self):
+        bag = self.bag_type('abracadabra')
+        hash(bag)
+        changed_bag = bag.copy({'a': 2, 'x': 3, 'b': 0.0})
+        assert changed_bag == self.bag_type('aarrcdxxx')
+        assert hash(changed_bag) == hash(self.bag_type('aarrcdxxx'))
+        assert hash(bag.copy(b=2)) == hash(bag)
+        with cute_testing.RaiseAssertor(TypeError):
+            bag.copy({'a': -1})
+
     def test_get_frozen(self):
         bag = self.bag_type('abracadabra')
         assert not hasattr(bag, 'get_frozen')
@@ -883,3 +939,145 @@ class BagTestCaseWithSlowCountElements(BagTestCase):
     # *Did.*
 
 
+
+class ColumnarBagTestCase(BaseMutableBagTestCase, BaseUnorderedBagTestCase):
+    __test__ = True
+    bag_type = ColumnarBag
+
+    _repr_result_pattern = ("^ColumnarBag\\({(?:(?:'b': 3, 'a': 2)|"
+                            "(?:'a': 2, 'b': 3))}\\)$")
+
+    def test_get_frozen(self):
+        bag = self.bag_type('abracadabra')
+        frozen_bag = bag.get_frozen()
+        assert type(frozen_bag) is FrozenBag
+        assert frozen_bag == bag
+        assert frozen_bag.get_mutable() == bag
+
+    def test_interner(self):
+        interner = columnar_bagging.KeyInterner()
+        bag = self.bag_type('abracadabra', interner=interner)
+        assert interner.keys == ['a', 'b', 'r', 'c', 'd']
+        assert self.bag_type(bag).interner is interner
+        assert (bag + self.bag_type('xyz')).interner is interner
+        assert 'x' in interner.ids
+
+        other_bag = self.bag_type('abracadabra')
+        assert other_bag.interner is not interner
+        assert bag == other_bag
+        assert bag - other_bag == self.bag_type()
+        assert bag | other_bag == bag & other_bag == bag
+        assert bag + Bag('xy') == other_bag + Bag('xy') == \
+                                                   Bag('abracadabraxy')
+        assert bag <= other_bag + Bag('x')
+        assert not bag <= Bag('abracadabr')
+        assert bag > Bag('abracadabr')
+
+        del bag['a']
+        assert interner.ids['a'] == 0
+        assert 'a' not in bag
+        bag['a'] = 7
+        assert tuple(bag.keys())[0] == 'a'
+
+    def test_separate_interners(self):
+        big_bag = self.bag_type(range(10 ** 4))
+        bag = self.bag_type('abc')
+        assert bag.interner is not big_bag.interner
+        assert bag.interner.keys == ['a', 'b', 'c']
+        assert len(bag._counts) == 3
+        assert copy.copy(bag).interner is bag.interner
+        assert bag.copy().interner is bag.interner
+        assert (bag * 2).interner is bag.interner
+        assert copy.deepcopy(bag).interner is not bag.interner
+
+        # Keys are only interned into the left bag's interner when the result
+        # needs them:
+        other_bag = self.bag_type('bcdd')
+        assert bag & other_bag == Bag('bc')
+        assert bag - other_bag == Bag('a')
+        assert not bag <= other_bag
+        assert not bag >= other_bag
+        assert not bag // other_bag
+        assert self.bag_type('bc') < other_bag
+        assert not self.bag_type('bcc') < other_bag
+        assert not other_bag > self.bag_type('bcx')
+        assert bag.interner.keys == ['a', 'b', 'c']
+        assert bag | other_bag == Bag('abcdd')
+        assert bag + other_bag == Bag('abbccdd')
+        assert bag.interner.keys == ['a', 'b', 'c', 'd']
+        assert other_bag.interner.keys == ['b', 'c', 'd']
+        bag &= other_bag
+        assert bag == Bag('bc')
+        bag += other_bag
+        assert bag == Bag('bbccdd')
+        assert (other_bag // self.bag_type('bd')) == 1
+
+    def test_update_from_counts(self):
+        bag = self.bag_type('abc')
+        bag.update_from_counts('bxx', [2, 1, 3])
+        assert bag == Bag({'a': 1, 'b': 3, 'c': 1, 'x': 4})
+        bag.update_from_counts(['y', 'z'], (0, 2.0))
+        assert 'y' not in bag
+        assert bag['z'] == 2
+        bag.update_from_counts((), ())
+        with cute_testing.RaiseAssertor(TypeError):
+            bag.update_from_counts(['a'], [-1])
+        with cute_testing.RaiseAssertor(TypeError):
+            bag.update_from_counts(['a'], [1.5])
+        with cute_testing.RaiseAssertor(ValueError):
+            bag.update_from_counts(['a', 'b'], [1])
+        assert bag == Bag({'a': 1, 'b': 3, 'c': 1, 'x': 4, 'z': 2})
+
+    def test_single_key_inserts(self):
+        n_keys = 10 ** 4
+        bag = self.bag_type()
+        for i in range(n_keys):
+            bag[i] = i % 3
+            assert len(bag) == 2 * (i + 1) // 3
+        assert len(bag._counts) < 2 * n_keys
+        assert bag == Bag({i: i % 3 for i in range(n_keys)})
+        assert bag.n_elements == n_keys - 1
+        for i in range(0, n_keys, 2):
+            del bag[i]
+            bag[i + 1] += 1
+        assert len(bag) == n_keys // 2
+        assert bag == Bag({i: i % 3 + 1 for i in range(1, n_keys, 2)})
+        del bag[0]
+        bag[n_keys] = 0
+        assert len(bag) == n_keys // 2 == len(list(bag))
+
+    def test_big_counts(self):
+        big_count = 2 ** 62
+        bag = self.bag_type({'a': big_count, 'b': 1})
+        assert (bag + bag)['a'] == 2 * big_count
+        assert (bag * 4)['a'] == 4 * big_count
+        assert (bag ** 2)['a'] == big_count ** 2
+        assert (bag ** 2)['b'] == 1
+        bag += bag
+        assert bag['a'] == 2 * big_count
+        bag.update_from_counts(['b'], [2 ** 70])
+        assert bag['b'] == 2 ** 70 + 2
+        bag['c'] = 2 ** 80
+        assert bag.n_elements == 2 * big_count + 2 ** 70 + 2 + 2 ** 80
+
+    def test_in_place_operations_keep_identity(self):
+        bag = self.bag_type('abracadabra')
+        original_bag = bag
+        bag |= self.bag_type('xyz')
+        bag &= self.bag_type('abcx')
+        bag += self.bag_type('abc')
+        bag -= self.bag_type('a')
+        bag *= 3
+        bag //= 2
+        bag %= 4
+        bag **= 2
+        assert bag is original_bag
+        assert bag == Bag({'a': 1, 'b': 9, 'c': 9, 'x': 1})
+
+
+class ColumnarBagTestCaseWithoutNumpy(ColumnarBagTestCase):
+
+    def manage_context(self):
+        with temp_value_setting.TempValueSetter(
+                                         (columnar_bagging, 'numpy'), None):
+            yield self
@@ -33,4 +33,18 @@ def test():
 
     assert repr(frozen_dict).startswith('FrozenDict(')
 
-    assert pickle.loads(pickle.dumps(frozen_dict)) == frozen_dict
\ No newline at end of file
+    assert pickle.loads(pickle.dumps(frozen_dict)) == frozen_dict
+
+
+def test_copy_hash():
+    frozen_dict = FrozenDict({'1': 'a', '2': 'b', '3': 'c',})
+    hash(frozen_dict)
+    changed_frozen_dict = frozen_dict.copy({'1': 'z', '4': 'd'}, **{'2': 'b'})
+    assert changed_frozen_dict._items_hash is not None
+    fresh_frozen_dict = FrozenDict({'1': 'z', '2': 'b', '3': 'c', '4': 'd',})
+    assert changed_frozen_dict == fresh_frozen_dict
+    assert hash(changed_frozen_dict) == hash(fresh_frozen_dict)
+    assert hash(frozen_dict.copy()) == hash(frozen_dict)
+    assert frozen_dict.copy().copy({'1': 'a'}) == frozen_dict
+    assert hash(frozen_dict.copy().copy({'1': 'a'})) == hash(frozen_dict)
+    assert hash(frozen_dict) != hash(changed_frozen_dict)
@@ -0,0 +1,75 @@
+# Copyright 2009-2017 Ram Rachum.
+# This program is distributed under the MIT license.
+
+'''Testing module for `nifty_collections.IndexedOrderedDict`.'''
+
+import collections
+import pickle
+
+from python_toolbox import cute_testing
+
+from python_toolbox.nifty_collections import (IndexedOrderedDict, OrderedDict,
+                                              Ordered)
+
+
+def test_mapping():
+    indexed_ordered_dict = IndexedOrderedDict(((1, 'a'), (2, 'b')), c=3)
+    assert isinstance(indexed_ordered_dict, Ordered)
+    assert list(indexed_ordered_dict) == [1, 2, 'c']
+    assert indexed_ordered_dict == {1: 'a', 2: 'b', 'c': 3}
+    assert indexed_ordered_dict == OrderedDict(((1, 'a'), (2, 'b'), ('c', 3)))
+    assert indexed_ordered_dict != OrderedDict(((2, 'b'), (1, 'a'), ('c', 3)))
+    assert indexed_ordered_dict.copy() == indexed_ordered_dict
+    assert pickle.loads(pickle.dumps(indexed_ordered_dict)) == \
+                                                          indexed_ordered_dict
+    assert repr(indexed_ordered_dict) == \
+                         "IndexedOrderedDict([(1, 'a'), (2, 'b'), ('c', 3)])"
+
+    indexed_ordered_dict[1] = 'z'
+    assert list(indexed_ordered_dict.items()) == \
+                                             [(1, 'z'), (2, 'b'), ('c', 3)]
+    del indexed_ordered_dict[2]
+    assert list(indexed_ordered_dict) == [1, 'c']
+    assert indexed_ordered_dict.popitem() == ('c', 3)
+    assert indexed_ordered_dict.popitem(last=False) == (1, 'z')
+    assert not indexed_ordered_dict
+    with cute_testing.RaiseAssertor(KeyError):
+        indexed_ordered_dict.popitem()
+
+
+def test_positions():
+    indexed_ordered_dict = IndexedOrderedDict(
+        (key, str(key)) for key in range(1000)
+    )
+    for key in range(0, 1000, 3):
+        del indexed_ordered_dict[key]
+    keys = [key for key in range(1000) if key % 3]
+    assert [indexed_ordered_dict.index(key) for key in keys] == \
+                                                       list(range(len(keys)))
+    assert indexed_ordered_dict.keys()[100] == keys[100]
+    assert indexed_ordered_dict.values()[-1] == str(keys[-1])
+    assert indexed_ordered_dict.items()[5:7] == \
+                          [(keys[5], str(keys[5])), (keys[6], str(keys[6]))]
+    assert list(reversed(indexed_ordered_dict.items()))[0] == \
+                                                      (keys[-1], str(keys[-1]))
+    assert indexed_ordered_dict.keys().index(keys[17]) == 17
+    with cute_testing.RaiseAssertor(ValueError):
+        indexed_ordered_dict.index(3)
+
+    indexed_ordered_dict.move_to_end(keys[0])
+    indexed_ordered_dict.move_to_end(keys[-1], last=False)
+    assert indexed_ordered_dict.keys()[0] == keys[-1]
+    assert indexed_ordered_dict.index(keys[0]) == len(keys) - 1
+
+    indexed_ordered_dict.sort(key=lambda key: -key)
+    assert list(indexed_ordered_dict) == keys[::-1]
+    assert indexed_ordered_dict.reversed == \
+                   IndexedOrderedDict((key, str(key)) for key in keys)
+
+    indexed_ordered_dict.reorder(keys)
+    assert list(indexed_ordered_dict.items()) == \
+                                            [(key, str(key)) for key in keys]
+    with cute_testing.RaiseAssertor(ValueError):
+        indexed_ordered_dict.reorder(keys[1:])
+    with cute_testing.RaiseAssertor(ValueError):
+        indexed_ordered_dict.reorder(keys[1:] + [3])
@@ -2,6 +2,7 @@
 # This program is distributed under the MIT license.
 
 import operator
+import pickle
 
 from python_toolbox import cute_testing
 
@@ -24,6 +25,24 @@ class BaseOrderedSetTestCase(cute_testing.TestCase):
         assert bool(self.ordered_set_type({0})) is True
         assert bool(self.ordered_set_type(range(5))) is True
 
+    def test_indexing(self):
+        ordered_set = self.ordered_set_type([5, 61, 2, 7, 2])
+        assert ordered_set[0] == 5
+        assert ordered_set[-1] == 7
+        assert ordered_set[1:3] == self.ordered_set_type([61, 2])
+        assert type(ordered_set[::2]) == type(ordered_set)
+        assert ordered_set.index(7) == 3
+        assert ordered_set.count(61) == 1
+        assert ordered_set.count(3) == 0
+        with cute_testing.RaiseAssertor(IndexError):
+            ordered_set[4]
+        with cute_testing.RaiseAssertor(ValueError):
+            ordered_set.index(3)
+        assert pickle.loads(pickle.dumps(ordered_set)) == ordered_set
+
+        big_ordered_set = self.ordered_set_type(range(3000))
+        assert big_ordered_set[2345] == big_ordered_set.index(2345) == 2345
+
 
 class BaseMutableOrderedSetTestCase(BaseOrderedSetTestCase):
     __test__ = False
@@ -63,6 +82,30 @@ class BaseMutableOrderedSetTestCase(BaseOrderedSetTestCase):
         assert ordered_set | ordered_set == ordered_set
         assert ordered_set & ordered_set == ordered_set
 
+    def test_positions(self):
+        ordered_set = self.ordered_set_type(range(2000))
+        items = list(range(2000))
+        for i in range(0, 2000, 7):
+            ordered_set.insert(i, -i - 1)
+            items.insert(i, -i - 1)
+        ordered_set.insert(5, 0)
+        for item in range(0, 2000, 3):
+            ordered_set.discard(item)
+            items.remove(item)
+        del ordered_set[10]
+        del items[10]
+        del ordered_set[100:200:3]
+        del items[100:200:3]
+        assert list(ordered_set) == items
+        assert [ordered_set[i] for i in range(len(items))] == items
+        assert [ordered_set.index(item) for item in items] == \
+                                                       list(range(len(items)))
+        ordered_set.move_to_end(items[0], last=True)
+        items.append(items.pop(0))
+        ordered_set.sort(key=abs)
+        assert list(ordered_set) == sorted(items, key=abs)
+        assert ordered_set.index(sorted(items, key=abs)[500]) == 500
+
 class OrderedSetTestCase(BaseMutableOrderedSetTestCase):
     __test__ = True
     ordered_set_type = OrderedSet